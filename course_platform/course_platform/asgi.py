@@ -3,6 +3,13 @@ ASGI config for course_platform project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Асинхронные представления (courses.views: all_courses_view, course_details_view,
+instructor_courses_view, get_faqs) выполняются в цикле событий без передачи
+запроса в пул потоков. Запуск:
+
+    uvicorn course_platform.asgi:application --workers 4
+    daphne course_platform.asgi:application
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
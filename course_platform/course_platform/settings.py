@@ -1,5 +1,6 @@
 from pathlib import Path
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Загрузка переменных окружения из файла .env
@@ -33,6 +34,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "courses.middleware.DatabaseRoutingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -49,8 +51,14 @@ TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
         "DIRS": [BASE_DIR / 'course_platform' / 'templates'],
-        "APP_DIRS": True,
         "OPTIONS": {
+            # Шаблоны компилируются один раз на процесс; в DEBUG кэш сбрасывается автоперезагрузкой
+            "loaders": [
+                ("django.template.loaders.cached.Loader", [
+                    "django.template.loaders.filesystem.Loader",
+                    "django.template.loaders.app_directories.Loader",
+                ]),
+            ],
             "context_processors": [
                 "django.template.context_processors.debug",
                 "django.template.context_processors.request",
@@ -64,14 +72,78 @@ TEMPLATES = [
 WSGI_APPLICATION = "course_platform.wsgi.application"
 
 # Database configuration
-# SQLite для разработки, Postgres для продакшн среды
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+# SQLite для разработки, Postgres для продакшн среды. Параметры берутся из переменных окружения:
+# DJANGO_DB_ENGINE (sqlite3 или postgresql), DJANGO_DB_NAME, DJANGO_DB_USER, DJANGO_DB_PASSWORD,
+# DJANGO_DB_HOST, DJANGO_DB_PORT. Реплика для чтения задается DJANGO_DB_REPLICA_HOST
+# (или DJANGO_DB_REPLICA_NAME для второго файла SQLite при локальной проверке).
+DB_ENGINE = os.getenv('DJANGO_DB_ENGINE', 'sqlite3')
+
+# Режим SQLite для небольших продакшн-развертываний (DJANGO_SQLITE_TUNING=True):
+# WAL, отображение файла в память, увеличенный кэш страниц и ожидание блокировки вместо ошибки.
+# Транзакции начинаются с BEGIN IMMEDIATE, чтобы не получать блокировку при повышении до записи
+SQLITE_TUNING = os.getenv('DJANGO_SQLITE_TUNING', 'False') == 'True'
+# Запись, которая не дождалась блокировки, повторяется один раз (courses.sqlite_tuning.retry_on_lock),
+# поэтому запрос ждет не дольше двух таймаутов
+SQLITE_BUSY_TIMEOUT = int(os.getenv('DJANGO_SQLITE_BUSY_TIMEOUT', '5'))
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,  # в КиБ
+    'temp_store': 'MEMORY',
+}
+SQLITE_TUNED_OPTIONS = {
+    "init_command": ';'.join(f'PRAGMA {key} = {value}' for key, value in SQLITE_PRAGMAS.items()),
+    "transaction_mode": "IMMEDIATE",
+    "timeout": SQLITE_BUSY_TIMEOUT,
+}
+
+
+def _database_config(name, host):
+    config = {
+        "ENGINE": f"django.db.backends.{DB_ENGINE}",
+        "NAME": name,
+        # Постоянные соединения с проверкой перед повторным использованием
+        "CONN_MAX_AGE": int(os.getenv('DJANGO_DB_CONN_MAX_AGE', '60')),
+        "CONN_HEALTH_CHECKS": True,
     }
+    if DB_ENGINE == 'sqlite3' and SQLITE_TUNING:
+        config["OPTIONS"] = dict(SQLITE_TUNED_OPTIONS)
+    if DB_ENGINE == 'postgresql':
+        config.update({
+            "USER": os.getenv('DJANGO_DB_USER', ''),
+            "PASSWORD": os.getenv('DJANGO_DB_PASSWORD', ''),
+            "HOST": host,
+            "PORT": os.getenv('DJANGO_DB_PORT', '5432'),
+        })
+        if os.getenv('DJANGO_DB_POOL', 'False') == 'True':
+            # Пул соединений psycopg 3 несовместим с CONN_MAX_AGE
+            config["CONN_MAX_AGE"] = 0
+            config["OPTIONS"] = {"pool": {
+                "min_size": int(os.getenv('DJANGO_DB_POOL_MIN_SIZE', '2')),
+                "max_size": int(os.getenv('DJANGO_DB_POOL_MAX_SIZE', '10')),
+            }}
+    return config
+
+
+DATABASES = {
+    "default": _database_config(os.getenv('DJANGO_DB_NAME', str(BASE_DIR / "db.sqlite3")),
+                               os.getenv('DJANGO_DB_HOST', '')),
 }
 
+if os.getenv('DJANGO_DB_REPLICA_HOST') or os.getenv('DJANGO_DB_REPLICA_NAME'):
+    DATABASES["replica"] = _database_config(
+        os.getenv('DJANGO_DB_REPLICA_NAME', DATABASES["default"]["NAME"]),
+        os.getenv('DJANGO_DB_REPLICA_HOST', DATABASES["default"].get("HOST", '')),
+    )
+    # В тестах реплика — это та же основная база
+    DATABASES["replica"]["TEST"] = {"MIRROR": "default"}
+
+DATABASE_ROUTERS = ['courses.db_routing.PrimaryReplicaRouter']
+
+# Допустимое отставание реплики в секундах: кэш, измененный позже, пересчитывается с основной базы
+DATABASE_REPLICA_MAX_LAG = int(os.getenv('DJANGO_DB_REPLICA_MAX_LAG', '5'))
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -103,7 +175,7 @@ STATICFILES_DIRS = [
 
 # Настройки REST Framework
 REST_FRAMEWORK = {
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'courses.pagination.KeysetPagination',
     'PAGE_SIZE': 10,
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
@@ -111,16 +183,47 @@ REST_FRAMEWORK = {
 }
 
 # Настройки кэширования
+# default — двухуровневый кэш: LRU в памяти процесса перед общим для всех воркеров бэкендом.
+# В продакшн-среде общий уровень задается переменными окружения (например, Redis или Memcached),
+# для разработки и тестов используется файловый кэш с атомарными add/incr.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',  # Используем локальный кэш
-        'LOCATION': 'unique-snowflake',
-    }
+        'BACKEND': 'courses.cache_backends.TwoTierCache',
+        'OPTIONS': {
+            'L2': 'shared',
+            'L1_TIMEOUT': int(os.getenv('DJANGO_L1_CACHE_TIMEOUT', '5')),
+            'L1_MAX_ENTRIES': 1000,
+            'L1_MAX_BYTES': 16 * 1024 * 1024,
+            'SYNC_INTERVAL': 0.5,
+        },
+    },
+    'shared': {
+        'BACKEND': os.getenv('DJANGO_SHARED_CACHE_BACKEND', 'courses.cache_backends.SharedFileCache'),
+        'LOCATION': os.getenv(
+            'DJANGO_SHARED_CACHE_LOCATION',
+            os.path.join(tempfile.gettempdir(), 'course_platform_cache'),
+        ),
+        # По умолчанию FileBasedCache хранит 300 файлов и при переполнении удаляет случайную треть,
+        # вместе с номерами поколений, блокировками и журналом инвалидации
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('DJANGO_SHARED_CACHE_MAX_ENTRIES', '100000')),
+        },
+    },
+}
+
+# Инструментирование запросов (courses.middleware.RequestLogMiddleware)
+# SAMPLE_RATE — доля запросов, для которых считаются SQL-запросы и обращения к кэшу;
+# запросы дольше SLOW_REQUEST_MS логируются всегда.
+REQUEST_INSTRUMENTATION = {
+    'SAMPLE_RATE': float(os.getenv('DJANGO_REQUEST_SAMPLE_RATE', '1.0')),
+    'SLOW_REQUEST_MS': int(os.getenv('DJANGO_SLOW_REQUEST_MS', '500')),
+    'SERVER_TIMING': os.getenv('DJANGO_SERVER_TIMING', 'true').lower() in ('1', 'true', 'yes'),
 }
 
 # Stripe Configuration
 STRIPE_SECRET_KEY = os.getenv('STRIPE_SECRET_KEY', 'sk_test_4eC39HqLyjWDarjtT1zdp7dc')
 STRIPE_PUBLISHABLE_KEY = os.getenv('STRIPE_PUBLISHABLE_KEY', 'pk_test_TYooMQauvdEDq54NiTphI7jx')
+STRIPE_WEBHOOK_SECRET = os.getenv('STRIPE_WEBHOOK_SECRET', '')
 
 # Email Configuration
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
@@ -90,6 +90,8 @@ class ContactMessageAdmin(admin.ModelAdmin):
     list_display = ('id', 'name', 'email', 'phone_number', 'message')
     search_fields = ('name', 'email')
     list_filter = ('email',)
+    date_hierarchy = 'received_at'
+    ordering = ('-received_at',)
 
 
 @admin.register(Payment)
@@ -0,0 +1,245 @@
+import asyncio
+import json
+import logging
+import re
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connections
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .models import Course
+from .synthetic import generate
+
+# Инициализация логгера для нагрузочных тестов
+logger = logging.getLogger(__name__)
+
+# Префикс имен пользователей и названий курсов, созданных для замеров
+BENCHMARK_PREFIX = 'bench'
+
+# Объемы данных по умолчанию
+DEFAULT_VOLUMES = {
+    'courses': 200,
+    'students': 1000,
+    'enrollments_per_student': 5,
+    'reviews_per_course': 10,
+}
+
+# Число запросов из заголовка Server-Timing, который выставляет RequestLogMiddleware
+SERVER_TIMING_QUERIES = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+
+def benchmark_user():
+    return User.objects.filter(username=f'{BENCHMARK_PREFIX}_student_0').first()
+
+
+def seed(volumes=None, seed=0):
+    """
+    Создает данные для замеров генератором синтетических данных: курсы, студентов,
+    записи, отзывы, платежи и прогресс. Повторный вызов ничего не делает, если данные уже есть.
+    Возвращает количество созданных курсов.
+    """
+    if benchmark_user() is not None:
+        return 0
+    counts = generate(prefix=BENCHMARK_PREFIX, seed=seed, **{**DEFAULT_VOLUMES, **(volumes or {})})
+    logger.info(f"Benchmark data seeded: {counts['courses']} courses, {counts['enrollments']} enrollments.")
+    return counts['courses']
+
+
+def scenarios():
+    """
+    Сценарии замеров: имя -> (путь, нужна ли аутентификация).
+    """
+    course_id, instructor_id = Course.objects.filter(instructor__username__startswith=f'{BENCHMARK_PREFIX}_teacher_') \
+                                             .order_by('id').values_list('id', 'instructor_id').first() or (1, 1)
+    return {
+        'home': ('/', False),
+        'api_courses': ('/api/courses/', False),
+        'all_courses': ('/courses/all/', False),
+        'course_details': (f'/courses/{course_id}/', False),
+        'instructor_courses': (f'/courses/instructor/{instructor_id}/', False),
+        'faqs': ('/faqs/', False),
+        'api_progress': ('/api/progress/', True),
+    }
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+class _InProcessTransport:
+    # Запросы выполняются тестовым клиентом Django в текущем процессе, без сетевого сервера
+    def __init__(self, headers):
+        self.client = Client(SERVER_NAME='localhost', **headers)
+
+    def get(self, path):
+        response = self.client.get(path)
+        return response.status_code, response.get('Server-Timing', '')
+
+
+def _http_headers(headers):
+    # HTTP_AUTHORIZATION -> Authorization
+    return {name[5:].replace('_', '-').title(): value for name, value in headers.items()}
+
+
+class _AsgiTransport:
+    # Запросы проходят через ASGI-обработчик в цикле событий текущего процесса, как под uvicorn
+    def __init__(self, headers):
+        self.client = AsyncClient()
+        self.headers = _http_headers(headers)
+
+    async def get(self, path):
+        response = await self.client.get(path, headers=self.headers)
+        return response.status_code, response.get('Server-Timing', '')
+
+
+class _HttpTransport:
+    # Запросы к запущенному серверу по HTTP
+    def __init__(self, base_url, headers):
+        self.base_url = base_url.rstrip('/')
+        self.headers = _http_headers(headers)
+
+    def get(self, path):
+        request = urllib.request.Request(self.base_url + path, headers=self.headers)
+        try:
+            with urllib.request.urlopen(request) as response:
+                response.read()
+                return response.status, response.headers.get('Server-Timing', '')
+        except urllib.error.HTTPError as error:
+            return error.code, error.headers.get('Server-Timing', '')
+
+
+def _sample(elapsed, status, server_timing):
+    match = SERVER_TIMING_QUERIES.search(server_timing)
+    return elapsed, status, int(match.group(1)) if match else None
+
+
+def _run_client(make_transport, path, count):
+    transport = make_transport()
+    samples = []
+    for _ in range(count):
+        started = time.perf_counter()
+        status, server_timing = transport.get(path)
+        samples.append(_sample(time.perf_counter() - started, status, server_timing))
+    return samples
+
+
+async def _run_async_client(transport, path, count):
+    samples = []
+    for _ in range(count):
+        started = time.perf_counter()
+        status, server_timing = await transport.get(path)
+        samples.append(_sample(time.perf_counter() - started, status, server_timing))
+    return samples
+
+
+def _run_asgi_clients(make_transport, path, per_client):
+    # Все клиенты работают в одном цикле событий, без пула потоков
+    async def run():
+        chunks = await asyncio.gather(*(_run_async_client(make_transport(), path, count) for count in per_client))
+        return [sample for chunk in chunks for sample in chunk]
+    return async_to_sync(run)()
+
+
+def _run_client_in_thread(make_transport, path, count):
+    try:
+        return _run_client(make_transport, path, count)
+    finally:
+        # Соединения с БД открываются отдельно в каждом потоке
+        connections.close_all()
+
+
+def run_scenario(path, requests=200, concurrency=4, authenticated=False, base_url=None, warmup=5, asgi=False):
+    """
+    Выполняет запросы к пути из нескольких параллельных клиентов и возвращает
+    перцентили задержки в миллисекундах, среднее число SQL-запросов и пропускную способность.
+    При concurrency=1 запросы идут в текущем потоке. С asgi=True запросы проходят через
+    ASGI-обработчик, а параллельные клиенты — корутины в одном цикле событий.
+    """
+    headers = {}
+    if authenticated:
+        headers['HTTP_AUTHORIZATION'] = f'Bearer {AccessToken.for_user(benchmark_user())}'
+
+    def make_transport():
+        if base_url:
+            return _HttpTransport(base_url, headers)
+        if asgi:
+            return _AsgiTransport(headers)
+        return _InProcessTransport(headers)
+
+    # Число запросов к БД читается из Server-Timing, поэтому в замерах инструментирование включено всегда.
+    # AsyncClient отправляет запросы на хост testserver, вне тестов его нет в ALLOWED_HOSTS
+    with override_settings(REQUEST_INSTRUMENTATION={'SAMPLE_RATE': 1.0, 'SERVER_TIMING': True},
+                           ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+        if asgi and not base_url:
+            def run_clients(per_client):
+                return _run_asgi_clients(make_transport, path, per_client)
+        else:
+            def run_clients(per_client):
+                if len(per_client) == 1:
+                    return _run_client(make_transport, path, per_client[0])
+                with ThreadPoolExecutor(max_workers=len(per_client)) as executor:
+                    chunks = executor.map(lambda count: _run_client_in_thread(make_transport, path, count), per_client)
+                    return [sample for chunk in chunks for sample in chunk]
+
+        if warmup:
+            run_clients([warmup])
+
+        per_client = [requests // concurrency + (n < requests % concurrency) for n in range(concurrency)]
+        started = time.perf_counter()
+        samples = run_clients(per_client)
+        wall_time = time.perf_counter() - started
+
+    latencies = sorted(elapsed * 1000 for elapsed, _, _ in samples)
+    queries = [count for _, _, count in samples if count is not None]
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for _, status, _ in samples if status >= 400),
+        'p50_ms': round(_percentile(latencies, 0.50), 2),
+        'p95_ms': round(_percentile(latencies, 0.95), 2),
+        'p99_ms': round(_percentile(latencies, 0.99), 2),
+        'queries_per_request': round(sum(queries) / len(queries), 2) if queries else None,
+        'throughput_rps': round(len(samples) / wall_time, 1) if wall_time else 0.0,
+    }
+
+
+def load_baseline(path):
+    with open(path, encoding='utf-8') as baseline_file:
+        return json.load(baseline_file)
+
+
+def save_baseline(path, results):
+    with open(path, 'w', encoding='utf-8') as baseline_file:
+        json.dump(results, baseline_file, indent=2, sort_keys=True)
+
+
+def find_regressions(results, baseline, threshold=0.2):
+    """
+    Сравнивает результаты с базовыми. Регрессия — рост p95, p99 или числа запросов
+    либо падение пропускной способности больше чем на threshold (доля).
+    Возвращает список описаний регрессий.
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        for metric in ('p95_ms', 'p99_ms', 'queries_per_request'):
+            current, previous = result.get(metric), base.get(metric)
+            if current is not None and previous is not None and current > previous * (1 + threshold):
+                regressions.append(f"{name}: {metric} {previous} -> {current}")
+        current, previous = result.get('throughput_rps'), base.get('throughput_rps')
+        if previous and current < previous * (1 - threshold):
+            regressions.append(f"{name}: throughput_rps {previous} -> {current}")
+        if result.get('errors', 0) > base.get('errors', 0):
+            regressions.append(f"{name}: errors {base.get('errors', 0)} -> {result['errors']}")
+    return regressions
@@ -0,0 +1,384 @@
+import os
+import pickle
+import tempfile
+import threading
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.filebased import FileBasedCache
+
+from .instrumentation import record_cache_lookup
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Ключи журнала инвалидации в общем кэше
+INVALIDATION_SEQ_KEY = 'l1_invalidation:seq'
+INVALIDATION_ENTRY_KEY = 'l1_invalidation:{}'
+INVALIDATION_ENTRY_TIMEOUT = 300
+CLEAR_MARKER = '*'
+
+# Хранилища L1 общие для всех потоков процесса, как у LocMemCache
+_l1_stores = {}
+_l1_stores_lock = threading.Lock()
+
+
+class _L1Store:
+    """
+    Ограниченный LRU-кэш процесса с TTL и вытеснением по количеству и размеру записей.
+    Значения хранятся сериализованными, чтобы вызывающий код не мог изменить кэш по ссылке.
+    """
+
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+        # Состояние синхронизации с журналом инвалидации
+        self.origin = uuid.uuid4().hex
+        self.last_seq = None
+        self.next_sync = 0.0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires_at, data = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                return None
+            self.entries.move_to_end(key)
+        return data
+
+    def set(self, key, data, timeout):
+        if len(data) > self.max_bytes:
+            self.delete(key)
+            return
+        with self.lock:
+            self._remove(key)
+            self.entries[key] = (time.monotonic() + timeout, data)
+            self.size += len(data)
+            while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+
+    def delete(self, key):
+        with self.lock:
+            return self._remove(key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def _remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return False
+        self.size -= len(entry[1])
+        return True
+
+
+class TwoTierCache(BaseCache):
+    """
+    Двухуровневый кэш: L1 — LRU в памяти процесса, L2 — общий для всех воркеров
+    бэкенд из settings.CACHES. Запись и удаление публикуются в журнал инвалидации
+    в L2, который остальные процессы читают не чаще SYNC_INTERVAL секунд, поэтому
+    устаревшее значение в L1 живет не дольше этого интервала (и не дольше L1_TIMEOUT).
+
+    Параметры OPTIONS:
+        L2 — алиас общего кэша (по умолчанию 'shared');
+        L1_TIMEOUT — время жизни записи в L1 в секундах;
+        L1_MAX_ENTRIES, L1_MAX_BYTES — ограничения размера L1;
+        SYNC_INTERVAL — период чтения журнала инвалидации;
+        MAX_SYNC_ENTRIES — при большем отставании L1 очищается целиком.
+    """
+
+    def __init__(self, location, params):
+        options = dict(params.get('OPTIONS', {}))
+        self._l2_alias = options.pop('L2', 'shared')
+        self._l1_timeout = options.pop('L1_TIMEOUT', 5)
+        self._sync_interval = options.pop('SYNC_INTERVAL', 0.5)
+        self._max_sync_entries = options.pop('MAX_SYNC_ENTRIES', 500)
+        max_entries = options.pop('L1_MAX_ENTRIES', 1000)
+        max_bytes = options.pop('L1_MAX_BYTES', 16 * 1024 * 1024)
+        super().__init__({**params, 'OPTIONS': options})
+
+        store_name = location or self._l2_alias
+        with _l1_stores_lock:
+            self._l1 = _l1_stores.setdefault(store_name, _L1Store(max_entries, max_bytes))
+
+    @property
+    def _l2(self):
+        # Экземпляры бэкендов создаются отдельно для каждого потока
+        return caches[self._l2_alias]
+
+    # Журнал инвалидации
+    def _publish(self, *keys):
+        l2 = self._l2
+        try:
+            seq = l2.incr(INVALIDATION_SEQ_KEY)
+        except ValueError:
+            l2.add(INVALIDATION_SEQ_KEY, 0, None)
+            seq = l2.incr(INVALIDATION_SEQ_KEY)
+        l2.set(INVALIDATION_ENTRY_KEY.format(seq), (self._l1.origin, keys), INVALIDATION_ENTRY_TIMEOUT)
+
+    def _sync(self):
+        store = self._l1
+        now = time.monotonic()
+        if now < store.next_sync:
+            return
+        store.next_sync = now + self._sync_interval
+
+        l2 = self._l2
+        seq = l2.get(INVALIDATION_SEQ_KEY, 0)
+        last_seq, store.last_seq = store.last_seq, seq
+        if last_seq is None or seq == last_seq:
+            return
+        if seq < last_seq or seq - last_seq > self._max_sync_entries:
+            store.clear()
+            return
+
+        entry_keys = [INVALIDATION_ENTRY_KEY.format(n) for n in range(last_seq + 1, seq + 1)]
+        entries = l2.get_many(entry_keys)
+        if len(entries) < len(entry_keys):
+            # Часть журнала уже вытеснена — безопаснее очистить L1
+            store.clear()
+            return
+        for origin, keys in entries.values():
+            if origin == store.origin:
+                continue
+            if CLEAR_MARKER in keys:
+                store.clear()
+                return
+            for key in keys:
+                store.delete(key)
+
+    # Вспомогательные методы L1
+    def _l1_timeout_for(self, timeout):
+        timeout = self.get_backend_timeout(timeout)
+        if timeout is None:
+            return self._l1_timeout
+        return min(timeout, self._l1_timeout)
+
+    def _l1_set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        l1_timeout = self._l1_timeout_for(timeout)
+        l1_key = self.make_and_validate_key(key, version=version)
+        if l1_timeout <= 0:
+            self._l1.delete(l1_key)
+            return
+        self._l1.set(l1_key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), l1_timeout)
+
+    def _l1_get(self, key, version=None):
+        data = self._l1.get(self.make_and_validate_key(key, version=version))
+        if data is None:
+            return None, False
+        return pickle.loads(data), True
+
+    # API кэша Django
+    def get(self, key, default=None, version=None):
+        self._sync()
+        value, found = self._l1_get(key, version)
+        if found:
+            record_cache_lookup(1)
+            return value
+
+        sentinel = object()
+        value = self._l2.get(key, sentinel, version=version)
+        if value is sentinel:
+            record_cache_lookup(0, 1)
+            return default
+        record_cache_lookup(1)
+        self._l1_set(key, value, version=version)
+        return value
+
+    def get_many(self, keys, version=None):
+        self._sync()
+        result = {}
+        missing = []
+        for key in keys:
+            value, found = self._l1_get(key, version)
+            if found:
+                result[key] = value
+            else:
+                missing.append(key)
+
+        missed = 0
+        if missing:
+            fetched = self._l2.get_many(missing, version=version)
+            for key, value in fetched.items():
+                self._l1_set(key, value, version=version)
+            result.update(fetched)
+            missed = len(missing) - len(fetched)
+        record_cache_lookup(len(result), missed)
+        return result
+
+    # Асинхронное чтение: попадание в L1 обслуживается прямо в цикле событий,
+    # а обращения к L2 и чтение журнала инвалидации выполняются в потоке
+    def _sync_due(self):
+        return time.monotonic() >= self._l1.next_sync
+
+    async def aget(self, key, default=None, version=None):
+        if not self._sync_due():
+            value, found = self._l1_get(key, version)
+            if found:
+                record_cache_lookup(1)
+                return value
+        return await sync_to_async(self.get)(key, default, version)
+
+    async def aget_many(self, keys, version=None):
+        keys = list(keys)
+        if not self._sync_due():
+            result = {}
+            for key in keys:
+                value, found = self._l1_get(key, version)
+                if not found:
+                    break
+                result[key] = value
+            else:
+                record_cache_lookup(len(result))
+                return result
+        return await sync_to_async(self.get_many)(keys, version)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._l2.set(key, value, timeout, version=version)
+        self._l1_set(key, value, timeout, version)
+        self._publish(self.make_and_validate_key(key, version=version))
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self._l2.set_many(data, timeout, version=version)
+        for key, value in data.items():
+            if key not in failed:
+                self._l1_set(key, value, timeout, version)
+        if data:
+            self._publish(*(self.make_and_validate_key(key, version=version) for key in data))
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        # Атомарность обеспечивает общий кэш, поэтому L1 не заполняется
+        added = self._l2.add(key, value, timeout, version=version)
+        if added:
+            l1_key = self.make_and_validate_key(key, version=version)
+            self._l1.delete(l1_key)
+            self._publish(l1_key)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._l2.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        l1_key = self.make_and_validate_key(key, version=version)
+        self._l1.delete(l1_key)
+        deleted = self._l2.delete(key, version=version)
+        self._publish(l1_key)
+        return deleted
+
+    def delete_many(self, keys, version=None):
+        l1_keys = [self.make_and_validate_key(key, version=version) for key in keys]
+        for l1_key in l1_keys:
+            self._l1.delete(l1_key)
+        self._l2.delete_many(keys, version=version)
+        if l1_keys:
+            self._publish(*l1_keys)
+
+    def has_key(self, key, version=None):
+        self._sync()
+        if self._l1.get(self.make_and_validate_key(key, version=version)) is not None:
+            return True
+        return self._l2.has_key(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        value = self._l2.incr(key, delta, version=version)
+        l1_key = self.make_and_validate_key(key, version=version)
+        self._l1.delete(l1_key)
+        self._publish(l1_key)
+        return value
+
+    def decr(self, key, delta=1, version=None):
+        return self.incr(key, -delta, version=version)
+
+    def clear(self):
+        self._l2.clear()
+        self._l1.clear()
+        self._l1.last_seq = None
+        self._publish(CLEAR_MARKER)
+
+    def close(self, **kwargs):
+        self._l2.close(**kwargs)
+
+
+class SharedFileCache(FileBasedCache):
+    """
+    Файловый кэш с атомарными add() и incr() между процессами.
+    Используется как общий уровень L2 при локальной разработке и в тестах.
+    """
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        if self.has_key(key, version=version):
+            return False
+
+        fname = self._key_to_file(key, version)
+        self._createdir()
+        fd, tmp_path = tempfile.mkstemp(dir=self._dir)
+        try:
+            with open(fd, 'wb') as f:
+                self._write_content(f, timeout, value)
+            # Жесткая ссылка создается атомарно и не перезаписывает существующий файл
+            os.link(tmp_path, fname)
+            return True
+        except FileExistsError:
+            return False
+        finally:
+            os.remove(tmp_path)
+
+    def _cull(self):
+        # Сначала удаляются истекшие файлы, в основном записи журнала инвалидации.
+        # Случайная треть, как в FileBasedCache, удаляется только если живых записей все еще больше лимита
+        filelist = self._list_cache_files()
+        if len(filelist) < self._max_entries:
+            return
+        for fname in filelist:
+            try:
+                with open(fname, 'rb') as f:
+                    self._is_expired(f)
+            except FileNotFoundError:
+                pass
+        super()._cull()
+
+    def incr(self, key, delta=1, version=None):
+        if fcntl is None:
+            return self._incr(key, delta, version)
+
+        self._createdir()
+        with open(os.path.join(self._dir, 'incr.lock'), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                return self._incr(key, delta, version)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _incr(self, key, delta, version):
+        # В отличие от BaseCache.incr, сохраняет исходный срок жизни ключа
+        fname = self._key_to_file(key, version)
+        try:
+            with open(fname, 'rb') as f:
+                if self._is_expired(f):
+                    raise ValueError("Key '%s' not found" % key)
+                f.seek(0)
+                expiry = pickle.load(f)
+                value = pickle.loads(zlib.decompress(f.read()))
+        except FileNotFoundError:
+            raise ValueError("Key '%s' not found" % key)
+
+        timeout = None if expiry is None else max(expiry - time.time(), 0.001)
+        new_value = value + delta
+        self.set(key, new_value, timeout, version=version)
+        return new_value
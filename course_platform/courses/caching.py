@@ -0,0 +1,253 @@
+import logging
+import math
+import random
+import threading
+import time
+from collections import Counter
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import connections
+
+# Инициализация логгера для отслеживания поколений кэша
+logger = logging.getLogger(__name__)
+
+# Префикс ключей, в которых хранятся номера поколений
+VERSION_KEY_PREFIX = 'cache_version'
+
+# Параметры заполнения кэша по умолчанию
+FILL_LOCK_TIMEOUT = 30
+FILL_WAIT_TIMEOUT = 5.0
+FILL_POLL_INTERVAL = 0.05
+EARLY_REFRESH_BETA = 1.0
+
+# Счетчики заполнения кэша в пределах процесса
+_fill_stats = Counter()
+_fill_stats_lock = threading.Lock()
+
+
+def _version_key(scope):
+    return f'{VERSION_KEY_PREFIX}:{scope}'
+
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+
+def get_versions(*scopes):
+    """
+    Возвращает номера поколений для переданных областей за одно обращение к кэшу.
+    Отсутствующее поколение инициализируется текущим временем в миллисекундах,
+    поэтому после вытеснения ключа номер не вернется к уже использованному значению.
+    """
+    keys = {scope: _version_key(scope) for scope in scopes}
+    found = cache.get_many(list(keys.values()))
+
+    versions = {}
+    for scope, key in keys.items():
+        version = found.get(key)
+        if version is None:
+            # Ключ поколения хранится бессрочно
+            cache.add(key, _now_ms(), None)
+            version = cache.get(key, _now_ms())
+        versions[scope] = version
+    return versions
+
+
+def bump_version(scope):
+    """
+    Переводит область на новое поколение, делая недействительными все ключи,
+    построенные на старом номере. Номер растет не медленнее часов, чтобы по нему
+    можно было судить о времени последнего изменения.
+    """
+    key = _version_key(scope)
+    current = cache.get(key)
+
+    if current is None:
+        if cache.add(key, _now_ms(), None):
+            return
+        current = cache.get(key, 0)
+
+    try:
+        cache.incr(key, max(1, _now_ms() - current))
+    except ValueError:
+        # Ключ вытеснен между чтением и инкрементом
+        cache.set(key, _now_ms(), None)
+
+
+def bump_versions(*scopes):
+    """
+    Переводит на новое поколение сразу несколько областей.
+    """
+    for scope in dict.fromkeys(scopes):
+        bump_version(scope)
+    logger.debug("Cache generations bumped: %s", ', '.join(map(str, scopes)))
+
+
+async def aget_versions(*scopes):
+    """
+    Асинхронный вариант get_versions. Если какого-то поколения нет в кэше,
+    инициализация выполняется синхронной версией в потоке.
+    """
+    keys = {scope: _version_key(scope) for scope in scopes}
+    found = await cache.aget_many(list(keys.values()))
+    if any(found.get(key) is None for key in keys.values()):
+        return await sync_to_async(get_versions)(*scopes)
+    return {scope: found[key] for scope, key in keys.items()}
+
+
+def _stamp_key(base_key, scopes, versions):
+    stamp = '.'.join(str(versions[scope]) for scope in scopes)
+    return f'{base_key}:v{stamp}'
+
+
+def versioned_key(base_key, *scopes):
+    """
+    Строит ключ кэша, включающий номера поколений всех областей, от которых зависят данные.
+    """
+    return _stamp_key(base_key, scopes, get_versions(*scopes))
+
+
+async def aversioned_key(base_key, *scopes):
+    return _stamp_key(base_key, scopes, await aget_versions(*scopes))
+
+
+def _record(name, amount=1):
+    with _fill_stats_lock:
+        _fill_stats[name] += amount
+
+
+def get_fill_stats():
+    """
+    Возвращает счетчики заполнения кэша: попадания, пересчеты, ранние обновления,
+    ожидания чужого пересчета и суммарное время ожидания в секундах.
+    """
+    with _fill_stats_lock:
+        return dict(_fill_stats)
+
+
+def reset_fill_stats():
+    with _fill_stats_lock:
+        _fill_stats.clear()
+
+
+def _lock_key(key):
+    return f'{key}:lock'
+
+
+def _should_refresh_early(expires_at, delta, beta, now):
+    """
+    Вероятностное раннее обновление (XFetch): чем ближе срок истечения и чем дороже
+    пересчет, тем выше шанс, что запрос обновит ключ заранее.
+    """
+    if beta <= 0:
+        return False
+    return now - delta * beta * math.log(1.0 - random.random()) >= expires_at
+
+
+def _fill(key, compute, timeout, stale_timeout):
+    """
+    Пересчитывает значение и сохраняет его вместе со сроком логического истечения
+    и длительностью пересчета. Физически ключ живет дольше, чтобы во время
+    следующего пересчета остальные запросы могли получить устаревшее значение.
+    """
+    started = time.monotonic()
+    value = compute()
+    delta = time.monotonic() - started
+
+    cache.set(key, (value, time.time() + timeout, delta), timeout + stale_timeout)
+    _record('recomputes')
+    _record('recompute_time', delta)
+    return value
+
+
+def _fill_locked(key, compute, timeout, stale_timeout):
+    try:
+        return _fill(key, compute, timeout, stale_timeout)
+    finally:
+        cache.delete(_lock_key(key))
+
+
+def _refresh_in_background(key, compute, timeout, stale_timeout, lock_timeout):
+    if not cache.add(_lock_key(key), 1, lock_timeout):
+        # Ключ уже обновляет другой процесс
+        return
+
+    def run():
+        try:
+            _fill_locked(key, compute, timeout, stale_timeout)
+        except Exception:
+            logger.exception("Background refresh of cache key %s failed.", key)
+        finally:
+            connections.close_all()
+
+    _record('early_refreshes')
+    threading.Thread(target=run, name=f'cache-refresh:{key}', daemon=True).start()
+
+
+def get_or_compute(key, compute, timeout, stale_timeout=None, beta=EARLY_REFRESH_BETA,
+                   lock_timeout=FILL_LOCK_TIMEOUT, wait_timeout=FILL_WAIT_TIMEOUT):
+    """
+    Получение значения из кэша с защитой от одновременного пересчета.
+    Пересчитывает значение только один процесс: остальные получают устаревшее
+    значение, если оно есть, или ждут результата. Горячие ключи обновляются
+    в фоне до истечения срока.
+    """
+    if stale_timeout is None:
+        stale_timeout = timeout
+
+    entry = cache.get(key)
+    now = time.time()
+
+    if entry is not None:
+        value, expires_at, delta = entry
+        if now < expires_at:
+            _record('hits')
+            if _should_refresh_early(expires_at, delta, beta, now):
+                _refresh_in_background(key, compute, timeout, stale_timeout, lock_timeout)
+            return value
+
+        if cache.add(_lock_key(key), 1, lock_timeout):
+            return _fill_locked(key, compute, timeout, stale_timeout)
+
+        # Пересчет уже идет в другом процессе
+        _record('stale_served')
+        return value
+
+    _record('misses')
+    if cache.add(_lock_key(key), 1, lock_timeout):
+        return _fill_locked(key, compute, timeout, stale_timeout)
+
+    # Ожидаем, пока другой процесс заполнит ключ
+    started = time.monotonic()
+    while time.monotonic() - started < wait_timeout:
+        time.sleep(FILL_POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            _record('waits')
+            _record('wait_time', time.monotonic() - started)
+            return entry[0]
+
+    # Пересчитывающий процесс не успел: считаем сами, не дожидаясь блокировки
+    _record('wait_timeouts')
+    _record('wait_time', time.monotonic() - started)
+    logger.warning("Timed out waiting for cache fill of %s, recomputing.", key)
+    return _fill(key, compute, timeout, stale_timeout)
+
+
+async def aget_or_compute(key, compute, timeout, **kwargs):
+    """
+    Асинхронный вариант get_or_compute для асинхронных представлений. Свежее значение
+    читается из кэша без перехода в поток. Пересчет, ожидание чужого пересчета
+    и раннее обновление выполняет синхронная версия в потоке: compute использует
+    синхронный ORM и вызывается там же.
+    """
+    entry = await cache.aget(key)
+    if entry is not None:
+        value, expires_at, delta = entry
+        now = time.time()
+        if now < expires_at and not _should_refresh_early(
+                expires_at, delta, kwargs.get('beta', EARLY_REFRESH_BETA), now):
+            _record('hits')
+            return value
+    return await sync_to_async(get_or_compute)(key, compute, timeout, **kwargs)
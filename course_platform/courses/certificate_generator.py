@@ -1,34 +1,130 @@
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
-import os
+from datetime import date
+from functools import lru_cache
+import io
 
-def generate_certificate(student_name, course_title, certificate_path):
-    # Создание PDF-документа
-    c = canvas.Canvas(certificate_path, pagesize=letter)
-    width, height = letter
 
-    # Настройка шрифтов и текста
+def draw_static_layer(c, width, height, course_title=None):
+    """
+    Элементы страницы, общие для всех сертификатов шаблона.
+    Если передано название курса, оно тоже становится частью статического слоя.
+    """
     c.setFont("Helvetica-Bold", 24)
     c.drawCentredString(width / 2, height - 100, "СЕРТИФИКАТ О ЗАВЕРШЕНИИ КУРСА")
-    
-    c.setFont("Helvetica", 18)
-    c.drawCentredString(width / 2, height - 200, f"Настоящим подтверждается, что студент {student_name}")
-    
+
     c.setFont("Helvetica-Bold", 20)
     c.drawCentredString(width / 2, height - 250, f"успешно завершил курс")
-    
-    c.setFont("Helvetica", 22)
-    c.drawCentredString(width / 2, height - 300, f"\"{course_title}\"")
-    
+
+    if course_title is not None:
+        draw_course_title(c, width, height, course_title)
+
     c.setFont("Helvetica", 16)
     c.drawCentredString(width / 2, height - 400, "Данный сертификат выдан в знак успешного завершения курса.")
-    
+
     # Заключительные элементы оформления
     c.setFont("Helvetica", 14)
     c.drawString(100, 50, "Подпись инструктора:")
-    c.drawString(100, 30, "Дата выдачи: __________________")
 
-    # Завершение и сохранение файла
+
+def draw_course_title(c, width, height, course_title):
+    c.setFont("Helvetica", 22)
+    c.drawCentredString(width / 2, height - 300, f"\"{course_title}\"")
+
+
+def draw_student_layer(c, width, height, student_name, issued_on):
+    """
+    Элементы, которые меняются для каждого студента: имя и дата выдачи.
+    """
+    c.setFont("Helvetica", 18)
+    c.drawCentredString(width / 2, height - 200, f"Настоящим подтверждается, что студент {student_name}")
+
+    c.setFont("Helvetica", 14)
+    c.drawString(100, 30, f"Дата выдачи: {issued_on:%d.%m.%Y}")
+
+
+class CertificateTemplate:
+    """
+    Шаблон сертификата с заранее подготовленным статическим слоем.
+    Команды PDF статического слоя (шрифты, позиции строк уже вычислены) записываются
+    один раз и копируются в каждую новую страницу, после чего поверх рисуются
+    только поля конкретного студента. Используются внутренние атрибуты ReportLab
+    (_code, _doc.fontMapping); совпадение с render_certificate_uncached проверяется тестами.
+    """
+
+    def __init__(self, course_title=None, pagesize=letter):
+        self.course_title = course_title
+        self.pagesize = pagesize
+        self.width, self.height = pagesize
+
+        recorder = canvas.Canvas(io.BytesIO(), pagesize=pagesize)
+        start = len(recorder._code)
+        draw_static_layer(recorder, self.width, self.height, course_title)
+        self._static_code = recorder._code[start:]
+        # Внутренние имена шрифтов (/F1, /F2 ...) в записанных командах зависят от порядка регистрации
+        self._fonts = sorted(recorder._doc.fontMapping.items(), key=lambda item: int(item[1][2:]))
+
+    def _apply_static_layer(self, c):
+        for font_name, internal_name in self._fonts:
+            if c._doc.getInternalFontName(font_name) != internal_name:
+                # Порядок шрифтов не совпал — рисуем статический слой заново
+                draw_static_layer(c, self.width, self.height, self.course_title)
+                return
+        c._code.extend(self._static_code)
+
+    def render(self, student_name, course_title=None, output=None, issued_on=None):
+        """
+        Рисует сертификат в output: путь к файлу или файловый объект.
+        Если output не передан, возвращает содержимое PDF в виде bytes.
+        Шаблону без названия курса название нужно передать при вызове.
+        """
+        if self.course_title is None and course_title is None:
+            raise ValueError("course_title is required for a template without a course title.")
+        buffer = io.BytesIO() if output is None else None
+        c = canvas.Canvas(buffer or output, pagesize=self.pagesize)
+
+        self._apply_static_layer(c)
+        if self.course_title is None:
+            draw_course_title(c, self.width, self.height, course_title)
+        draw_student_layer(c, self.width, self.height, student_name, issued_on or date.today())
+
+        c.showPage()
+        c.save()
+        return buffer.getvalue() if buffer is not None else output
+
+
+@lru_cache(maxsize=128)
+def get_certificate_template(course_title=None):
+    """
+    Шаблон сертификата для курса; кэшируется в пределах процесса.
+    """
+    return CertificateTemplate(course_title)
+
+
+def render_certificate(student_name, course_title, output=None, issued_on=None):
+    """
+    Генерация сертификата через кэшированный шаблон курса.
+    output — путь или файловый объект; без него возвращает bytes.
+    """
+    return get_certificate_template(course_title).render(student_name, output=output, issued_on=issued_on)
+
+
+def render_certificate_uncached(student_name, course_title, output=None, issued_on=None):
+    """
+    Генерация всей страницы с нуля без шаблона. Используется для сравнения в бенчмарке.
+    """
+    buffer = io.BytesIO() if output is None else None
+    c = canvas.Canvas(buffer or output, pagesize=letter)
+    width, height = letter
+
+    draw_static_layer(c, width, height, course_title)
+    draw_student_layer(c, width, height, student_name, issued_on or date.today())
+
     c.showPage()
     c.save()
-    return certificate_path
+    return buffer.getvalue() if buffer is not None else output
+
+
+def generate_certificate(student_name, course_title, certificate_path, issued_on=None):
+    # Создание PDF-документа по шаблону курса
+    return render_certificate(student_name, course_title, certificate_path, issued_on)
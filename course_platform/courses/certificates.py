@@ -0,0 +1,196 @@
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.db.models import Exists, F, OuterRef
+from django.template.loader import render_to_string
+from django.utils.html import strip_tags
+from django.utils.text import get_valid_filename
+
+from .certificate_generator import generate_certificate
+from .models import Certificate, CourseProgress
+from .outbox import build_email, enqueue_emails
+
+# Инициализация логгера для очереди сертификатов
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_MAX_ATTEMPTS = 3
+
+
+def certificate_filename(student_name, course_title):
+    return get_valid_filename(f"{student_name}_{course_title}_certificate.pdf")
+
+
+def render_job(job):
+    """
+    Генерация одного PDF. Выполняется в дочернем процессе и не обращается к базе данных,
+    поэтому принимает и возвращает только простые значения.
+    """
+    try:
+        os.makedirs(os.path.dirname(job['path']), exist_ok=True)
+        generate_certificate(job['student_name'], job['course_title'], job['path'])
+        return job['id'], None
+    except Exception as e:
+        return job['id'], f"{type(e).__name__}: {e}"
+
+
+def claim_pending(batch_size=DEFAULT_BATCH_SIZE, queryset=None):
+    """
+    Переводит пакет ожидающих сертификатов в статус 'rendering' и возвращает задания для рендеринга.
+    """
+    queryset = Certificate.objects.all() if queryset is None else queryset
+    with transaction.atomic():
+        pending = queryset.filter(status='pending').order_by('id')
+        if connection.features.has_select_for_update_skip_locked:
+            pending = pending.select_for_update(skip_locked=True, of=('self',))
+        certificates = list(pending.select_related('student', 'course')[:batch_size])
+        Certificate.objects.filter(id__in=[c.id for c in certificates], status='pending') \
+                           .update(status='rendering', attempts=F('attempts') + 1)
+
+    certificates_dir = os.path.join(settings.MEDIA_ROOT, 'certificates')
+    jobs = []
+    for certificate in certificates:
+        filename = certificate_filename(certificate.student.username, certificate.course.title)
+        jobs.append({
+            'id': certificate.id,
+            'student_name': certificate.student.username,
+            'student_email': certificate.student.email,
+            'course_title': certificate.course.title,
+            'filename': filename,
+            'path': os.path.join(certificates_dir, filename),
+        })
+    return jobs
+
+
+def completion_email(job):
+    """
+    Письмо о завершении курса со ссылкой на готовый сертификат.
+    """
+    context = {
+        'student_name': job['student_name'],
+        'course_title': job['course_title'],
+        'certificate_url': f"{settings.SITE_URL}/media/certificates/{job['filename']}",
+    }
+    html_message = render_to_string('emails/course_completion.html', context)
+    return build_email(
+        "Поздравляем с завершением курса!",
+        strip_tags(html_message),
+        [job['student_email']],
+        html_message=html_message,
+    )
+
+
+def complete_jobs(jobs, results, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """
+    Сохраняет результаты рендеринга пакетом и ставит письма в очередь одним запросом.
+    Возвращает количество готовых сертификатов и сертификатов, исчерпавших попытки.
+    """
+    jobs_by_id = {job['id']: job for job in jobs}
+    errors = dict(results)
+
+    ready = [Certificate(id=job_id, status='ready', error=None,
+                         certificate_url=f"/media/certificates/{jobs_by_id[job_id]['filename']}")
+             for job_id, error in errors.items() if error is None]
+    failed_ids = [job_id for job_id, error in errors.items() if error is not None]
+
+    with transaction.atomic():
+        Certificate.objects.bulk_update(ready, ['status', 'error', 'certificate_url'])
+        for job_id in failed_ids:
+            logger.error(f"Certificate {job_id} rendering failed: {errors[job_id]}")
+            Certificate.objects.filter(id=job_id).update(error=errors[job_id], status='pending')
+        # Исчерпавшие попытки сертификаты больше не берутся в работу
+        failed = Certificate.objects.filter(id__in=failed_ids, attempts__gte=max_attempts).update(status='failed')
+        enqueue_emails([completion_email(jobs_by_id[c.id]) for c in ready if jobs_by_id[c.id]['student_email']])
+
+    return len(ready), failed
+
+
+def requeue_stale(queryset=None):
+    """
+    Возвращает в очередь сертификаты, оставшиеся в статусе 'rendering' после аварийной остановки воркера.
+    """
+    queryset = Certificate.objects.all() if queryset is None else queryset
+    return queryset.filter(status='rendering').update(status='pending')
+
+
+def create_missing_for_course(course_id, batch_size=1000):
+    """
+    Создает ожидающие сертификаты для всех завершивших курс студентов, у которых их еще нет.
+    Студенты выбираются одним запросом, записи создаются пакетами через bulk_create.
+    Возвращает количество созданных сертификатов.
+    """
+    student_ids = CourseProgress.objects.filter(course_id=course_id, is_completed=True) \
+        .exclude(Exists(Certificate.objects.filter(student_id=OuterRef('student_id'), course_id=course_id))) \
+        .values_list('student_id', flat=True)
+
+    created = 0
+    batch = []
+    for student_id in student_ids.iterator(chunk_size=batch_size):
+        batch.append(student_id)
+        if len(batch) >= batch_size:
+            created += _create_batch(course_id, batch)
+            batch = []
+    if batch:
+        created += _create_batch(course_id, batch)
+    return created
+
+
+def _create_batch(course_id, student_ids):
+    """
+    Создает сертификаты пакетом и возвращает число действительно добавленных строк.
+    bulk_create с ignore_conflicts возвращает все переданные объекты, включая пропущенные
+    из-за конфликта (сертификат успел создать сигнал), поэтому считаем по разнице строк.
+    """
+    existing = Certificate.objects.filter(course_id=course_id, student_id__in=student_ids)
+    before = existing.count()
+    Certificate.objects.bulk_create(
+        [Certificate(student_id=student_id, course_id=course_id) for student_id in student_ids],
+        ignore_conflicts=True,
+    )
+    return existing.count() - before
+
+
+def process_pending(workers=None, batch_size=DEFAULT_BATCH_SIZE, max_attempts=DEFAULT_MAX_ATTEMPTS,
+                    queryset=None, executor=None, on_batch=None):
+    """
+    Обрабатывает очередь сертификатов, пока в ней есть ожидающие записи.
+    PDF рендерятся параллельно в пуле процессов, база данных используется только в родительском процессе.
+    on_batch вызывается после каждого пакета с текущей статистикой.
+    Возвращает словарь со статистикой: готовые, неудачные, время работы.
+    """
+    started = time.monotonic()
+    stats = {'ready': 0, 'failed': 0}
+
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=workers or os.cpu_count())
+    # При fork пул создает все процессы при первой отправке задач, а claim_pending к этому
+    # времени уже открыл соединение. Его закрывают прямо перед первым map, чтобы
+    # дочерние процессы не унаследовали соединение с базой данных
+    forked = not own_executor
+
+    try:
+        while True:
+            jobs = claim_pending(batch_size, queryset)
+            if not jobs:
+                break
+            if not forked:
+                connections.close_all()
+                forked = True
+            results = list(executor.map(render_job, jobs))
+            ready, failed = complete_jobs(jobs, results, max_attempts)
+            stats['ready'] += ready
+            stats['failed'] += failed
+            logger.info(f"Certificates batch done: {ready} ready, {failed} failed.")
+            if on_batch:
+                on_batch({**stats, 'elapsed': time.monotonic() - started})
+    finally:
+        if own_executor:
+            executor.shutdown()
+
+    stats['elapsed'] = time.monotonic() - started
+    return stats
@@ -0,0 +1,48 @@
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .db_routing import primary_reads
+from .services import replica_may_lag, resource_validators
+
+
+def not_modified(request, etag, last_modified):
+    """
+    Проверяет If-None-Match и If-Modified-Since. Возвращает ответ 304 (или 412 для
+    If-Match), если клиент прислал актуальные валидаторы, иначе None.
+    """
+    return get_conditional_response(request, etag=quote_etag(etag), last_modified=int(last_modified.timestamp()))
+
+
+def set_validators(response, etag, last_modified):
+    """
+    Добавляет ETag и Last-Modified к успешному ответу и к ответу 304.
+    """
+    if response.status_code in (200, 304):
+        response.headers.setdefault('ETag', quote_etag(etag))
+        response.headers.setdefault('Last-Modified', http_date(last_modified.timestamp()))
+    return response
+
+
+class ConditionalListMixin:
+    """
+    Примесь для ViewSet: ETag и Last-Modified для списка по номерам поколений областей
+    validator_scopes (обязательный атрибут). Валидаторы считаются без сериализации,
+    поэтому неизмененный список отдается как 304 без запроса данных. Вызывается после
+    аутентификации, так что list_validators можно переопределить с учетом прав пользователя.
+    Пока с последнего изменения не прошло DATABASE_REPLICA_MAX_LAG, список читается
+    с основной базы: реплика могла еще не получить данные, на которые указывает ETag.
+    """
+
+    def list_validators(self, request):
+        return resource_validators(self.validator_scopes, request.get_full_path())
+
+    def list(self, request, *args, **kwargs):
+        etag, last_modified = self.list_validators(request)
+        response = not_modified(request, etag, last_modified)
+        if response is None:
+            if replica_may_lag(last_modified):
+                with primary_reads():
+                    response = super().list(request, *args, **kwargs)
+            else:
+                response = super().list(request, *args, **kwargs)
+        return set_validators(response, etag, last_modified)
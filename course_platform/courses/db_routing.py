@@ -0,0 +1,122 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+# Алиас реплики в settings.DATABASES
+REPLICA_ALIAS = 'replica'
+
+
+class _RoutingState:
+    """
+    Состояние маршрутизации в пределах запроса: разрешено ли читать с реплики
+    и была ли уже запись (после нее чтения закрепляются за основной базой).
+    """
+    __slots__ = ('replica', 'pinned')
+
+    def __init__(self, replica=False):
+        self.replica = replica
+        self.pinned = False
+
+
+_state = ContextVar('db_routing_state', default=None)
+
+
+@contextmanager
+def routing_scope():
+    """
+    Новое состояние маршрутизации, например на время одного HTTP-запроса.
+    """
+    token = _state.set(_RoutingState())
+    try:
+        yield
+    finally:
+        _state.reset(token)
+
+
+def allow_replica_reads():
+    """
+    Разрешает чтения с реплики до конца текущей области (запроса).
+    """
+    state = _state.get()
+    if state is not None:
+        state.replica = True
+
+
+@contextmanager
+def replica_reads():
+    """
+    Чтения внутри блока идут на реплику, если в текущей области еще не было записи.
+    Вне запроса (фоновые потоки, команды) блок создает собственную область.
+    """
+    state = _state.get()
+    if state is None:
+        token = _state.set(_RoutingState(replica=True))
+        try:
+            yield
+        finally:
+            _state.reset(token)
+        return
+
+    previous, state.replica = state.replica, True
+    try:
+        yield
+    finally:
+        state.replica = previous
+
+
+@contextmanager
+def primary_reads():
+    """
+    Чтения внутри блока идут на основную базу, даже если в текущей области разрешена реплика.
+    """
+    state = _state.get()
+    if state is None:
+        yield
+        return
+
+    previous, state.replica = state.replica, False
+    try:
+        yield
+    finally:
+        state.replica = previous
+
+
+class PrimaryReplicaRouter:
+    """
+    Маршрутизатор основной базы и реплики. Чтения уходят на реплику только там,
+    где это явно разрешено (replica_reads, allow_replica_reads) и только до первой
+    записи в той же области: после записи запрос читает свои изменения с основной базы.
+    """
+
+    def __init__(self):
+        self.replica = REPLICA_ALIAS if REPLICA_ALIAS in settings.DATABASES else None
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if self.replica and state is not None and state.replica and not state.pinned:
+            return self.replica
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.pinned = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплика содержит те же данные, что и основная база
+        return True
+
+
+class ReplicaReadMixin:
+    """
+    Примесь для ViewSet: действия из replica_actions читают с реплики.
+    Аутентификация и проверка прав выполняются до переключения, на основной базе.
+    """
+    replica_actions = ('list', 'retrieve')
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.action in self.replica_actions:
+            allow_replica_reads()
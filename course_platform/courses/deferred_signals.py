@@ -0,0 +1,90 @@
+import functools
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Режим обработки сигналов в текущем контексте: None — обычный, SUPPRESSED или пакет отложенных вызовов
+SUPPRESSED = object()
+_mode = ContextVar('signal_mode', default=None)
+
+
+class _Batch:
+    """
+    Отложенные вызовы обработчиков. Повторные сигналы для одного объекта схлопываются
+    в один вызов; флаг created сохраняется, если объект был создан внутри пакета.
+    """
+
+    def __init__(self):
+        self.calls = {}
+
+    def add(self, handler, sender, instance, kwargs):
+        calls = self.calls.setdefault(handler, {})
+        key = (sender, instance.pk) if instance.pk is not None else (sender, id(instance))
+        previous = calls.pop(key, None)
+        if previous is not None and previous[2].get('created'):
+            kwargs = {**kwargs, 'created': True}
+        calls[key] = (sender, instance, kwargs)
+
+    def flush(self):
+        for handler, calls in self.calls.items():
+            handler.flush(list(calls.values()))
+        self.calls.clear()
+
+
+def deferrable(batch=None):
+    """
+    Декоратор обработчика сигнала, который можно отключить (suppress_signals)
+    или отложить до конца блока (defer_signals). Функция batch(instances) выполняет
+    отложенные вызовы одним пакетом; без нее обработчик вызывается для каждого объекта.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def handler(sender, instance, **kwargs):
+            mode = _mode.get()
+            if mode is None:
+                return func(sender, instance=instance, **kwargs)
+            if mode is not SUPPRESSED:
+                mode.add(handler, sender, instance, kwargs)
+
+        def flush(calls):
+            if batch is not None:
+                batch([(instance, kwargs) for _, instance, kwargs in calls])
+                return
+            for sender, instance, kwargs in calls:
+                func(sender, instance=instance, **kwargs)
+
+        handler.flush = flush
+        return handler
+    return decorator
+
+
+@contextmanager
+def suppress_signals():
+    """
+    Отключает отложенные обработчики сигналов внутри блока. Подходит для пакетных
+    операций, которые сами создают производные данные. Работает и как декоратор.
+    """
+    token = _mode.set(SUPPRESSED)
+    try:
+        yield
+    finally:
+        _mode.reset(token)
+
+
+@contextmanager
+def defer_signals():
+    """
+    Собирает вызовы отложенных обработчиков внутри блока и выполняет их пакетом при выходе.
+    Если блок завершился исключением, отложенные вызовы отбрасываются.
+    Вложенный блок присоединяется к внешнему. Работает и как декоратор.
+    """
+    if _mode.get() is not None:
+        yield
+        return
+
+    batch = _Batch()
+    token = _mode.set(batch)
+    try:
+        yield
+    finally:
+        _mode.reset(token)
+    batch.flush()
@@ -0,0 +1,75 @@
+import logging
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import Enrollment
+from .outbox import build_email, enqueue_emails
+from .stats import adjust_many, counted
+
+# Инициализация логгера для записей на курсы
+logger = logging.getLogger(__name__)
+
+BULK_BATCH_SIZE = 500
+
+
+def existing_enrollments(pairs):
+    """
+    Находит существующие записи для пар (id студента, id курса) одним запросом.
+    Возвращает словарь пара -> запись.
+    """
+    if not pairs:
+        return {}
+    enrollments = Enrollment.objects.filter(
+        student_id__in={student_id for student_id, _ in pairs},
+        course_id__in={course_id for _, course_id in pairs},
+    )
+    return {
+        (enrollment.student_id, enrollment.course_id): enrollment
+        for enrollment in enrollments
+        if (enrollment.student_id, enrollment.course_id) in pairs
+    }
+
+
+def confirmation_email(student, course):
+    """
+    Письмо-подтверждение записи на курс для пакетной постановки в очередь.
+    """
+    return build_email(
+        'Enrollment Confirmed',
+        f'Your enrollment for the course "{course.title}" has been confirmed.',
+        [student.email],
+        settings.DEFAULT_FROM_EMAIL,
+    )
+
+
+def bulk_enroll(items):
+    """
+    Создает записи на курс пакетом. items — список словарей со студентом, курсом и статусом.
+    Пары, для которых запись уже есть, и повторы внутри списка пропускаются.
+    bulk_create не отправляет сигналы, поэтому письма о подтвержденных записях
+    ставятся в очередь одним запросом в той же транзакции.
+    Возвращает созданные записи и пропущенные элементы.
+    """
+    unique_items = {}
+    for item in items:
+        unique_items.setdefault((item['student'].id, item['course'].id), item)
+
+    with transaction.atomic():
+        existing = existing_enrollments(set(unique_items))
+        new_items = [item for pair, item in unique_items.items() if pair not in existing]
+        created = Enrollment.objects.bulk_create(
+            [Enrollment(student=item['student'], course=item['course'], status=item['status']) for item in new_items],
+            batch_size=BULK_BATCH_SIZE,
+        )
+        # bulk_create не отправляет сигналы, поэтому статистика курсов обновляется явно
+        adjust_many(counted(created))
+        enqueue_emails([
+            confirmation_email(item['student'], item['course'])
+            for item in new_items if item['status'] == 'confirmed' and item['student'].email
+        ])
+
+    new_ids = {id(item) for item in new_items}
+    skipped = [item for item in items if id(item) not in new_ids]
+    logger.info(f"Bulk enrollment: {len(created)} created, {len(skipped)} skipped.")
+    return created, skipped
@@ -0,0 +1,98 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .db_routing import replica_reads
+from .models import Course, CourseProgress, Enrollment, Payment
+
+# Строк на одну выборку из курсора: память на запрос не зависит от размера таблицы
+EXPORT_CHUNK_SIZE = 2000
+# Строк в одном фрагменте ответа: по строке на запись в сокет было бы слишком много вызовов
+EXPORT_LINES_PER_WRITE = 500
+
+# Наборы данных: имя -> (модель, выгружаемые поля)
+EXPORTS = {
+    'courses': (Course, (
+        'id', 'title', 'category__name', 'instructor__username', 'price', 'duration',
+        'level', 'type', 'language', 'start_date', 'end_date',
+    )),
+    'enrollments': (Enrollment, (
+        'id', 'student_id', 'student__username', 'course_id', 'status', 'enrolled_on', 'completion_date',
+    )),
+    'payments': (Payment, (
+        'id', 'user_id', 'course_id', 'amount', 'status', 'stripe_payment_intent', 'timestamp',
+    )),
+    'progress': (CourseProgress, (
+        'id', 'student_id', 'course_id', 'completed_lessons', 'total_lessons', 'progress', 'is_completed',
+    )),
+}
+
+# Форматы: имя -> тип содержимого
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+
+def _queryset(dataset):
+    model, fields = EXPORTS[dataset]
+    # Сортировка по первичному ключу идет по индексу и не требует сортировки всей таблицы
+    return model.objects.order_by('pk').values_list(*fields), fields
+
+
+class _Echo:
+    # Буфер для csv.writer: возвращает строку вместо записи в файл
+    def write(self, value):
+        return value
+
+
+def _encoder(fields, export_format):
+    """
+    Возвращает строку заголовка (или None) и функцию, превращающую строку values_list
+    в строку выгрузки выбранного формата.
+    """
+    if export_format == 'csv':
+        writer = csv.writer(_Echo())
+        return writer.writerow(fields), writer.writerow
+
+    def encode(row):
+        return json.dumps(dict(zip(fields, row)), cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+    return None, encode
+
+
+def stream_export(dataset, export_format, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Генератор фрагментов выгрузки для StreamingHttpResponse под WSGI. Строки читаются
+    с реплики порциями по chunk_size через .iterator(), без кэша результатов QuerySet,
+    поэтому в памяти одновременно находится не больше одной порции.
+    """
+    queryset, fields = _queryset(dataset)
+    header, encode = _encoder(fields, export_format)
+    lines = [header] if header is not None else []
+    with replica_reads():
+        for row in queryset.iterator(chunk_size=chunk_size):
+            lines.append(encode(row))
+            if len(lines) >= EXPORT_LINES_PER_WRITE:
+                yield ''.join(lines)
+                lines = []
+    if lines:
+        yield ''.join(lines)
+
+
+async def astream_export(dataset, export_format, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Асинхронный вариант stream_export для ASGI: синхронный итератор ASGI-обработчик
+    Django сначала собирает в список, а асинхронный отдает клиенту по мере чтения.
+    """
+    queryset, fields = _queryset(dataset)
+    header, encode = _encoder(fields, export_format)
+    lines = [header] if header is not None else []
+    with replica_reads():
+        async for row in queryset.aiterator(chunk_size=chunk_size):
+            lines.append(encode(row))
+            if len(lines) >= EXPORT_LINES_PER_WRITE:
+                yield ''.join(lines)
+                lines = []
+    if lines:
+        yield ''.join(lines)
@@ -0,0 +1,145 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import (
+    Course, Review, Enrollment, Payment, BlogPost, ContactMessage, CourseProgress, Certificate,
+    LessonCompletion, OutboundEmail, StripeEvent,
+)
+
+# Реестр частых запросов: имя -> функция, возвращающая queryset того же вида, что и в коде.
+# Значения параметров условные: план запроса от них не зависит
+HOT_QUERIES = {}
+
+# Признаки полного просмотра таблицы в плане запроса
+FULL_SCAN_PATTERNS = {
+    'sqlite': re.compile(r'\bSCAN (?!CONSTANT ROW)(\w+)(?! USING)(?:\s|$)'),
+    'postgresql': re.compile(r'\bSeq Scan on (\w+)'),
+}
+
+
+def hot_query(name):
+    """
+    Декоратор регистрации запроса для команды explain_hot_queries.
+    """
+    def decorator(build):
+        HOT_QUERIES[name] = build
+        return build
+    return decorator
+
+
+def explain(name):
+    """
+    Возвращает план запроса и список таблиц, которые СУБД просматривает целиком.
+    """
+    plan = HOT_QUERIES[name]().explain()
+    pattern = FULL_SCAN_PATTERNS.get(connection.vendor)
+    scans = sorted(set(pattern.findall(plan))) if pattern else []
+    return plan, scans
+
+
+@hot_query('course_list')
+def _course_list():
+    # CourseViewSet, следующая страница курсорной пагинации по id
+    return Course.objects.filter(id__gt=100).order_by('id')[:20]
+
+
+@hot_query('course_detail')
+def _course_detail():
+    # services.get_course_details
+    return Course.objects.select_related('category', 'instructor').filter(id=1)
+
+
+@hot_query('instructor_courses')
+def _instructor_courses():
+    # services.get_instructor_courses (views.instructor_courses_view): порядок по умолчанию модели
+    return Course.objects.select_related('instructor', 'category') \
+                         .filter(instructor_id=1) \
+                         .values('title', 'category__name', 'price', 'duration', 'start_date', 'end_date')
+
+
+@hot_query('course_reviews')
+def _course_reviews():
+    # Отзывы курса в CourseSerializer
+    return Review.objects.filter(course_id__in=[1, 2, 3]).order_by('-created_at')
+
+
+@hot_query('review_list')
+def _review_list():
+    return Review.objects.order_by('-created_at', '-id')[:20]
+
+
+@hot_query('enrollment_list')
+def _enrollment_list():
+    return Enrollment.objects.order_by('-enrolled_on', '-id')[:20]
+
+
+@hot_query('enrollment_lookup')
+def _enrollment_lookup():
+    # Подтверждение записей после оплаты
+    return Enrollment.objects.filter(student_id=1, course_id=1, status='confirmed')
+
+
+@hot_query('course_confirmed_enrollments')
+def _course_confirmed_enrollments():
+    return Enrollment.objects.filter(course_id=1, status='confirmed').values('student_id')
+
+
+@hot_query('payment_by_intent')
+def _payment_by_intent():
+    # Обработка событий Stripe
+    return Payment.objects.filter(stripe_payment_intent__in=['pi_1', 'pi_2'])
+
+
+@hot_query('blog_list')
+def _blog_list():
+    return BlogPost.objects.select_related('author').order_by('-created_at', '-id')[:20]
+
+
+@hot_query('contact_messages')
+def _contact_messages():
+    # Список сообщений в админ-панели
+    return ContactMessage.objects.order_by('-received_at')[:100]
+
+
+@hot_query('student_progress')
+def _student_progress():
+    return CourseProgress.objects.filter(student_id=1).select_related('course')
+
+
+@hot_query('course_completed_students')
+def _course_completed_students():
+    # certificates.create_missing_for_course
+    return CourseProgress.objects.filter(course_id=1, is_completed=True).values('student_id')
+
+
+@hot_query('lesson_completion_count')
+def _lesson_completion_count():
+    # Пересчет счетчика уроков в progress.record_lessons
+    return LessonCompletion.objects.filter(student_id=1, course_id=1).values('lesson')
+
+
+@hot_query('student_certificates')
+def _student_certificates():
+    return Certificate.objects.filter(student_id=1).select_related('course')
+
+
+@hot_query('certificate_queue')
+def _certificate_queue():
+    return Certificate.objects.filter(status='pending').order_by('id')[:50]
+
+
+@hot_query('outbox_queue')
+def _outbox_queue():
+    return OutboundEmail.objects.filter(
+        Q(status='pending') | Q(status='sending'), next_attempt_at__lte=timezone.now(),
+    ).order_by('next_attempt_at', 'id')[:100]
+
+
+@hot_query('stripe_event_queue')
+def _stripe_event_queue():
+    return StripeEvent.objects.filter(
+        Q(status='pending') | Q(status='processing', claimed_until__lte=timezone.now()),
+    ).order_by('received_at')[:200]
@@ -0,0 +1,65 @@
+import time
+from contextvars import ContextVar
+
+# Метрики текущего запроса; None, если запрос не попал в выборку
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """
+    Счетчики одного запроса: число и время SQL-запросов, попадания и промахи кэша.
+    """
+    __slots__ = ('db_queries', 'db_time', 'cache_hits', 'cache_misses')
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Постоянный обертыватель выполнения запросов, устанавливается на каждое соединение.
+    Контекстная переменная копируется и в потоки sync_to_async, поэтому запросы
+    асинхронных представлений учитываются так же, как синхронных.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_time += time.perf_counter() - started
+        metrics.db_queries += 1
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """
+    Обработчик connection_created: добавляет record_query к новому соединению.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def start():
+    """
+    Начинает сбор метрик в текущем контексте. Возвращает метрики и токен для finish().
+    """
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def finish(token):
+    _current.reset(token)
+
+
+def record_cache_lookup(hits, misses=0):
+    """
+    Учитывает обращение к кэшу в метриках текущего запроса, если они собираются.
+    """
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.cache_hits += hits
+        metrics.cache_misses += misses
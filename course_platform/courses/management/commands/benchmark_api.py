@@ -0,0 +1,63 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from courses.benchmarks import (
+    DEFAULT_VOLUMES, find_regressions, load_baseline, run_scenario, save_baseline, scenarios, seed,
+)
+
+
+class Command(BaseCommand):
+    help = ("Нагрузочный замер API и HTML-страниц: p50/p95/p99, запросы к БД на запрос и пропускная способность. "
+            "Сравнивает результат с сохраненными базовыми значениями.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help="Имена сценариев (по умолчанию все)")
+        parser.add_argument('--requests', type=int, default=200, help="Запросов на сценарий")
+        parser.add_argument('--concurrency', type=int, default=4, help="Количество параллельных клиентов")
+        parser.add_argument('--base-url', help="Адрес запущенного сервера; по умолчанию запросы выполняются в процессе")
+        parser.add_argument('--asgi', action='store_true',
+                            help="Выполнять запросы в процессе через ASGI-обработчик, клиенты — корутины одного цикла событий")
+        parser.add_argument('--courses', type=int, default=DEFAULT_VOLUMES['courses'])
+        parser.add_argument('--students', type=int, default=DEFAULT_VOLUMES['students'])
+        parser.add_argument('--baseline', default='benchmark_baseline.json', help="Файл базовых значений")
+        parser.add_argument('--save-baseline', action='store_true', help="Сохранить результат как базовый")
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help="Допустимое ухудшение относительно базового значения (доля)")
+
+    def handle(self, *args, **options):
+        created = seed({'courses': options['courses'], 'students': options['students']})
+        if created:
+            self.stdout.write(f"Созданы данные для замеров: курсов {created}")
+
+        available = scenarios()
+        names = options['names'] or list(available)
+        unknown = set(names) - set(available)
+        if unknown:
+            raise CommandError(f"Неизвестные сценарии: {', '.join(sorted(unknown))}")
+
+        results = {}
+        for name in names:
+            path, authenticated = available[name]
+            result = run_scenario(path, options['requests'], options['concurrency'],
+                                  authenticated=authenticated, base_url=options['base_url'], asgi=options['asgi'])
+            results[name] = result
+            self.stdout.write(
+                f"{name:>15}: p50 {result['p50_ms']:.1f} мс, p95 {result['p95_ms']:.1f} мс, "
+                f"p99 {result['p99_ms']:.1f} мс, запросов к БД {result['queries_per_request']}, "
+                f"{result['throughput_rps']:.1f} запр/с, ошибок {result['errors']}"
+            )
+
+        baseline_path = options['baseline']
+        if options['save_baseline']:
+            save_baseline(baseline_path, results)
+            self.stdout.write(self.style.SUCCESS(f"Базовые значения сохранены в {baseline_path}"))
+            return
+
+        if not os.path.exists(baseline_path):
+            self.stdout.write(self.style.WARNING("Базовые значения не найдены, сравнение пропущено"))
+            return
+
+        regressions = find_regressions(results, load_baseline(baseline_path), options['threshold'])
+        if regressions:
+            raise CommandError("Регрессии производительности:\n" + "\n".join(regressions))
+        self.stdout.write(self.style.SUCCESS("Регрессий относительно базовых значений нет"))
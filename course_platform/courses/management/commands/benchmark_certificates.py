@@ -0,0 +1,42 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from courses.certificate_generator import get_certificate_template, render_certificate, render_certificate_uncached
+
+
+def measure(render, count):
+    timings = []
+    for n in range(count):
+        started = time.perf_counter()
+        render(f"Student {n}", "Advanced Business English")
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+class Command(BaseCommand):
+    help = "Сравнивает задержку генерации сертификата без шаблона и с кэшированным статическим слоем."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=500, help="Количество сертификатов в каждом прогоне")
+
+    def handle(self, *args, **options):
+        count = options['count']
+        # Прогрев: шаблон курса готовится один раз до измерений
+        get_certificate_template("Advanced Business English")
+        measure(render_certificate_uncached, 10)
+
+        results = {
+            'без шаблона': measure(render_certificate_uncached, count),
+            'с шаблоном': measure(render_certificate, count),
+        }
+
+        for name, timings in results.items():
+            timings.sort()
+            self.stdout.write(
+                f"{name:>12}: среднее {statistics.mean(timings):.3f} мс, "
+                f"p50 {timings[len(timings) // 2]:.3f} мс, p95 {timings[int(len(timings) * 0.95)]:.3f} мс"
+            )
+
+        before, after = (statistics.mean(t) for t in results.values())
+        self.stdout.write(self.style.SUCCESS(f"Ускорение: {before / after:.2f}x"))
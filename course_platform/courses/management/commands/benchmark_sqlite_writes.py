@@ -0,0 +1,98 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+from courses.sqlite_tuning import LOCK_RETRY_ATTEMPTS_WITH_TIMEOUT, is_lock_error, retry_on_lock
+
+SCHEMA = "CREATE TABLE payment (id INTEGER PRIMARY KEY, user_id INTEGER, amount REAL, status TEXT, created_at REAL)"
+
+
+def _register(alias, path, options):
+    """
+    Регистрирует временную базу под алиасом с теми же OPTIONS, что и в settings.DATABASES,
+    чтобы замер проходил через бэкенд Django: init_command, transaction_mode и timeout.
+    """
+    connections.settings[alias] = connections.configure_settings({
+        **connections.settings,
+        alias: {'ENGINE': 'django.db.backends.sqlite3', 'NAME': path, 'OPTIONS': options},
+    })[alias]
+
+
+def run_workers(alias, workers, writes, tuned):
+    """
+    Запускает параллельных писателей, каждый со своим соединением Django, и возвращает
+    число успешных транзакций, число ошибок блокировки и время работы.
+    """
+    committed = [0] * workers
+    errors = [0] * workers
+
+    def write(user_id):
+        # Запись и чтение в одной транзакции, как при создании платежа и пересчете прогресса
+        with transaction.atomic(using=alias), connections[alias].cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM payment WHERE user_id = %s', [user_id])
+            cursor.fetchone()
+            cursor.execute('INSERT INTO payment (user_id, amount, status, created_at) VALUES (%s, %s, %s, %s)',
+                           [user_id, 49.9, 'pending', time.time()])
+
+    if tuned:
+        write = retry_on_lock(write, attempts=LOCK_RETRY_ATTEMPTS_WITH_TIMEOUT)
+
+    def worker(n):
+        # Соединения Django привязаны к потоку: у каждого писателя свое
+        try:
+            for _ in range(writes):
+                try:
+                    write(n)
+                    committed[n] += 1
+                except OperationalError as error:
+                    if not is_lock_error(error):
+                        raise
+                    errors[n] += 1
+        finally:
+            connections[alias].close()
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(workers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(committed), sum(errors), time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    help = ("Сравнивает пропускную способность записи SQLite через бэкенд Django с настройками по умолчанию "
+            "и с OPTIONS режима SQLITE_TUNING (WAL, mmap, synchronous=NORMAL, BEGIN IMMEDIATE, busy timeout, "
+            "повтор при блокировке).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8, help="Количество параллельных писателей")
+        parser.add_argument('--writes', type=int, default=200, help="Транзакций на писателя")
+
+    def handle(self, *args, **options):
+        directory = tempfile.mkdtemp(prefix='sqlite_bench_')
+        try:
+            # Те же OPTIONS, что _database_config подставляет в DATABASES при SQLITE_TUNING
+            modes = (('по умолчанию', False, {}), ('SQLITE_TUNING', True, settings.SQLITE_TUNED_OPTIONS))
+            for name, tuned, db_options in modes:
+                alias = f'sqlite_bench_{int(tuned)}'
+                _register(alias, os.path.join(directory, f'{int(tuned)}.sqlite3'), db_options)
+                try:
+                    with connections[alias].cursor() as cursor:
+                        cursor.execute(SCHEMA)
+                    connections[alias].close()
+
+                    committed, errors, elapsed = run_workers(alias, options['workers'], options['writes'], tuned)
+                finally:
+                    del connections.settings[alias]
+                self.stdout.write(
+                    f"{name:>13}: {committed / elapsed:.0f} транзакций/с, успешно {committed}, "
+                    f"ошибок блокировки {errors}, {elapsed:.2f} с"
+                )
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
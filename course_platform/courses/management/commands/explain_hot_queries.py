@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from courses.hot_queries import HOT_QUERIES, explain
+
+
+class Command(BaseCommand):
+    help = "Выполняет EXPLAIN для зарегистрированных частых запросов и отмечает полные просмотры таблиц."
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help="Имена запросов (по умолчанию все)")
+        parser.add_argument('--plans', action='store_true', help="Печатать планы запросов целиком")
+        parser.add_argument('--fail-on-scan', action='store_true',
+                            help="Завершиться с ошибкой, если найден полный просмотр таблицы")
+
+    def handle(self, *args, **options):
+        names = options['names'] or sorted(HOT_QUERIES)
+        unknown = set(names) - set(HOT_QUERIES)
+        if unknown:
+            raise CommandError(f"Неизвестные запросы: {', '.join(sorted(unknown))}")
+
+        flagged = []
+        for name in names:
+            plan, scans = explain(name)
+            if scans:
+                flagged.append(name)
+                self.stdout.write(self.style.WARNING(f"{name}: полный просмотр {', '.join(scans)}"))
+            else:
+                self.stdout.write(f"{name}: OK")
+            if options['plans'] or scans:
+                self.stdout.write(f"    {plan.replace(chr(10), chr(10) + '    ')}")
+
+        if flagged and options['fail_on_scan']:
+            raise CommandError(f"Запросы без индекса: {', '.join(flagged)}")
+        self.stdout.write(self.style.SUCCESS(f"Проверено запросов: {len(names)}, без индекса: {len(flagged)}"))
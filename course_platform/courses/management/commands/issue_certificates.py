@@ -0,0 +1,64 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from courses.certificates import (
+    DEFAULT_BATCH_SIZE, DEFAULT_MAX_ATTEMPTS, create_missing_for_course, process_pending, requeue_stale,
+)
+from courses.models import Certificate, Course
+from courses.outbox import drain_outbox
+
+
+class Command(BaseCommand):
+    help = (
+        "Выдает сертификаты всем завершившим курс студентам: создает записи пакетно, "
+        "генерирует PDF в пуле процессов и ставит письма в очередь. "
+        "Повторный запуск продолжает с места остановки."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', type=int, required=True, help="ID курса")
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Количество процессов рендеринга")
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="Размер пакета рендеринга")
+        parser.add_argument('--max-attempts', type=int, default=DEFAULT_MAX_ATTEMPTS,
+                            help="Количество попыток до пометки сертификата как неудачного")
+        parser.add_argument('--send-mail', action='store_true',
+                            help="Сразу отправить поставленные в очередь письма")
+
+    def handle(self, *args, **options):
+        course_id = options['course']
+        if not Course.objects.filter(id=course_id).exists():
+            raise CommandError(f"Курс с ID {course_id} не найден")
+
+        started = time.monotonic()
+        certificates = Certificate.objects.filter(course_id=course_id)
+
+        # Сертификаты, прерванные прошлым запуском, возвращаются в очередь
+        requeued = requeue_stale(certificates)
+        created = create_missing_for_course(course_id)
+        pending = certificates.filter(status='pending').count()
+        prepare_time = time.monotonic() - started
+        self.stdout.write(
+            f"Создано сертификатов: {created}, возвращено в очередь: {requeued}, "
+            f"к генерации: {pending} ({prepare_time:.2f} с)"
+        )
+
+        def report(stats):
+            done = stats['ready'] + stats['failed']
+            self.stdout.write(f"  {done}/{pending} ({stats['ready'] / stats['elapsed']:.1f} сертификатов/с)")
+
+        stats = process_pending(
+            options['workers'], options['batch_size'], options['max_attempts'],
+            queryset=certificates, on_batch=report,
+        )
+
+        sent = 0
+        if options['send_mail']:
+            sent, _ = drain_outbox()
+
+        total_time = time.monotonic() - started
+        rate = stats['ready'] / stats['elapsed'] if stats['elapsed'] else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Готово: {stats['ready']}, ошибок: {stats['failed']}, писем отправлено: {sent}. "
+            f"Рендеринг: {stats['elapsed']:.2f} с ({rate:.1f} сертификатов/с), всего: {total_time:.2f} с"
+        ))
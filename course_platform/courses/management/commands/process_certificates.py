@@ -0,0 +1,35 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+from courses.certificates import DEFAULT_BATCH_SIZE, DEFAULT_MAX_ATTEMPTS, process_pending, requeue_stale
+
+
+class Command(BaseCommand):
+    help = "Генерирует PDF-сертификаты из очереди в пуле процессов и ставит письма студентам в очередь."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Количество процессов рендеринга")
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="Размер пакета")
+        parser.add_argument('--max-attempts', type=int, default=DEFAULT_MAX_ATTEMPTS,
+                            help="Количество попыток до пометки сертификата как неудачного")
+        parser.add_argument('--requeue', action='store_true',
+                            help="Вернуть в очередь сертификаты, зависшие в статусе rendering")
+        parser.add_argument('--loop', action='store_true', help="Работать непрерывно, опрашивая очередь")
+        parser.add_argument('--interval', type=float, default=5.0, help="Пауза между опросами в режиме --loop")
+
+    def handle(self, *args, **options):
+        if options['requeue']:
+            self.stdout.write(f"Возвращено в очередь: {requeue_stale()}")
+
+        while True:
+            stats = process_pending(options['workers'], options['batch_size'], options['max_attempts'])
+            if stats['ready'] or stats['failed'] or not options['loop']:
+                rate = stats['ready'] / stats['elapsed'] if stats['elapsed'] else 0
+                self.stdout.write(
+                    f"Готово: {stats['ready']}, ошибок: {stats['failed']}, "
+                    f"время: {stats['elapsed']:.2f} с ({rate:.1f} сертификатов/с)"
+                )
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+from courses.stripe_events import DEFAULT_BATCH_SIZE, process_pending_events
+
+
+class Command(BaseCommand):
+    help = "Применяет сохраненные события Stripe пакетами: статусы платежей, записи на курсы и письма."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="Размер пакета")
+        parser.add_argument('--loop', action='store_true', help="Работать непрерывно, опрашивая журнал")
+        parser.add_argument('--interval', type=float, default=1.0, help="Пауза между опросами в режиме --loop")
+
+    def handle(self, *args, **options):
+        while True:
+            processed = process_pending_events(options['batch_size'])
+            if processed or not options['loop']:
+                self.stdout.write(f"Обработано событий: {processed}")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
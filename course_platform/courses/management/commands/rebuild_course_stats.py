@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from courses.stats import rebuild_stats
+
+
+class Command(BaseCommand):
+    help = "Полностью пересчитывает статистику курсов: оценки, подтвержденные записи и выручку."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Размер пакета записи")
+
+    def handle(self, *args, **options):
+        total = rebuild_stats(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Статистика пересчитана для курсов: {total}"))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from courses.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Полностью перестраивает полнотекстовый поисковый индекс курсов, статей, блога и FAQ."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Размер пакета вставки")
+
+    def handle(self, *args, **options):
+        total = rebuild_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Проиндексировано документов: {total}"))
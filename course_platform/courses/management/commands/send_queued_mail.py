@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+from courses.outbox import DEFAULT_BATCH_SIZE, DEFAULT_MAX_ATTEMPTS, drain_outbox
+
+
+class Command(BaseCommand):
+    help = "Отправляет письма из очереди исходящей почты пакетами через одно SMTP-соединение."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="Размер пакета")
+        parser.add_argument('--max-attempts', type=int, default=DEFAULT_MAX_ATTEMPTS,
+                            help="Количество попыток до пометки письма как неотправленного")
+        parser.add_argument('--loop', action='store_true', help="Работать непрерывно, опрашивая очередь")
+        parser.add_argument('--interval', type=float, default=5.0, help="Пауза между опросами в режиме --loop")
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = drain_outbox(options['batch_size'], options['max_attempts'])
+            if sent or failed or not options['loop']:
+                self.stdout.write(f"Отправлено: {sent}, не отправлено: {failed}")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,30 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from courses.db_routing import REPLICA_ALIAS
+
+
+class Command(BaseCommand):
+    help = ("Копирует основную базу SQLite в файл реплики. Заменяет репликацию при локальной "
+            "проверке маршрутизации с двумя файлами SQLite.")
+
+    def handle(self, *args, **options):
+        replica = settings.DATABASES.get(REPLICA_ALIAS)
+        primary = settings.DATABASES['default']
+        if replica is None:
+            raise CommandError("Реплика не настроена: задайте DJANGO_DB_REPLICA_NAME")
+        if not (primary['ENGINE'].endswith('sqlite3') and replica['ENGINE'].endswith('sqlite3')):
+            raise CommandError("Команда работает только с SQLite; для Postgres используйте штатную репликацию")
+        if str(primary['NAME']) == str(replica['NAME']):
+            raise CommandError("Основная база и реплика указывают на один файл")
+
+        source = sqlite3.connect(primary['NAME'])
+        target = sqlite3.connect(replica['NAME'])
+        try:
+            # Онлайн-копирование: основная база остается доступной во время синхронизации
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
+        self.stdout.write(self.style.SUCCESS(f"Реплика {replica['NAME']} синхронизирована"))
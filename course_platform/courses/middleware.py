@@ -1,24 +1,152 @@
+import json
 import logging
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.functional import LazyObject
+
+from . import instrumentation
+from .db_routing import routing_scope
 
 # Инициализация логгера для использования в middleware
 logger = logging.getLogger(__name__)
 
+# Параметры по умолчанию, переопределяются settings.REQUEST_INSTRUMENTATION
+DEFAULT_OPTIONS = {
+    'SAMPLE_RATE': 1.0,
+    'SLOW_REQUEST_MS': 500,
+    'SERVER_TIMING': True,
+}
+
+
+def _user_id(request):
+    # request.user не вычисляется ради лога: берем пользователя, только если его уже загрузили
+    user = request.__dict__.get('user')
+    if isinstance(user, LazyObject):
+        user = getattr(request, '_cached_user', None)
+    if user is None or not user.is_authenticated:
+        return None
+    return user.pk
+
+
+def _route(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return None
+    return match.view_name or match.route
+
+
+def _response_size(response):
+    if response.streaming:
+        return None
+    return len(response.content)
+
+
 class RequestLogMiddleware:
     """
-    Middleware для логирования всех запросов, сделанных аутентифицированными пользователями.
-    Записывает имя пользователя и путь запроса в лог.
+    Middleware инструментирования запросов. Для каждого запроса измеряет время обработки,
+    а для запросов из выборки (SAMPLE_RATE) еще и число и время SQL-запросов
+    и попадания в кэш. Результат пишется в лог одной JSON-строкой и в заголовок Server-Timing.
+    Медленные запросы (SLOW_REQUEST_MS) логируются всегда, даже вне выборки.
+    Работает и в синхронной, и в асинхронной цепочке без переключения потоков.
     """
-    
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        options = {**DEFAULT_OPTIONS, **getattr(settings, 'REQUEST_INSTRUMENTATION', {})}
+        self.sample_rate = options['SAMPLE_RATE']
+        self.slow_threshold = options['SLOW_REQUEST_MS'] / 1000
+        self.server_timing = options['SERVER_TIMING']
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
-        # Выполняется до обработки запроса
-        if request.user.is_authenticated:
-            logger.info(f"User '{request.user.username}' accessed {request.path}")
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics, token, started = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            if token is not None:
+                instrumentation.finish(token)
+        return self.finish(request, response, metrics, started)
+
+    async def __acall__(self, request):
+        metrics, token, started = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            if token is not None:
+                instrumentation.finish(token)
+        return self.finish(request, response, metrics, started)
 
-        # Передача запроса следующему middleware или представлению
-        response = self.get_response(request)
+    def start(self):
+        metrics = token = None
+        if self.sample_rate >= 1 or random.random() < self.sample_rate:
+            metrics, token = instrumentation.start()
+        return metrics, token, time.perf_counter()
 
-        # Выполняется после обработки запроса
+    def finish(self, request, response, metrics, started):
+        duration = time.perf_counter() - started
+        if self.server_timing:
+            response['Server-Timing'] = self.server_timing_header(duration, metrics)
+        if (metrics is not None or duration >= self.slow_threshold) and logger.isEnabledFor(logging.INFO):
+            self.log(request, response, duration, metrics)
         return response
+
+    @staticmethod
+    def server_timing_header(duration, metrics):
+        parts = [f'app;dur={duration * 1000:.1f}']
+        if metrics is not None:
+            parts.append(f'db;dur={metrics.db_time * 1000:.1f};desc="{metrics.db_queries} queries"')
+            parts.append(f'cache;desc="{metrics.cache_hits} hits, {metrics.cache_misses} misses"')
+        return ', '.join(parts)
+
+    @staticmethod
+    def log(request, response, duration, metrics):
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'route': _route(request),
+            'status': response.status_code,
+            'user_id': _user_id(request),
+            'duration_ms': round(duration * 1000, 1),
+            'response_bytes': _response_size(response),
+        }
+        if metrics is not None:
+            record.update({
+                'db_queries': metrics.db_queries,
+                'db_ms': round(metrics.db_time * 1000, 1),
+                'cache_hits': metrics.cache_hits,
+                'cache_misses': metrics.cache_misses,
+            })
+        logger.info(json.dumps(record), extra={'request_metrics': record})
+
+
+class DatabaseRoutingMiddleware:
+    """
+    Отдельное состояние маршрутизации БД на каждый запрос: разрешение читать с реплики
+    и закрепление за основной базой после записи не переходят в следующий запрос.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with routing_scope():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with routing_scope():
+            return await self.get_response(request)
@@ -0,0 +1,136 @@
+from django.db import migrations
+
+SQLITE_CREATE = [
+    """
+    CREATE VIRTUAL TABLE courses_searchdocument_fts USING fts5(
+        title, body,
+        content='courses_searchdocument', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER courses_searchdocument_ai AFTER INSERT ON courses_searchdocument BEGIN
+        INSERT INTO courses_searchdocument_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END
+    """,
+    """
+    CREATE TRIGGER courses_searchdocument_ad AFTER DELETE ON courses_searchdocument BEGIN
+        INSERT INTO courses_searchdocument_fts(courses_searchdocument_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+    END
+    """,
+    """
+    CREATE TRIGGER courses_searchdocument_au AFTER UPDATE ON courses_searchdocument BEGIN
+        INSERT INTO courses_searchdocument_fts(courses_searchdocument_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+        INSERT INTO courses_searchdocument_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END
+    """,
+]
+
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS courses_searchdocument_au",
+    "DROP TRIGGER IF EXISTS courses_searchdocument_ad",
+    "DROP TRIGGER IF EXISTS courses_searchdocument_ai",
+    "DROP TABLE IF EXISTS courses_searchdocument_fts",
+]
+
+POSTGRES_CREATE = [
+    """
+    ALTER TABLE courses_searchdocument ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(body, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX courses_searchdocument_vector_idx ON courses_searchdocument USING GIN (search_vector)",
+]
+
+POSTGRES_DROP = [
+    "DROP INDEX IF EXISTS courses_searchdocument_vector_idx",
+    "ALTER TABLE courses_searchdocument DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def _execute(schema_editor, statements):
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def create_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        _execute(schema_editor, SQLITE_CREATE)
+    elif vendor == "postgresql":
+        _execute(schema_editor, POSTGRES_CREATE)
+
+
+def drop_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        _execute(schema_editor, SQLITE_DROP)
+    elif vendor == "postgresql":
+        _execute(schema_editor, POSTGRES_DROP)
+
+
+def populate_index(apps, schema_editor):
+    SearchDocument = apps.get_model("courses", "SearchDocument")
+    sources = [
+        (
+            "course",
+            apps.get_model("courses", "Course"),
+            lambda obj: (
+                obj.title,
+                "\n".join(
+                    filter(None, [obj.description, obj.syllabus, obj.requirements])
+                ),
+            ),
+        ),
+        (
+            "article",
+            apps.get_model("courses", "KnowledgeBaseArticle"),
+            lambda obj: (obj.title, obj.content),
+        ),
+        (
+            "blog",
+            apps.get_model("courses", "BlogPost"),
+            lambda obj: (
+                obj.title,
+                "\n".join(filter(None, [obj.content, obj.tags])),
+            ),
+        ),
+        (
+            "faq",
+            apps.get_model("courses", "FAQ"),
+            lambda obj: (obj.question, obj.answer),
+        ),
+    ]
+    for content_type, model, extract in sources:
+        documents = []
+        for obj in model.objects.using(schema_editor.connection.alias).iterator(
+            chunk_size=1000
+        ):
+            title, body = extract(obj)
+            documents.append(
+                SearchDocument(
+                    content_type=content_type,
+                    object_id=obj.pk,
+                    title=title[:255],
+                    body=body,
+                )
+            )
+        SearchDocument.objects.using(schema_editor.connection.alias).bulk_create(
+            documents, batch_size=1000
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("courses", "0011_searchdocument"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+        migrations.RunPython(populate_index, migrations.RunPython.noop),
+    ]
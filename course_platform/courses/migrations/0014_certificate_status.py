@@ -0,0 +1,57 @@
+# Generated by Django 5.1.1 on 2026-10-18 15:48
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_rendered_certificates_ready(apps, schema_editor):
+    # Сертификаты, созданные до появления очереди, уже имеют PDF
+    Certificate = apps.get_model("courses", "Certificate")
+    Certificate.objects.filter(certificate_url__isnull=False).update(status="ready")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("courses", "0013_outboundemail"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="certificate",
+            name="attempts",
+            field=models.PositiveIntegerField(
+                default=0, help_text="Количество попыток генерации"
+            ),
+        ),
+        migrations.AddField(
+            model_name="certificate",
+            name="error",
+            field=models.TextField(
+                blank=True, help_text="Ошибка последней попытки генерации", null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="certificate",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Pending"),
+                    ("rendering", "Rendering"),
+                    ("ready", "Ready"),
+                    ("failed", "Failed"),
+                ],
+                default="pending",
+                help_text="Статус генерации PDF",
+                max_length=20,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="certificate",
+            index=models.Index(fields=["status", "id"], name="certificate_status_idx"),
+        ),
+        migrations.RunPython(
+            mark_rendered_certificates_ready, migrations.RunPython.noop
+        ),
+    ]
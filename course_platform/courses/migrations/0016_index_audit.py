@@ -0,0 +1,105 @@
+# Generated by Django 5.1.1 on 2026-10-18 15:54
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Порядок выбора записи, которая остается: подтвержденная, ожидающая, отмененная
+STATUS_PRIORITY = {"confirmed": 0, "pending": 1, "cancelled": 2}
+
+
+def remove_duplicate_enrollments(apps, schema_editor):
+    # Перед добавлением уникального ограничения оставляем по одной записи на пару студент-курс
+    Enrollment = apps.get_model("courses", "Enrollment")
+    duplicates = (
+        Enrollment.objects.values("student_id", "course_id")
+        .annotate(count=models.Count("id"))
+        .filter(count__gt=1)
+    )
+    for pair in duplicates.iterator():
+        enrollments = sorted(
+            Enrollment.objects.filter(student_id=pair["student_id"], course_id=pair["course_id"]),
+            key=lambda e: (STATUS_PRIORITY.get(e.status, len(STATUS_PRIORITY)), e.id),
+        )
+        Enrollment.objects.filter(id__in=[e.id for e in enrollments[1:]]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("courses", "0015_stripe_event_log"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="contactmessage",
+            index=models.Index(fields=["-received_at"], name="contact_received_at_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="course",
+            index=models.Index(
+                fields=["instructor", "start_date"], name="course_instructor_start_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="courseprogress",
+            index=models.Index(
+                condition=models.Q(("is_completed", True)),
+                fields=["course"],
+                name="progress_completed_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="enrollment",
+            index=models.Index(
+                condition=models.Q(("status", "confirmed")),
+                fields=["course"],
+                name="enrollment_confirmed_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="review",
+            index=models.Index(
+                fields=["course", "-created_at"], name="review_course_created_idx"
+            ),
+        ),
+        migrations.RunPython(remove_duplicate_enrollments, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="enrollment",
+            constraint=models.UniqueConstraint(
+                fields=("student", "course"), name="enrollment_student_course_uniq"
+            ),
+        ),
+        # Индексы по внешним ключам покрыты составными индексами выше
+        migrations.AlterField(
+            model_name="course",
+            name="instructor",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="courses",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="enrollment",
+            name="student",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="review",
+            name="course",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="reviews",
+                to="courses.course",
+            ),
+        ),
+    ]
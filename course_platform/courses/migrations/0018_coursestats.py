@@ -0,0 +1,87 @@
+# Generated by Django 5.1.1 on 2026-10-18 15:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def populate_course_stats(apps, schema_editor):
+    # Начальное заполнение статистики по уже существующим данным
+    Course = apps.get_model("courses", "Course")
+    CourseStats = apps.get_model("courses", "CourseStats")
+    Review = apps.get_model("courses", "Review")
+    Testimonial = apps.get_model("courses", "Testimonial")
+    Enrollment = apps.get_model("courses", "Enrollment")
+    Payment = apps.get_model("courses", "Payment")
+
+    stats = {course_id: CourseStats(course_id=course_id) for course_id in Course.objects.values_list("id", flat=True)}
+    for model, field in ((Review, "review_count"), (Testimonial, "testimonial_count")):
+        for row in model.objects.values("course_id").annotate(count=Count("id"), total=Sum("rating")).order_by():
+            setattr(stats[row["course_id"]], field, row["count"])
+            stats[row["course_id"]].rating_sum += row["total"] or 0
+    for row in Enrollment.objects.filter(status="confirmed").values("course_id").annotate(count=Count("id")).order_by():
+        stats[row["course_id"]].enrollment_count = row["count"]
+    for row in Payment.objects.filter(status="succeeded").values("course_id").annotate(total=Sum("amount")).order_by():
+        stats[row["course_id"]].revenue = row["total"] or 0
+
+    for item in stats.values():
+        ratings = item.review_count + item.testimonial_count
+        item.average_rating = item.rating_sum / ratings if ratings else 0.0
+    CourseStats.objects.bulk_create(stats.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("courses", "0017_lessoncompletion"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CourseStats",
+            fields=[
+                (
+                    "course",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="stats",
+                        serialize=False,
+                        to="courses.course",
+                    ),
+                ),
+                ("review_count", models.PositiveIntegerField(default=0)),
+                ("testimonial_count", models.PositiveIntegerField(default=0)),
+                (
+                    "rating_sum",
+                    models.IntegerField(
+                        default=0, help_text="Сумма оценок отзывов и отзывов студентов"
+                    ),
+                ),
+                (
+                    "average_rating",
+                    models.FloatField(
+                        default=0.0,
+                        help_text="Средняя оценка по отзывам и отзывам студентов",
+                    ),
+                ),
+                (
+                    "enrollment_count",
+                    models.PositiveIntegerField(
+                        default=0, help_text="Количество подтвержденных записей"
+                    ),
+                ),
+                (
+                    "revenue",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        help_text="Сумма успешных платежей",
+                        max_digits=12,
+                    ),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(populate_course_stats, migrations.RunPython.noop),
+    ]
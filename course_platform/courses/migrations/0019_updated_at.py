@@ -0,0 +1,38 @@
+# Generated by Django 5.1.1 on 2026-10-18 18:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("courses", "0018_coursestats"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="category",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, default=django.utils.timezone.now, help_text="Время последнего изменения"
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="course",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, default=django.utils.timezone.now, help_text="Время последнего изменения"
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="faq",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, default=django.utils.timezone.now, help_text="Время последнего изменения"
+            ),
+            preserve_default=False,
+        ),
+    ]
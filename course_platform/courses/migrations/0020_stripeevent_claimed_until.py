@@ -0,0 +1,31 @@
+# Generated by Django 5.1.1 on 2026-10-18 17:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0019_updated_at'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='stripeevent',
+            name='stripe_event_pending_idx',
+        ),
+        migrations.AddField(
+            model_name='stripeevent',
+            name='claimed_until',
+            field=models.DateTimeField(blank=True, help_text='Срок захвата события воркером', null=True),
+        ),
+        migrations.AlterField(
+            model_name='stripeevent',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('processed', 'Processed'), ('failed', 'Failed')], default='pending', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='stripeevent',
+            index=models.Index(fields=['status', 'received_at'], name='stripe_event_queue_idx'),
+        ),
+    ]
@@ -16,6 +16,7 @@ class Profile(models.Model):
 class Category(models.Model):
     name = models.CharField(max_length=200)
     description = models.TextField()
+    updated_at = models.DateTimeField(auto_now=True, help_text="Время последнего изменения")
 
     def __str__(self):
         return self.name
@@ -41,7 +42,8 @@ class Course(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2, default=0.0)
     duration = models.IntegerField(help_text="Продолжительность в часах", default=1)  
     image = models.ImageField(upload_to='courses/', blank=True, null=True)
-    instructor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='courses')
+    # Отдельный индекс по преподавателю не нужен: его покрывает course_instructor_start_idx
+    instructor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='courses', db_index=False)
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True)
     syllabus = models.TextField(blank=True, null=True, help_text="Программа курса")  
     requirements = models.TextField(blank=True, null=True, help_text="Требования к слушателям")
@@ -51,12 +53,32 @@ class Course(models.Model):
     start_date = models.DateField(blank=True, null=True, help_text="Дата начала курса")
     end_date = models.DateField(blank=True, null=True, help_text="Дата окончания курса")
     is_popular = models.BooleanField(default=False, help_text="Популярный курс")
+    updated_at = models.DateTimeField(auto_now=True, help_text="Время последнего изменения")
 
     def __str__(self):
         return self.title
 
     class Meta:
         ordering = ['id']
+        indexes = [
+            models.Index(fields=['instructor', 'start_date'], name='course_instructor_start_idx'),
+        ]
+
+
+# Денормализованная статистика курса. Поддерживается инкрементально сигналами и пакетными
+# операциями (см. courses/stats.py), полностью пересчитывается командой rebuild_course_stats
+class CourseStats(models.Model):
+    course = models.OneToOneField(Course, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    review_count = models.PositiveIntegerField(default=0)
+    testimonial_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.IntegerField(default=0, help_text="Сумма оценок отзывов и отзывов студентов")
+    average_rating = models.FloatField(default=0.0, help_text="Средняя оценка по отзывам и отзывам студентов")
+    enrollment_count = models.PositiveIntegerField(default=0, help_text="Количество подтвержденных записей")
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0, help_text="Сумма успешных платежей")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Stats for {self.course_id}"
 
 
 # Модель преподавателей
@@ -79,7 +101,7 @@ class Payment(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     course = models.ForeignKey(Course, on_delete=models.CASCADE)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
-    stripe_payment_intent = models.CharField(max_length=200)  # ID платежа Stripe
+    stripe_payment_intent = models.CharField(max_length=200, db_index=True)  # ID платежа Stripe
     timestamp = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=20, default='pending')
 
@@ -93,12 +115,18 @@ class Review(models.Model):
     text = models.TextField()
     video_url = models.URLField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
-    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='reviews')  
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='reviews', db_index=False)
     rating = models.IntegerField(default=5, help_text="Рейтинг от 1 до 5")
 
     def __str__(self):
         return f"{self.author} - {self.course.title}"
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='review_created_at_idx'),
+            models.Index(fields=['course', '-created_at'], name='review_course_created_idx'),
+        ]
+
 
 # Модель событий    
 class Event(models.Model):
@@ -120,7 +148,7 @@ class Enrollment(models.Model):
         ('cancelled', 'Cancelled'),
     ]
      
-    student = models.ForeignKey(User, on_delete=models.CASCADE)
+    student = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)
     course = models.ForeignKey(Course, on_delete=models.CASCADE)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     enrolled_on = models.DateTimeField(auto_now_add=True)  
@@ -129,6 +157,17 @@ class Enrollment(models.Model):
     def __str__(self):
         return f"{self.student.username} - {self.course.title}"
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-enrolled_on', '-id'], name='enrollment_enrolled_on_idx'),
+            # Подсчет подтвержденных записей курса
+            models.Index(fields=['course'], condition=models.Q(status='confirmed'), name='enrollment_confirmed_idx'),
+        ]
+        constraints = [
+            # Покрывает и поиск записи по студенту, курсу и статусу
+            models.UniqueConstraint(fields=['student', 'course'], name='enrollment_student_course_uniq'),
+        ]
+
 
 # Модель услуг    
 class Service(models.Model):
@@ -157,6 +196,7 @@ class FAQ(models.Model):
     question = models.CharField(max_length=255)
     answer = models.TextField()
     category = models.CharField(max_length=100, blank=True, null=True, help_text="Категория FAQ")
+    updated_at = models.DateTimeField(auto_now=True, help_text="Время последнего изменения")
 
     def __str__(self):
         return self.question
@@ -173,6 +213,11 @@ class ContactMessage(models.Model):
     def __str__(self):
         return self.name
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-received_at'], name='contact_received_at_idx'),
+        ]
+
 
 # Модель отзывов студентов    
 class Testimonial(models.Model):
@@ -197,6 +242,11 @@ class BlogPost(models.Model):
 
     def __str__(self):
         return self.title
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='blogpost_created_at_idx'),
+        ]
     
 class CourseProgress(models.Model):
     student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='progress')
@@ -211,16 +261,134 @@ class CourseProgress(models.Model):
 
     class Meta:
         unique_together = ('student', 'course')
+        indexes = [
+            # Выбор завершивших курс студентов при выдаче сертификатов
+            models.Index(fields=['course'], condition=models.Q(is_completed=True), name='progress_completed_idx'),
+        ]
+
+# Завершение отдельного урока студентом. Повторная отправка того же урока с другого устройства
+# отбрасывается уникальным ограничением, а CourseProgress пересчитывается по этим записям
+class LessonCompletion(models.Model):
+    student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='lesson_completions', db_index=False)
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='lesson_completions')
+    lesson = models.PositiveIntegerField(help_text="Номер урока")
+    completed_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.student.username} - {self.course.title} - lesson {self.lesson}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['student', 'course', 'lesson'], name='lesson_completion_uniq'),
+        ]
 
 class Certificate(models.Model):
+    # PDF генерируется в фоне воркером process_certificates
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('rendering', 'Rendering'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    ]
+
     student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='certificates')
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='certificates')
     issued_on = models.DateTimeField(auto_now_add=True)
     certificate_url = models.URLField(blank=True, null=True, help_text="URL сертификата")
     verified = models.BooleanField(default=False, help_text="Сертификат проверен и действителен")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', help_text="Статус генерации PDF")
+    attempts = models.PositiveIntegerField(default=0, help_text="Количество попыток генерации")
+    error = models.TextField(blank=True, null=True, help_text="Ошибка последней попытки генерации")
 
     def __str__(self):
         return f"Certificate for {self.student.username} - {self.course.title}"
 
     class Meta:
         unique_together = ('student', 'course')
+        indexes = [
+            models.Index(fields=['status', 'id'], name='certificate_status_idx'),
+        ]
+
+
+# Документ поискового индекса: текст курсов, статей, блога и FAQ в едином формате.
+# Полнотекстовый индекс над таблицей строится средствами СУБД (FTS5 в SQLite, tsvector/GIN в Postgres)
+class SearchDocument(models.Model):
+    CONTENT_TYPE_CHOICES = [
+        ('course', 'Course'),
+        ('article', 'Knowledge Base Article'),
+        ('blog', 'Blog Post'),
+        ('faq', 'FAQ'),
+    ]
+
+    content_type = models.CharField(max_length=20, choices=CONTENT_TYPE_CHOICES)
+    object_id = models.BigIntegerField()
+    title = models.CharField(max_length=255)
+    body = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.content_type}:{self.object_id} - {self.title}"
+
+    class Meta:
+        unique_together = ('content_type', 'object_id')
+
+
+# Исходящие письма (outbox): запись создается в той же транзакции, что и событие,
+# а отправку выполняет отдельный воркер (команда send_queued_mail)
+class OutboundEmail(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True, null=True)
+    from_email = models.CharField(max_length=254)
+    recipients = models.JSONField(default=list)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0, help_text="Количество попыток отправки")
+    next_attempt_at = models.DateTimeField(default=timezone.now, help_text="Время следующей попытки")
+    last_error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.recipients)} ({self.status})"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbound_email_queue_idx'),
+        ]
+
+
+# Журнал вебхуков Stripe: id события — первичный ключ, поэтому повторные доставки
+# отбрасываются вставкой без конфликта, а обработку выполняет воркер process_stripe_events
+class StripeEvent(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('processed', 'Processed'),
+        ('failed', 'Failed'),
+    ]
+
+    event_id = models.CharField(max_length=255, primary_key=True)
+    type = models.CharField(max_length=100)
+    payload = models.JSONField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, null=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+    claimed_until = models.DateTimeField(blank=True, null=True, help_text="Срок захвата события воркером")
+
+    def __str__(self):
+        return f"{self.event_id} ({self.type})"
+
+    class Meta:
+        indexes = [
+            # Захват пакета выбирает ожидающие и просроченные захваченные события, как очередь писем
+            models.Index(fields=['status', 'received_at'], name='stripe_event_queue_idx'),
+        ]
@@ -0,0 +1,154 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.html import strip_tags
+
+from .models import OutboundEmail
+
+# Инициализация логгера для очереди писем
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_MAX_ATTEMPTS = 5
+# Экспоненциальная задержка между попытками: 30 с, 1 мин, 2 мин ... не более часа
+RETRY_BASE_DELAY = 30
+RETRY_MAX_DELAY = 60 * 60
+# Время, на которое воркер захватывает пакет; после него незавершенные письма забирает другой воркер
+CLAIM_TIMEOUT = 5 * 60
+
+
+def build_email(subject, message, recipient_list, from_email=None, html_message=None):
+    """
+    Создает несохраненную запись очереди. Используется для пакетной постановки через bulk_create.
+    """
+    return OutboundEmail(
+        subject=subject,
+        body=message,
+        html_body=html_message,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        recipients=list(recipient_list),
+    )
+
+
+def enqueue_email(subject, message, recipient_list, from_email=None, html_message=None):
+    """
+    Ставит письмо в очередь вместо синхронной отправки.
+    Запись создается в текущей транзакции, поэтому письмо становится видимым воркеру
+    только после коммита и исчезает вместе с откатом.
+    """
+    email = build_email(subject, message, recipient_list, from_email, html_message)
+    email.save()
+    return email
+
+
+def enqueue_emails(emails):
+    """
+    Пакетная постановка писем, созданных build_email, одним запросом.
+    """
+    return OutboundEmail.objects.bulk_create(emails, batch_size=500)
+
+
+def _retry_delay(attempts):
+    return timedelta(seconds=min(RETRY_BASE_DELAY * 2 ** (attempts - 1), RETRY_MAX_DELAY))
+
+
+def claim_batch(batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Захватывает пакет писем, готовых к отправке. Письма, захваченные упавшим воркером,
+    возвращаются в работу по истечении CLAIM_TIMEOUT.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        queryset = OutboundEmail.objects.filter(
+            Q(status='pending') | Q(status='sending'), next_attempt_at__lte=now,
+        ).order_by('next_attempt_at', 'id')
+        if connection.features.has_select_for_update_skip_locked:
+            queryset = queryset.select_for_update(skip_locked=True)
+
+        batch = list(queryset[:batch_size])
+        if batch:
+            OutboundEmail.objects.filter(id__in=[email.id for email in batch]).update(
+                status='sending', next_attempt_at=now + timedelta(seconds=CLAIM_TIMEOUT),
+            )
+    return batch
+
+
+def _to_message(email, mail_connection):
+    message = EmailMultiAlternatives(
+        subject=email.subject,
+        body=email.body or strip_tags(email.html_body or ''),
+        from_email=email.from_email,
+        to=email.recipients,
+        connection=mail_connection,
+    )
+    if email.html_body:
+        message.attach_alternative(email.html_body, 'text/html')
+    return message
+
+
+def send_batch(batch, mail_connection, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """
+    Отправляет захваченный пакет через одно открытое SMTP-соединение.
+    Возвращает количество отправленных и окончательно неотправленных писем.
+    """
+    sent_ids = []
+    failed = 0
+    for email in batch:
+        try:
+            mail_connection.send_messages([_to_message(email, mail_connection)])
+        except Exception as e:
+            email.attempts += 1
+            email.last_error = str(e)
+            if email.attempts >= max_attempts:
+                email.status = 'failed'
+                failed += 1
+            else:
+                email.status = 'pending'
+                email.next_attempt_at = timezone.now() + _retry_delay(email.attempts)
+            email.save(update_fields=['attempts', 'last_error', 'status', 'next_attempt_at'])
+            logger.warning(f"Failed to send email {email.id} (attempt {email.attempts}): {e}")
+
+            # Соединение могло быть разорвано сервером — переоткрываем его
+            try:
+                mail_connection.close()
+                mail_connection.open()
+            except Exception as reconnect_error:
+                logger.error(f"Failed to reopen mail connection: {reconnect_error}")
+        else:
+            sent_ids.append(email.id)
+
+    if sent_ids:
+        OutboundEmail.objects.filter(id__in=sent_ids).update(
+            status='sent', sent_at=timezone.now(), attempts=F('attempts') + 1, last_error=None,
+        )
+    return len(sent_ids), failed
+
+
+def drain_outbox(batch_size=DEFAULT_BATCH_SIZE, max_attempts=DEFAULT_MAX_ATTEMPTS, max_batches=None):
+    """
+    Отправляет письма из очереди пакетами, пока она не опустеет.
+    Возвращает количество отправленных и окончательно неотправленных писем.
+    """
+    total_sent = total_failed = batches = 0
+    mail_connection = get_connection(fail_silently=False)
+    mail_connection.open()
+    try:
+        while max_batches is None or batches < max_batches:
+            batch = claim_batch(batch_size)
+            if not batch:
+                break
+            sent, failed = send_batch(batch, mail_connection, max_attempts)
+            total_sent += sent
+            total_failed += failed
+            batches += 1
+    finally:
+        mail_connection.close()
+
+    if total_sent or total_failed:
+        logger.info(f"Outbox drained: {total_sent} sent, {total_failed} failed.")
+    return total_sent, total_failed
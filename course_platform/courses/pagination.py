@@ -0,0 +1,60 @@
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Курсорная (keyset) пагинация для всех списков API.
+    Страница выбирается условием по индексированному полю сортировки вместо OFFSET,
+    поэтому стоимость запроса не зависит от номера страницы.
+    Порядок берется из атрибута `ordering` представления или из OrderingFilter.
+    Подсчет общего числа записей можно отключить параметром `?count=false`.
+    """
+    ordering = ('id',)
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    count_query_param = 'count'
+
+    def get_ordering(self, request, queryset, view):
+        has_ordering_filter = any(
+            hasattr(backend, 'get_ordering') for backend in getattr(view, 'filter_backends', [])
+        )
+        if has_ordering_filter:
+            ordering = tuple(super().get_ordering(request, queryset, view))
+            # Поля из OrderingFilter (рейтинг, число записей) не уникальны: без id порядок строк
+            # с равными значениями не определен и на границах страниц строки повторяются или теряются
+            if not {'id', '-id', 'pk', '-pk'} & set(ordering):
+                ordering += ('id',)
+            return ordering
+
+        ordering = getattr(view, 'ordering', None) or self.ordering
+        if isinstance(ordering, str):
+            return (ordering,)
+        return tuple(ordering)
+
+    def include_count(self, request):
+        value = request.query_params.get(self.count_query_param, 'true')
+        return value.lower() not in ('0', 'false', 'no', 'off')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = queryset.count() if self.include_count(request) else None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        response_data = {}
+        if self.count is not None:
+            response_data['count'] = self.count
+        response_data.update({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+        return Response(response_data)
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties'] = {
+            'count': {'type': 'integer', 'example': 123},
+            **response_schema['properties'],
+        }
+        return response_schema
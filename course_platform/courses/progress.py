@@ -0,0 +1,103 @@
+import logging
+
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, Value, When
+from django.db.models.functions import Cast, Least
+
+from .models import Certificate, CourseProgress, LessonCompletion
+from .sqlite_tuning import retry_on_lock
+
+# Инициализация логгера для прогресса обучения
+logger = logging.getLogger(__name__)
+
+def _progress_percent():
+    # Процент вычисляется в самой базе данных из текущих значений строки
+    return Case(
+        When(total_lessons__gt=0, then=Least(
+            Cast(F('completed_lessons'), FloatField()) * Value(100.0) / Cast(F('total_lessons'), FloatField()),
+            Value(100.0),
+        )),
+        default=Value(0.0),
+    )
+
+
+def refresh_progress(queryset):
+    """
+    Пересчитывает процент и признак завершения для строк queryset одним UPDATE по их текущим счетчикам.
+    update() не отправляет сигналы, поэтому сертификаты для впервые завершенных курсов
+    ставятся в очередь здесь же. Возвращает количество впервые завершенных курсов.
+    """
+    with transaction.atomic():
+        queryset.update(progress=_progress_percent())
+
+        newly_completed = list(
+            queryset.filter(is_completed=False, total_lessons__gt=0, completed_lessons__gte=F('total_lessons'))
+                    .values_list('id', 'student_id', 'course_id')
+        )
+        if newly_completed:
+            CourseProgress.objects.filter(id__in=[row[0] for row in newly_completed]).update(is_completed=True)
+            Certificate.objects.bulk_create(
+                [Certificate(student_id=student_id, course_id=course_id) for _, student_id, course_id in newly_completed],
+                ignore_conflicts=True,
+            )
+    return len(newly_completed)
+
+
+@retry_on_lock
+def update_progress(queryset, values):
+    """
+    Записывает переданные поля прогресса и пересчитывает процент по актуальным счетчикам.
+    """
+    with transaction.atomic():
+        queryset.update(**values)
+        return refresh_progress(queryset)
+
+
+def _lesson_counts(student, course_ids):
+    return dict(
+        LessonCompletion.objects.filter(student=student, course_id__in=course_ids)
+                                .order_by().values_list('course_id').annotate(count=Count('*'))
+    )
+
+
+@retry_on_lock
+def record_lessons(student, events):
+    """
+    Сохраняет пакет событий завершения уроков одного студента.
+    events — список словарей с курсом, номером урока и временем завершения.
+    Число запросов не зависит от размера пакета. Счетчик завершенных уроков каждого курса
+    увеличивается через F() на число действительно вставленных событий (подсчет до и после
+    вставки), поэтому повтор урока не считается дважды, а значения, записанные через
+    PATCH /api/progress/<pk>/, сохраняются. Строки прогресса блокируются на время пакета,
+    чтобы одновременные отправки с нескольких устройств не учли чужие события.
+    Возвращает id курсов, прогресс которых был обновлен.
+    """
+    course_ids = {event['course'].id for event in events}
+
+    with transaction.atomic():
+        # Строки прогресса создаются для курсов, по которым событий раньше не было
+        CourseProgress.objects.bulk_create(
+            [CourseProgress(student=student, course_id=course_id) for course_id in course_ids],
+            ignore_conflicts=True,
+        )
+        progress = CourseProgress.objects.filter(student=student, course_id__in=course_ids)
+        list(progress.select_for_update().order_by('id').values_list('id', flat=True))
+
+        before = _lesson_counts(student, course_ids)
+        LessonCompletion.objects.bulk_create(
+            [LessonCompletion(student=student, course=event['course'], lesson=event['lesson'],
+                              completed_at=event['completed_at'])
+             for event in events],
+            ignore_conflicts=True,
+        )
+        inserted = {course_id: count - before.get(course_id, 0)
+                    for course_id, count in _lesson_counts(student, course_ids).items()}
+
+        progress.update(completed_lessons=F('completed_lessons') + Case(
+            *(When(course_id=course_id, then=Value(count)) for course_id, count in inserted.items()),
+            default=Value(0),
+        ))
+        completed_now = refresh_progress(progress)
+
+    logger.info(f"Recorded {len(events)} lesson events for {student.username}, {completed_now} courses completed.")
+    return course_ids
@@ -0,0 +1,210 @@
+import re
+import logging
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import BaseFilterBackend
+
+from .models import Course, KnowledgeBaseArticle, BlogPost, FAQ, SearchDocument
+
+# Инициализация логгера для поискового индекса
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'courses_searchdocument_fts'
+DOCUMENT_TABLE = SearchDocument._meta.db_table
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+def _course_document(course):
+    return course.title, '\n'.join(filter(None, [course.description, course.syllabus, course.requirements]))
+
+
+def _article_document(article):
+    return article.title, article.content
+
+
+def _blog_document(post):
+    return post.title, '\n'.join(filter(None, [post.content, post.tags]))
+
+
+def _faq_document(faq):
+    return faq.question, faq.answer
+
+
+# Индексируемые модели: тип документа -> (модель, функция извлечения заголовка и текста)
+SEARCHABLE_MODELS = {
+    'course': (Course, _course_document),
+    'article': (KnowledgeBaseArticle, _article_document),
+    'blog': (BlogPost, _blog_document),
+    'faq': (FAQ, _faq_document),
+}
+CONTENT_TYPES = {model: content_type for content_type, (model, _) in SEARCHABLE_MODELS.items()}
+
+
+def index_instance(instance):
+    """
+    Добавляет или обновляет документ поискового индекса для объекта.
+    Сам полнотекстовый индекс обновляется триггерами или вычисляемым столбцом СУБД.
+    """
+    content_type = CONTENT_TYPES[type(instance)]
+    title, body = SEARCHABLE_MODELS[content_type][1](instance)
+    SearchDocument.objects.update_or_create(
+        content_type=content_type,
+        object_id=instance.pk,
+        defaults={'title': title[:255], 'body': body or ''},
+    )
+
+
+def remove_instance(instance):
+    SearchDocument.objects.filter(content_type=CONTENT_TYPES[type(instance)], object_id=instance.pk).delete()
+
+
+def rebuild_index(batch_size=1000):
+    """
+    Полная перестройка индекса. Возвращает количество проиндексированных документов.
+    """
+    SearchDocument.objects.all().delete()
+    total = 0
+    for content_type, (model, extract) in SEARCHABLE_MODELS.items():
+        batch = []
+        for instance in model.objects.all().iterator(chunk_size=batch_size):
+            title, body = extract(instance)
+            batch.append(SearchDocument(content_type=content_type, object_id=instance.pk,
+                                        title=title[:255], body=body or ''))
+            if len(batch) >= batch_size:
+                SearchDocument.objects.bulk_create(batch)
+                total += len(batch)
+                batch = []
+        SearchDocument.objects.bulk_create(batch)
+        total += len(batch)
+    logger.info(f"Search index rebuilt: {total} documents.")
+    return total
+
+
+def _terms(query):
+    # Из пользовательского ввода берутся только слова, чтобы синтаксис FTS не ломал запрос
+    return re.findall(r'\w+', query.lower())[:16]
+
+
+def _sqlite_match(terms):
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def _postgres_tsquery(terms):
+    return ' & '.join(f'{term}:*' for term in terms)
+
+
+def _match_sql(terms, content_types):
+    """
+    Возвращает (sql, params) запроса, выбирающего id документов, тип, id объекта и ранг.
+    Чем больше ранг, тем релевантнее документ.
+    """
+    type_placeholders = ', '.join(['%s'] * len(content_types))
+    vendor = connection.vendor
+
+    if vendor == 'sqlite':
+        sql = (
+            f"SELECT d.id, d.content_type, d.object_id, -bm25({FTS_TABLE}, 10.0, 1.0) AS rank "
+            f"FROM {FTS_TABLE} JOIN {DOCUMENT_TABLE} d ON d.id = {FTS_TABLE}.rowid "
+            f"WHERE {FTS_TABLE} MATCH %s AND d.content_type IN ({type_placeholders})"
+        )
+        return sql, [_sqlite_match(terms), *content_types]
+
+    if vendor == 'postgresql':
+        sql = (
+            f"SELECT d.id, d.content_type, d.object_id, "
+            f"ts_rank_cd(d.search_vector, to_tsquery('simple', %s)) AS rank "
+            f"FROM {DOCUMENT_TABLE} d "
+            f"WHERE d.search_vector @@ to_tsquery('simple', %s) AND d.content_type IN ({type_placeholders})"
+        )
+        tsquery = _postgres_tsquery(terms)
+        return sql, [tsquery, tsquery, *content_types]
+
+    # Прочие СУБД: поиск без индекса по подстроке
+    conditions = ' AND '.join(['(LOWER(d.title) LIKE %s OR LOWER(d.body) LIKE %s)'] * len(terms))
+    sql = (
+        f"SELECT d.id, d.content_type, d.object_id, 1.0 AS rank FROM {DOCUMENT_TABLE} d "
+        f"WHERE {conditions} AND d.content_type IN ({type_placeholders})"
+    )
+    params = []
+    for term in terms:
+        params += [f'%{term}%', f'%{term}%']
+    return sql, [*params, *content_types]
+
+
+def search(query, content_types=None, limit=DEFAULT_LIMIT):
+    """
+    Ранжированный поиск по всем типам документов.
+    Возвращает список словарей с типом, id объекта, заголовком, фрагментом текста и рангом.
+    """
+    terms = _terms(query)
+    content_types = [t for t in (content_types or SEARCHABLE_MODELS) if t in SEARCHABLE_MODELS]
+    if not terms or not content_types:
+        return []
+
+    limit = max(1, min(int(limit), MAX_LIMIT))
+    sql, params = _match_sql(terms, content_types)
+    with connection.cursor() as cursor:
+        cursor.execute(f"{sql} ORDER BY rank DESC LIMIT %s", [*params, limit])
+        rows = cursor.fetchall()
+
+    documents = SearchDocument.objects.in_bulk([row[0] for row in rows])
+    results = []
+    for document_id, content_type, object_id, rank in rows:
+        document = documents.get(document_id)
+        if document is None:
+            continue
+        results.append({
+            'type': content_type,
+            'id': object_id,
+            'title': document.title,
+            'snippet': _snippet(document.body, terms),
+            'rank': round(float(rank), 4),
+        })
+    return results
+
+
+def _snippet(body, terms, width=160):
+    lowered = body.lower()
+    positions = [lowered.find(term) for term in terms if lowered.find(term) >= 0]
+    start = max(0, min(positions) - width // 4) if positions else 0
+    fragment = body[start:start + width].strip()
+    prefix = '…' if start > 0 else ''
+    suffix = '…' if start + width < len(body) else ''
+    return f'{prefix}{fragment}{suffix}'
+
+
+def matching_ids(content_type, query):
+    """
+    Подзапрос с id объектов указанного типа, подходящих под запрос, для фильтрации queryset.
+    """
+    terms = _terms(query)
+    if not terms:
+        return None
+    sql, params = _match_sql(terms, [content_type])
+    return RawSQL(f"SELECT m.object_id FROM ({sql}) m", params)
+
+
+class FullTextSearchFilter(BaseFilterBackend):
+    """
+    Фильтр DRF по параметру `?search=`, использующий полнотекстовый индекс
+    вместо LIKE '%term%'. Тип документа берется из атрибута представления `search_content_type`.
+    """
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '')
+        ids = matching_ids(view.search_content_type, query)
+        if ids is None:
+            return queryset
+        return queryset.filter(pk__in=ids)
+
+    def get_schema_operation_parameters(self, view):
+        return [{
+            'name': self.search_param,
+            'required': False,
+            'in': 'query',
+            'description': 'Полнотекстовый поиск',
+            'schema': {'type': 'string'},
+        }]
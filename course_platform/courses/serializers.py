@@ -1,8 +1,10 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from django.utils import timezone
 from .models import (
     Category, Course, Enrollment, Teacher, Review, Event,
-    Service, KnowledgeBaseArticle, FAQ, Payment, Testimonial, BlogPost, ContactMessage, Profile, CourseProgress, Certificate
+    Service, KnowledgeBaseArticle, FAQ, Payment, Testimonial, BlogPost, ContactMessage, Profile, CourseProgress, Certificate,
+    CourseStats
 )
 
 class ProfileSerializer(serializers.ModelSerializer):
@@ -27,22 +29,48 @@ class TeacherSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+# Сериализатор для статистики курса
+class CourseStatsSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CourseStats
+        fields = ['average_rating', 'review_count', 'testimonial_count', 'enrollment_count', 'revenue']
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # Выручка видна только сотрудникам
+        request = self.context.get('request')
+        if not (request and request.user.is_staff):
+            data.pop('revenue')
+        return data
+
+
 # Сериализатор для курсов с вложенными полями
 class CourseSerializer(serializers.ModelSerializer):
     # Вложенные сериализаторы для создания курса
     category = CategorySerializer()
-    instructor = TeacherSerializer()
+    # instructor ссылается на User, поэтому профиль преподавателя берется через teacher_profile
+    instructor = TeacherSerializer(source='instructor.teacher_profile', read_only=True)
     
     reviews = serializers.StringRelatedField(many=True, read_only=True)
+    stats = CourseStatsSerializer(read_only=True)
 
     class Meta:
         model = Course
         fields = [
             'id', 'title', 'description', 'price', 'duration',
             'syllabus', 'requirements', 'level', 'type', 'language',
-            'start_date', 'end_date', 'is_popular', 'category', 'instructor', 'reviews'
+            'start_date', 'end_date', 'is_popular', 'updated_at', 'category', 'instructor', 'reviews', 'stats'
         ]
 
+    @staticmethod
+    def setup_eager_loading(queryset, prefix=''):
+        """
+        Загружает все связанные данные, нужные сериализатору, фиксированным числом запросов.
+        Prefetch отзывов заполняет review.course, поэтому Review.__str__ не делает запросов.
+        """
+        return queryset.select_related(f'{prefix}category', f'{prefix}instructor__teacher_profile', f'{prefix}stats') \
+                       .prefetch_related(f'{prefix}reviews')
+
     def validate_price(self, value):
         """
         Приведение поля 'price' к правильному формату.
@@ -62,6 +90,10 @@ class TestimonialSerializer(serializers.ModelSerializer):
         model = Testimonial
         fields = '__all__'
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return CourseSerializer.setup_eager_loading(queryset, prefix='course__')
+
 
 # Сериализатор для управления записями на курсы
 class EnrollmentSerializer(serializers.ModelSerializer):
@@ -73,6 +105,40 @@ class EnrollmentSerializer(serializers.ModelSerializer):
         }
 
 
+class BulkEnrollmentItemSerializer(serializers.Serializer):
+    student = serializers.IntegerField(min_value=1)
+    course = serializers.IntegerField(min_value=1)
+    status = serializers.ChoiceField(choices=Enrollment.STATUS_CHOICES, default='pending')
+
+
+# Пакетная запись на курсы: студенты и курсы проверяются двумя запросами in_bulk,
+# а не отдельным запросом на каждый элемент, как в PrimaryKeyRelatedField
+class BulkEnrollmentSerializer(serializers.Serializer):
+    MAX_ITEMS = 1000
+
+    enrollments = BulkEnrollmentItemSerializer(many=True, allow_empty=False, max_length=MAX_ITEMS)
+
+    def validate_enrollments(self, items):
+        students = User.objects.in_bulk({item['student'] for item in items})
+        courses = Course.objects.in_bulk({item['course'] for item in items})
+
+        errors = []
+        for item in items:
+            item_errors = {}
+            if item['student'] not in students:
+                item_errors['student'] = [f"Пользователь {item['student']} не найден."]
+            if item['course'] not in courses:
+                item_errors['course'] = [f"Курс {item['course']} не найден."]
+            errors.append(item_errors)
+        if any(errors):
+            raise serializers.ValidationError(errors)
+
+        return [
+            {**item, 'student': students[item['student']], 'course': courses[item['course']]}
+            for item in items
+        ]
+
+
 # Сериализатор для отзывов к курсам
 class ReviewSerializer(serializers.ModelSerializer):
     course = serializers.SlugRelatedField(slug_field='title', queryset=Course.objects.all())
@@ -144,6 +210,36 @@ class CourseProgressSerializer(serializers.ModelSerializer):
     class Meta:
         model = CourseProgress
         fields = '__all__'
+        # Процент и признак завершения вычисляются из счетчиков уроков
+        read_only_fields = ['progress', 'is_completed']
+
+
+class LessonCompletionItemSerializer(serializers.Serializer):
+    course = serializers.IntegerField(min_value=1)
+    lesson = serializers.IntegerField(min_value=1)
+    completed_at = serializers.DateTimeField(required=False)
+
+
+# Пакет событий завершения уроков; курсы проверяются одним запросом in_bulk
+class LessonCompletionBatchSerializer(serializers.Serializer):
+    MAX_EVENTS = 500
+
+    events = LessonCompletionItemSerializer(many=True, allow_empty=False, max_length=MAX_EVENTS)
+
+    def validate_events(self, events):
+        courses = Course.objects.in_bulk({event['course'] for event in events})
+        errors = [
+            {} if event['course'] in courses else {'course': [f"Курс {event['course']} не найден."]}
+            for event in events
+        ]
+        if any(errors):
+            raise serializers.ValidationError(errors)
+
+        now = timezone.now()
+        return [
+            {**event, 'course': courses[event['course']], 'completed_at': event.get('completed_at', now)}
+            for event in events
+        ]
 
 
 class CertificateSerializer(serializers.ModelSerializer):
@@ -1,87 +1,195 @@
-from django.core.cache import cache
+from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
 from .models import Course
+from .caching import (
+    aget_or_compute, aversioned_key, bump_versions, get_or_compute, get_versions, versioned_key,
+)
+from .db_routing import replica_reads
+from datetime import datetime, timezone
+import hashlib
 import logging
 
 # Инициализация логгера для отслеживания кэширования и запросов
 logger = logging.getLogger(__name__)
 
+# Данные сбрасываются сменой поколения, поэтому срок жизни ключей может быть большим
+COURSE_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Области поколений кэша
+COURSES_SCOPE = 'courses'
+CATEGORIES_SCOPE = 'categories'
+TEACHERS_SCOPE = 'teachers'
+REVIEWS_SCOPE = 'reviews'
+COURSE_STATS_SCOPE = 'course_stats'
+FAQS_SCOPE = 'faqs'
+
+# Области, от которых зависят HTML-страницы каталога
+CATALOG_SCOPES = (COURSES_SCOPE, CATEGORIES_SCOPE, TEACHERS_SCOPE)
+# Области, от которых зависит список /api/courses/
+COURSE_API_SCOPES = (*CATALOG_SCOPES, REVIEWS_SCOPE, COURSE_STATS_SCOPE)
+
+
+def course_scope(course_id):
+    return f'course:{course_id}'
+
+
+def instructor_scope(instructor_id):
+    return f'instructor:{instructor_id}'
+
+
+def invalidate_course(course_id, *instructor_ids):
+    """
+    Сброс кэша курса, общего каталога и списков курсов указанных преподавателей.
+    """
+    scopes = [COURSES_SCOPE, course_scope(course_id)]
+    scopes += [instructor_scope(instructor_id) for instructor_id in instructor_ids if instructor_id]
+    bump_versions(*scopes)
+
+
+def catalog_version():
+    """
+    Текущая версия каталога: строка из номеров поколений всех его областей.
+    Используется в ключах фрагментного кэша HTML-страниц и в их ETag.
+    """
+    versions = get_versions(*CATALOG_SCOPES)
+    return '.'.join(str(versions[scope]) for scope in CATALOG_SCOPES)
+
+
+def catalog_etag(*parts):
+    """
+    ETag страницы каталога: версия каталога плюс параметры страницы (например, номер).
+    """
+    value = ':'.join([catalog_version(), *map(str, parts)])
+    return hashlib.md5(value.encode()).hexdigest()
+
+
+def _changed_at(versions):
+    # Номер поколения растет не медленнее часов и при смене равен текущему времени в миллисекундах,
+    # поэтому максимум номеров и есть время последнего изменения
+    changed_at = datetime.fromtimestamp(max(versions.values()) / 1000, tz=timezone.utc)
+    # При частых сменах номер может немного обогнать часы
+    return min(changed_at, datetime.now(tz=timezone.utc))
+
+
+def catalog_last_modified():
+    """
+    Время последнего изменения каталога по номерам поколений его областей.
+    """
+    return _changed_at(get_versions(*CATALOG_SCOPES))
+
+
+def resource_validators(scopes, *parts):
+    """
+    ETag и Last-Modified ресурса API по номерам поколений областей, без сериализации
+    и без обращения к БД. parts — параметры, от которых еще зависит ответ
+    (путь со строкой запроса, права пользователя).
+    """
+    versions = get_versions(*scopes)
+    value = ':'.join([*(str(versions[scope]) for scope in scopes), *map(str, parts)])
+    return hashlib.md5(value.encode()).hexdigest(), _changed_at(versions)
+
+
+def replica_may_lag(changed_at):
+    """
+    Могла ли реплика еще не получить изменение, сделанное в changed_at
+    (не прошло DATABASE_REPLICA_MAX_LAG секунд).
+    """
+    max_lag = getattr(settings, 'DATABASE_REPLICA_MAX_LAG', 5)
+    return (datetime.now(tz=timezone.utc) - changed_at).total_seconds() < max_lag
+
+
+def _fill_from_replica(compute, *scopes):
+    """
+    Пересчет значения кэша с чтением с реплики. Если область менялась недавно,
+    реплика могла еще не получить изменения, и пересчет идет с основной базы:
+    иначе устаревшие данные закэшировались бы под новым поколением.
+    """
+    def fill():
+        if replica_may_lag(_changed_at(get_versions(*scopes))):
+            return compute()
+        with replica_reads():
+            return compute()
+    return fill
+
+
 def get_course_details(course_id):
     """
     Получение детализированной информации о курсе с использованием кэширования.
-    Если данные не найдены в кэше, извлекает их из базы данных и добавляет в кэш.
+    Если данные не найдены в кэше, их извлекает из базы данных только один процесс.
     """
-    # Получаем данные из кэша
-    course_data = cache.get(f'course_details_{course_id}')
-    
-    if not course_data:
+    scopes = (course_scope(course_id), CATEGORIES_SCOPE)
+    cache_key = versioned_key(f'course_details_{course_id}', *scopes)
+
+    def compute():
         try:
             # Извлечение курса и связанных данных
             course = Course.objects.select_related('category', 'instructor').get(id=course_id)
-            
-            # Формирование структуры данных
-            course_data = {
-                'title': course.title,
-                'category': course.category.name,
-                'instructor': course.instructor.username,
-                'description': course.description,
-                'price': str(course.price),
-                'duration': course.duration,
-                'start_date': course.start_date,
-                'end_date': course.end_date,
-            }
-            
-            # Добавление данных в кэш на 10 минут
-            cache.set(f'course_details_{course_id}', course_data, 60 * 10)
-            logger.info(f"Course details for ID {course_id} cached successfully.")
         except ObjectDoesNotExist:
+            # Отсутствие курса тоже кэшируется: создание курса сменит поколение ключа
             logger.error(f"Course with ID {course_id} not found.")
             return None
 
-    return course_data
+        logger.info(f"Course details for ID {course_id} cached successfully.")
+        return {
+            'title': course.title,
+            'category': course.category.name if course.category else None,
+            'instructor': course.instructor.username,
+            'description': course.description,
+            'price': str(course.price),
+            'duration': course.duration,
+            'start_date': course.start_date,
+            'end_date': course.end_date,
+        }
 
+    return get_or_compute(cache_key, _fill_from_replica(compute, *scopes), COURSE_CACHE_TIMEOUT)
 
-def get_instructor_courses(instructor_id):
-    """
-    Получение списка курсов для конкретного преподавателя.
-    Если данные не найдены в кэше, извлекает их из базы данных и добавляет в кэш.
-    """
-    # Пытаемся получить данные из кэша
-    courses_data = cache.get(f'instructor_courses_{instructor_id}')
-    
-    if not courses_data:
+
+def _instructor_courses_scopes(instructor_id):
+    return (instructor_scope(instructor_id), CATEGORIES_SCOPE)
+
+
+def _instructor_courses_compute(instructor_id):
+    def compute():
         # Оптимизация запроса с использованием select_related и values
         courses = Course.objects.select_related('instructor', 'category') \
                                 .filter(instructor_id=instructor_id) \
                                 .values('title', 'category__name', 'price', 'duration', 'start_date', 'end_date')
+        logger.info(f"Instructor courses for ID {instructor_id} cached successfully.")
+        return list(courses)
+    return _fill_from_replica(compute, *_instructor_courses_scopes(instructor_id))
 
-        courses_data = list(courses)
 
-        # Кэшируем результат на 20 минут
-        cache.set(f'instructor_courses_{instructor_id}', courses_data, 60 * 20)
-        logger.info(f"Instructor courses for ID {instructor_id} cached successfully.")
+def get_instructor_courses(instructor_id):
+    """
+    Получение списка курсов для конкретного преподавателя.
+    Если данные не найдены в кэше, их извлекает из базы данных только один процесс.
+    """
+    cache_key = versioned_key(f'instructor_courses_{instructor_id}', *_instructor_courses_scopes(instructor_id))
+    return get_or_compute(cache_key, _instructor_courses_compute(instructor_id), COURSE_CACHE_TIMEOUT)
 
-    return courses_data
+
+async def aget_instructor_courses(instructor_id):
+    """
+    Асинхронный вариант get_instructor_courses с тем же ключом кэша.
+    """
+    cache_key = await aversioned_key(f'instructor_courses_{instructor_id}', *_instructor_courses_scopes(instructor_id))
+    return await aget_or_compute(cache_key, _instructor_courses_compute(instructor_id), COURSE_CACHE_TIMEOUT)
 
 
 def get_all_courses():
     """
-    Извлекает и кэширует список всех курсов на 30 минут.
+    Извлекает и кэширует список всех курсов до следующего изменения каталога.
     """
-    courses_data = cache.get('all_courses')
-    
-    if not courses_data:
-        # Применяем prefetch_related для более оптимизированного запроса
+    scopes = (COURSES_SCOPE, CATEGORIES_SCOPE)
+    cache_key = versioned_key('all_courses', *scopes)
+
+    def compute():
         courses = Course.objects.select_related('category', 'instructor') \
-                                .prefetch_related('students') \
                                 .values('id', 'title', 'category__name', 'instructor__username', 'price', 'duration')
-
-        # Формируем данные и кэшируем
-        courses_data = list(courses)
-        cache.set('all_courses', courses_data, 60 * 30)
         logger.info("All courses data cached successfully.")
-    
-    return courses_data
+        return list(courses)
+
+    return get_or_compute(cache_key, _fill_from_replica(compute, *scopes), COURSE_CACHE_TIMEOUT)
 
 
 def update_course(course_id, updated_data):
@@ -89,11 +197,14 @@ def update_course(course_id, updated_data):
     Обновление данных курса и сброс кэша.
     """
     try:
-        # Обновление курса на основе переданных данных
-        Course.objects.filter(id=course_id).update(**updated_data)
+        # update() не вызывает сигналы, поэтому запоминаем преподавателя до обновления
+        old_instructor_id = Course.objects.filter(id=course_id).values_list('instructor_id', flat=True).first()
+
+        # Обновление курса на основе переданных данных; update() не заполняет auto_now
+        Course.objects.filter(id=course_id).update(**{'updated_at': datetime.now(tz=timezone.utc), **updated_data})
 
-        # Удаление кэша для конкретного курса
-        cache.delete(f'course_details_{course_id}')
+        new_instructor_id = updated_data.get('instructor_id', getattr(updated_data.get('instructor'), 'pk', None))
+        invalidate_course(course_id, old_instructor_id, new_instructor_id)
         logger.info(f"Course with ID {course_id} updated and cache cleared.")
     except Exception as e:
         logger.error(f"Error updating course with ID {course_id}: {str(e)}")
@@ -1,14 +1,22 @@
-from django.db.models.signals import post_save
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
-from django.core.mail import send_mail
-from django.conf import settings
 from .models import Enrollment, Payment
 import logging
 from django.contrib.auth.models import User
 from .models import Profile, CourseProgress, Certificate
-import os
-from django.template.loader import render_to_string
-from .certificate_generator import generate_certificate
+from .outbox import build_email, enqueue_emails
+from .deferred_signals import deferrable
+from .instrumentation import install_query_recorder
+from .models import Course, Category, Review, Teacher
+from .caching import bump_versions
+from .services import (
+    CATEGORIES_SCOPE, FAQS_SCOPE, REVIEWS_SCOPE, TEACHERS_SCOPE, course_scope, instructor_scope, invalidate_course,
+)
+from .models import KnowledgeBaseArticle, BlogPost, FAQ
+from .search import index_instance, remove_instance
+from .models import CourseStats, Testimonial
+from .stats import adjust, contribution
 
 # Инициализация логгера
 logger = logging.getLogger(__name__)
@@ -16,107 +24,188 @@ logger = logging.getLogger(__name__)
 # Сообщение о загрузке модуля сигналов
 logger.info("Signals module loaded!")
 
+# Учет SQL-запросов в метриках запроса (RequestLogMiddleware) на каждом новом соединении
+connection_created.connect(install_query_recorder, dispatch_uid='courses.install_query_recorder')
 
-@receiver(post_save, sender=Enrollment)
+
+def _enrollment_email(enrollment):
+    return build_email(
+        subject='Enrollment Confirmed',
+        message=f'Your enrollment for the course "{enrollment.course.title}" has been confirmed.',
+        recipient_list=[enrollment.student.email],
+    )
+
+
+def _payment_email(payment):
+    return build_email(
+        subject='Payment Successful',
+        message=f'Your payment for the course "{payment.course.title}" has been successfully processed.',
+        recipient_list=[payment.user.email],
+    )
+
+
+def _queue_enrollment_emails(calls):
+    enqueue_emails([_enrollment_email(e) for e, kwargs in calls if kwargs.get('created') and e.status == 'confirmed'])
+
+
+def _queue_payment_emails(calls):
+    enqueue_emails([_payment_email(p) for p, kwargs in calls if kwargs.get('created') and p.status == 'succeeded'])
+
+
+@receiver(post_save, sender=Enrollment, dispatch_uid='courses.send_enrollment_confirmation')
+@deferrable(batch=_queue_enrollment_emails)
 def send_enrollment_confirmation(sender, instance, created, **kwargs):
     """
     Отправляет письмо-подтверждение после успешного создания записи о регистрации на курс.
     """
     if created and instance.status == 'confirmed':
         logger.info(f"Enrollment Signal triggered for: {instance}")
-        logger.info(f"Sending enrollment confirmation email to: {instance.student.email}")
-
-        send_mail(
-            subject='Enrollment Confirmed',
-            message=f'Your enrollment for the course "{instance.course.title}" has been confirmed.',
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[instance.student.email],
-        )
+        logger.info(f"Queueing enrollment confirmation email to: {instance.student.email}")
+        _enrollment_email(instance).save()
 
-        logger.info(f"Email sent successfully to {instance.student.email}")
 
-
-@receiver(post_save, sender=Payment)
+@receiver(post_save, sender=Payment, dispatch_uid='courses.send_payment_confirmation')
+@deferrable(batch=_queue_payment_emails)
 def send_payment_confirmation(sender, instance, created, **kwargs):
     """
     Отправляет письмо-подтверждение после успешного платежа.
     """
     if created and instance.status == 'succeeded':
         logger.info(f"Payment Signal triggered for: {instance}")
-        logger.info(f"Sending payment confirmation email to: {instance.user.email}")
+        logger.info(f"Queueing payment confirmation email to: {instance.user.email}")
+        _payment_email(instance).save()
 
-        send_mail(
-            subject='Payment Successful',
-            message=f'Your payment for the course "{instance.course.title}" has been successfully processed.',
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[instance.user.email],
-        )
 
-        logger.info(f"Email sent successfully to {instance.user.email}")
+def _create_profiles(calls):
+    Profile.objects.bulk_create([Profile(user=user) for user, kwargs in calls if kwargs.get('created')],
+                                ignore_conflicts=True)
 
-@receiver(post_save, sender=User)
-def create_user_profile(sender, instance, created, **kwargs):
-    if created:
+
+# Создание профиля пользователя после создания пользователя.
+# У профиля нет полей, зависящих от пользователя, поэтому обычное сохранение пользователя
+# запросов к профилю не делает, а создание — ровно один INSERT
+@receiver(post_save, sender=User, dispatch_uid='courses.create_user_profile')
+@deferrable(batch=_create_profiles)
+def create_user_profile(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
         Profile.objects.create(user=instance)
 
-@receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    instance.profile.save()
 
-@receiver(post_save, sender=CourseProgress)
-def create_certificate(sender, instance, created, **kwargs):
-    # Если курс завершен и это новое событие, создаем сертификат
-    if instance.is_completed and not Certificate.objects.filter(student=instance.student, course=instance.course).exists():
-        Certificate.objects.create(student=instance.student, course=instance.course)
+def _create_certificates(calls):
+    Certificate.objects.bulk_create([
+        Certificate(student_id=progress.student_id, course_id=progress.course_id)
+        for progress, _ in calls if progress.is_completed
+    ], ignore_conflicts=True)
 
-@receiver(post_save, sender=CourseProgress)
+
+@receiver(post_save, sender=CourseProgress, dispatch_uid='courses.create_certificate')
+@deferrable(batch=_create_certificates)
 def create_certificate(sender, instance, created, **kwargs):
     """
-    Создание сертификата после завершения курса и отправка email с PDF-сертификатом.
+    Постановка сертификата в очередь генерации после завершения курса.
+    PDF и письмо со ссылкой на него создает воркер process_certificates.
     """
-    if instance.is_completed and not Certificate.objects.filter(student=instance.student, course=instance.course).exists():
-        # Генерация сертификата в формате PDF
-        student_name = instance.student.username
-        course_title = instance.course.title
-        certificate_filename = f"{student_name}_{course_title}_certificate.pdf"
-        certificate_path = os.path.join(settings.MEDIA_ROOT, 'certificates', certificate_filename)
-
-        # Создаем директорию, если она не существует
-        os.makedirs(os.path.dirname(certificate_path), exist_ok=True)
-
-        # Генерация PDF-файла
-        generate_certificate(student_name, course_title, certificate_path)
-
-        # Создание записи о сертификате в базе данных
-        certificate = Certificate.objects.create(
-            student=instance.student,
-            course=instance.course,
-            certificate_url=f"/media/certificates/{certificate_filename}"
-        )
-
-        # Отправка email-уведомления
-        subject = "Поздравляем с завершением курса!"
-        context = {
-            'student_name': student_name,
-            'course_title': course_title,
-            'certificate_url': f"{settings.SITE_URL}/media/certificates/{certificate_filename}"
-        }
-        message = render_to_string('emails/course_completion.html', context)
-
-        send_mail(
-            subject,
-            message,
-            settings.DEFAULT_FROM_EMAIL,
-            [instance.student.email],
-            fail_silently=False,
-        )
-
-# Создание профиля пользователя после создания пользователя
-@receiver(post_save, sender=User)
-def create_user_profile(sender, instance, created, **kwargs):
-    # Используйте get_or_create вместо create для избежания дублирования профилей
-    Profile.objects.get_or_create(user=instance)
-    
-@receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    instance.profile.save()
\ No newline at end of file
+    if instance.is_completed:
+        Certificate.objects.get_or_create(student_id=instance.student_id, course_id=instance.course_id)
+
+
+# Сброс поколений кэша каталога при изменении курсов и связанных данных
+@receiver(pre_save, sender=Course)
+def remember_course_instructor(sender, instance, **kwargs):
+    # Запоминаем прежнего преподавателя, чтобы сбросить и его список курсов
+    instance._previous_instructor_id = None
+    if instance.pk:
+        instance._previous_instructor_id = Course.objects.filter(pk=instance.pk) \
+                                                         .values_list('instructor_id', flat=True).first()
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def invalidate_course_cache(sender, instance, **kwargs):
+    invalidate_course(instance.pk, instance.instructor_id, getattr(instance, '_previous_instructor_id', None))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_cache(sender, instance, **kwargs):
+    bump_versions(CATEGORIES_SCOPE)
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_review_cache(sender, instance, **kwargs):
+    bump_versions(course_scope(instance.course_id), REVIEWS_SCOPE)
+
+
+@receiver(post_save, sender=FAQ)
+@receiver(post_delete, sender=FAQ)
+def invalidate_faq_cache(sender, instance, **kwargs):
+    bump_versions(FAQS_SCOPE)
+
+
+@receiver(post_save, sender=Teacher)
+@receiver(post_delete, sender=Teacher)
+def invalidate_teacher_cache(sender, instance, **kwargs):
+    scopes = [TEACHERS_SCOPE]
+    if instance.user_id:
+        scopes.append(instructor_scope(instance.user_id))
+    bump_versions(*scopes)
+
+
+# Инкрементальное обновление поискового индекса
+@receiver(post_save, sender=Course)
+@receiver(post_save, sender=KnowledgeBaseArticle)
+@receiver(post_save, sender=BlogPost)
+@receiver(post_save, sender=FAQ)
+def update_search_index(sender, instance, **kwargs):
+    index_instance(instance)
+
+
+@receiver(post_delete, sender=Course)
+@receiver(post_delete, sender=KnowledgeBaseArticle)
+@receiver(post_delete, sender=BlogPost)
+@receiver(post_delete, sender=FAQ)
+def remove_from_search_index(sender, instance, **kwargs):
+    remove_instance(instance)
+
+
+# Инкрементальное обновление статистики курсов
+@receiver(post_save, sender=Course)
+def create_course_stats(sender, instance, created, **kwargs):
+    if created:
+        CourseStats.objects.get_or_create(course=instance)
+
+
+@receiver(pre_save, sender=Review)
+@receiver(pre_save, sender=Testimonial)
+@receiver(pre_save, sender=Enrollment)
+@receiver(pre_save, sender=Payment)
+def remember_stats_contribution(sender, instance, **kwargs):
+    # Прежний вклад объекта вычитается после сохранения: мог смениться курс, оценка, статус или сумма
+    instance._previous_stats = None
+    if instance.pk:
+        previous = sender.objects.filter(pk=instance.pk).first()
+        if previous is not None:
+            instance._previous_stats = (previous.course_id, contribution(previous))
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_save, sender=Testimonial)
+@receiver(post_save, sender=Enrollment)
+@receiver(post_save, sender=Payment)
+def update_course_stats(sender, instance, **kwargs):
+    current = contribution(instance)
+    previous_course_id, previous = getattr(instance, '_previous_stats', None) or (None, {})
+    if previous_course_id == instance.course_id:
+        current = {field: current.get(field, 0) - previous.get(field, 0) for field in {*current, *previous}}
+    else:
+        adjust(previous_course_id, {field: -value for field, value in previous.items()})
+    adjust(instance.course_id, current)
+
+
+@receiver(post_delete, sender=Review)
+@receiver(post_delete, sender=Testimonial)
+@receiver(post_delete, sender=Enrollment)
+@receiver(post_delete, sender=Payment)
+def remove_from_course_stats(sender, instance, **kwargs):
+    adjust(instance.course_id, {field: -value for field, value in contribution(instance).items()})
@@ -0,0 +1,62 @@
+import functools
+import logging
+import random
+import sqlite3
+import time
+
+from django.db import OperationalError, connection
+
+# Инициализация логгера для режима SQLite
+logger = logging.getLogger(__name__)
+
+# Параметры повторов записи при блокировке базы. Без busy timeout SQLite сразу
+# возвращает «database is locked», и ожидание обеспечивают повторы. С busy timeout
+# каждая попытка сама ждет до timeout секунд, поэтому допускается только один повтор:
+# иначе запрос занимал бы воркер на attempts × timeout
+LOCK_RETRY_ATTEMPTS = 5
+LOCK_RETRY_ATTEMPTS_WITH_TIMEOUT = 2
+LOCK_RETRY_BASE_DELAY = 0.05
+LOCK_RETRY_MAX_DELAY = 1.0
+
+LOCK_MESSAGES = ('database is locked', 'database table is locked', 'database is busy')
+
+
+def is_lock_error(error):
+    return isinstance(error, (OperationalError, sqlite3.OperationalError)) and \
+        any(message in str(error).lower() for message in LOCK_MESSAGES)
+
+
+def _delay(attempt, base_delay, max_delay):
+    # Экспоненциальная задержка с полным джиттером, чтобы повторы не сталкивались снова
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+
+def _default_attempts():
+    if connection.settings_dict.get('OPTIONS', {}).get('timeout'):
+        return LOCK_RETRY_ATTEMPTS_WITH_TIMEOUT
+    return LOCK_RETRY_ATTEMPTS
+
+
+def retry_on_lock(func=None, *, attempts=None, base_delay=LOCK_RETRY_BASE_DELAY,
+                  max_delay=LOCK_RETRY_MAX_DELAY):
+    """
+    Декоратор: повторяет функцию с нарастающей задержкой, если SQLite вернул «database is locked».
+    Функция должна целиком выполнять свою транзакцию. Внутри внешней транзакции повтор
+    невозможен, поэтому там ошибка пробрасывается сразу. Число попыток по умолчанию
+    зависит от того, задан ли busy timeout соединения.
+    """
+    if func is None:
+        return functools.partial(retry_on_lock, attempts=attempts, base_delay=base_delay, max_delay=max_delay)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        total = attempts or _default_attempts()
+        for attempt in range(total):
+            try:
+                return func(*args, **kwargs)
+            except (OperationalError, sqlite3.OperationalError) as error:
+                if not is_lock_error(error) or connection.in_atomic_block or attempt == total - 1:
+                    raise
+                logger.warning(f"{func.__name__}: database is locked, retry {attempt + 1} of {total - 1}.")
+                time.sleep(_delay(attempt, base_delay, max_delay))
+    return wrapper
@@ -0,0 +1,130 @@
+import logging
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, Sum, Value, When
+from django.db.models.functions import Cast
+from django.db.models.lookups import GreaterThan
+from django.utils import timezone
+
+from .caching import bump_versions
+from .models import Course, CourseStats, Enrollment, Payment, Review, Testimonial
+from .services import COURSE_STATS_SCOPE
+
+# Инициализация логгера для статистики курсов
+logger = logging.getLogger(__name__)
+
+COUNTER_FIELDS = ('review_count', 'testimonial_count', 'rating_sum', 'enrollment_count', 'revenue')
+
+
+def contribution(instance):
+    """
+    Вклад одного объекта в статистику его курса: словарь поле -> значение.
+    """
+    if isinstance(instance, Review):
+        return {'review_count': 1, 'rating_sum': instance.rating}
+    if isinstance(instance, Testimonial):
+        return {'testimonial_count': 1, 'rating_sum': instance.rating}
+    if isinstance(instance, Enrollment):
+        return {'enrollment_count': 1} if instance.status == 'confirmed' else {}
+    if isinstance(instance, Payment):
+        return {'revenue': Decimal(instance.amount)} if instance.status == 'succeeded' else {}
+    return {}
+
+
+def _average_rating(deltas):
+    # В UPDATE столбцы справа имеют старые значения, поэтому среднее считается по новым суммам явно
+    count = F('review_count') + F('testimonial_count') + deltas.get('review_count', 0) + deltas.get('testimonial_count', 0)
+    rating_sum = F('rating_sum') + deltas.get('rating_sum', 0)
+    return Case(
+        When(GreaterThan(count, 0), then=Cast(rating_sum, FloatField()) / Cast(count, FloatField())),
+        default=Value(0.0),
+    )
+
+
+def _apply(course_id, deltas):
+    deltas = {field: value for field, value in deltas.items() if value}
+    if not course_id or not deltas:
+        return False
+    updates = {field: F(field) + value for field, value in deltas.items()}
+    if {'review_count', 'testimonial_count', 'rating_sum'} & deltas.keys():
+        updates['average_rating'] = _average_rating(deltas)
+    return bool(CourseStats.objects.filter(course_id=course_id).update(**updates, updated_at=timezone.now()))
+
+
+def adjust(course_id, deltas):
+    """
+    Атомарно применяет приращения к статистике курса одним UPDATE через F().
+    Смена поколения статистики меняет ETag списка курсов в API.
+    """
+    if _apply(course_id, deltas):
+        bump_versions(COURSE_STATS_SCOPE)
+
+
+def adjust_many(deltas_by_course):
+    """
+    Применяет приращения для нескольких курсов: словарь id курса -> приращения.
+    Используется пакетными операциями, которые не отправляют сигналы.
+    """
+    changed = [_apply(course_id, deltas) for course_id, deltas in deltas_by_course.items()]
+    if any(changed):
+        bump_versions(COURSE_STATS_SCOPE)
+
+
+def counted(instances, sign=1):
+    """
+    Суммирует вклад объектов по курсам для adjust_many; sign=-1 — для вычитания.
+    """
+    deltas_by_course = defaultdict(lambda: defaultdict(int))
+    for instance in instances:
+        for field, value in contribution(instance).items():
+            deltas_by_course[instance.course_id][field] += sign * value
+    return deltas_by_course
+
+
+def compute_stats():
+    """
+    Вычисляет статистику всех курсов агрегирующими запросами: по одному на каждый источник.
+    """
+    stats = defaultdict(lambda: dict.fromkeys(COUNTER_FIELDS, 0))
+    for row in Review.objects.values('course_id').annotate(count=Count('id'), total=Sum('rating')).order_by():
+        stats[row['course_id']]['review_count'] = row['count']
+        stats[row['course_id']]['rating_sum'] += row['total'] or 0
+    for row in Testimonial.objects.values('course_id').annotate(count=Count('id'), total=Sum('rating')).order_by():
+        stats[row['course_id']]['testimonial_count'] = row['count']
+        stats[row['course_id']]['rating_sum'] += row['total'] or 0
+    for row in Enrollment.objects.filter(status='confirmed').values('course_id').annotate(count=Count('id')).order_by():
+        stats[row['course_id']]['enrollment_count'] = row['count']
+    for row in Payment.objects.filter(status='succeeded').values('course_id').annotate(total=Sum('amount')).order_by():
+        stats[row['course_id']]['revenue'] = row['total'] or 0
+    return stats
+
+
+def rebuild_stats(batch_size=1000):
+    """
+    Полный пересчет статистики всех курсов с записью через upsert пакетами.
+    Возвращает количество курсов.
+    """
+    stats = compute_stats()
+    rows = []
+    for course_id in Course.objects.values_list('id', flat=True).iterator(chunk_size=batch_size):
+        values = stats.get(course_id) or dict.fromkeys(COUNTER_FIELDS, 0)
+        ratings = values['review_count'] + values['testimonial_count']
+        rows.append(CourseStats(
+            course_id=course_id,
+            average_rating=values['rating_sum'] / ratings if ratings else 0.0,
+            **values,
+        ))
+
+    with transaction.atomic():
+        CourseStats.objects.bulk_create(
+            rows,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=['course'],
+            update_fields=[*COUNTER_FIELDS, 'average_rating', 'updated_at'],
+        )
+    bump_versions(COURSE_STATS_SCOPE)
+    logger.info(f"Course stats rebuilt for {len(rows)} courses.")
+    return len(rows)
@@ -0,0 +1,178 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .enrollments import confirmation_email, existing_enrollments
+from .models import Enrollment, Payment, StripeEvent
+from .outbox import build_email, enqueue_emails
+from .stats import adjust_many, counted
+
+# Инициализация логгера для обработки событий Stripe
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 200
+MAX_ATTEMPTS = 5
+# Время, на которое воркер захватывает пакет; после него необработанные события забирает другой воркер
+CLAIM_TIMEOUT = 5 * 60
+
+# Тип события Stripe -> статус платежа
+PAYMENT_STATUSES = {
+    'payment_intent.succeeded': 'succeeded',
+    'payment_intent.payment_failed': 'failed',
+    'payment_intent.canceled': 'cancelled',
+}
+
+
+def record_event(event):
+    """
+    Сохраняет событие вебхука. Повторная доставка того же события отбрасывается
+    конфликтом по первичному ключу одним запросом INSERT.
+    """
+    StripeEvent.objects.bulk_create(
+        [StripeEvent(event_id=event['id'], type=event['type'], payload=event)],
+        ignore_conflicts=True,
+    )
+
+
+def claim_events(batch_size=DEFAULT_BATCH_SIZE, exclude=()):
+    """
+    Захватывает пакет необработанных событий, чтобы параллельные воркеры не применили
+    одно событие дважды. События, захваченные упавшим воркером, возвращаются в работу
+    по истечении CLAIM_TIMEOUT.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        queryset = StripeEvent.objects.filter(
+            Q(status='pending') | Q(status='processing', claimed_until__lte=now),
+        ).exclude(event_id__in=exclude).order_by('received_at')
+        if connection.features.has_select_for_update_skip_locked:
+            queryset = queryset.select_for_update(skip_locked=True)
+
+        batch = list(queryset[:batch_size])
+        if batch:
+            StripeEvent.objects.filter(event_id__in=[event.event_id for event in batch]).update(
+                status='processing', claimed_until=now + timedelta(seconds=CLAIM_TIMEOUT),
+            )
+    return batch
+
+
+def _intent_id(event):
+    return event.payload['data']['object']['id']
+
+
+def apply_events(events):
+    """
+    Применяет пакет событий: обновляет статусы платежей одним запросом на статус,
+    подтверждает записи на курс и ставит письма в очередь пакетом. Если в пакете
+    несколько событий одного платежа, применяется последнее из них.
+    """
+    # Для каждого платежа важен только последний по времени получения статус
+    last_status = {}
+    for event in sorted(events, key=lambda event: event.received_at):
+        status = PAYMENT_STATUSES.get(event.type)
+        if status:
+            last_status[_intent_id(event)] = status
+
+    intents_by_status = {}
+    for intent, status in last_status.items():
+        intents_by_status.setdefault(status, set()).add(intent)
+
+    with transaction.atomic():
+        succeeded = []
+        for status, intents in intents_by_status.items():
+            changed = list(Payment.objects.filter(stripe_payment_intent__in=intents).exclude(status=status)
+                                          .select_related('user', 'course'))
+            Payment.objects.filter(id__in=[payment.id for payment in changed]).update(status=status)
+
+            # update() не отправляет сигналы: вклад платежей в выручку курсов пересчитывается явно
+            adjust_many(counted(changed, sign=-1))
+            for payment in changed:
+                payment.status = status
+            adjust_many(counted(changed))
+            if status == 'succeeded':
+                succeeded = changed
+
+        if succeeded:
+            confirm_enrollments(succeeded)
+
+        StripeEvent.objects.filter(event_id__in=[event.event_id for event in events]) \
+                           .update(status='processed', processed_at=timezone.now(), error=None)
+    return len(succeeded)
+
+
+def confirm_enrollments(payments):
+    """
+    Подтверждает записи на курс для оплаченных платежей и ставит письма в очередь.
+    Существующие записи находятся одним запросом, новые создаются через bulk_create.
+    """
+    pairs = {(payment.user_id, payment.course_id) for payment in payments}
+    existing = existing_enrollments(pairs)
+
+    to_confirm = [e for e in existing.values() if e.status != 'confirmed']
+    Enrollment.objects.filter(id__in=[e.id for e in to_confirm]).update(status='confirmed')
+    created = Enrollment.objects.bulk_create([
+        Enrollment(student_id=user_id, course_id=course_id, status='confirmed')
+        for user_id, course_id in pairs if (user_id, course_id) not in existing
+    ])
+    # Подтвержденные записи учитываются в статистике курсов явно: update() и bulk_create не отправляют сигналы
+    adjust_many(counted([Enrollment(course_id=e.course_id, status='confirmed') for e in [*to_confirm, *created]]))
+
+    newly_confirmed = pairs - {key for key, e in existing.items() if e.status == 'confirmed'}
+    emails = []
+    for payment in payments:
+        if not payment.user.email:
+            continue
+        emails.append(build_email(
+            'Payment Successful',
+            f'Your payment for the course "{payment.course.title}" has been successfully processed.',
+            [payment.user.email],
+            settings.DEFAULT_FROM_EMAIL,
+        ))
+        if (payment.user_id, payment.course_id) in newly_confirmed:
+            emails.append(confirmation_email(payment.user, payment.course))
+    enqueue_emails(emails)
+
+
+def _apply_individually(events):
+    # Пакет не применился — ищем событие, из-за которого произошла ошибка.
+    # Возвращает количество примененных событий
+    applied = 0
+    for event in events:
+        try:
+            apply_events([event])
+            applied += 1
+        except Exception as e:
+            logger.error(f"Stripe event {event.event_id} failed: {e}")
+            event.attempts += 1
+            event.error = str(e)
+            event.status = 'failed' if event.attempts >= MAX_ATTEMPTS else 'pending'
+            event.save(update_fields=['attempts', 'error', 'status'])
+    return applied
+
+
+def process_pending_events(batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Обрабатывает необработанные события пакетами. Возвращает количество обработанных событий.
+    """
+    processed = 0
+    failed_ids = set()
+    while True:
+        events = claim_events(batch_size, failed_ids)
+        if not events:
+            break
+        try:
+            apply_events(events)
+            processed += len(events)
+        except Exception:
+            logger.exception("Stripe events batch failed, retrying events one by one.")
+            processed += _apply_individually(events)
+            # Неудачные события повторяются при следующем запуске, а не в этом цикле
+            failed_ids.update(
+                StripeEvent.objects.filter(event_id__in=[e.event_id for e in events])
+                                   .exclude(status='processed').values_list('event_id', flat=True)
+            )
+    return processed
@@ -0,0 +1,166 @@
+import logging
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from .caching import bump_versions
+from .models import (
+    Category, Certificate, Course, CourseProgress, Enrollment, Payment, Profile, Review, Teacher, Testimonial,
+)
+from .search import rebuild_index
+from .services import COURSE_API_SCOPES
+from .stats import rebuild_stats
+
+# Инициализация логгера для генератора синтетических данных
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 5000
+
+# Параметры масштаба по умолчанию
+DEFAULT_SCALE = {
+    'categories': 5,
+    'teachers': 20,
+    'courses': 100,
+    'students': 1000,
+    'enrollments_per_student': 3,
+    'reviews_per_course': 5,
+    'testimonials_per_course': 1,
+    'confirmed_rate': 0.9,
+    'payment_rate': 0.8,
+    'completion_rate': 0.1,
+}
+
+CATEGORY_NAMES = ['General English', 'Business English', 'Grammar', 'Exam Preparation', 'Conversation']
+TOPICS = ['Grammar', 'Fluency', 'IELTS', 'TOEFL', 'Business', 'Writing', 'Listening', 'Pronunciation']
+TOTAL_LESSONS = 20
+
+
+def _chunks(rows, size):
+    rows = iter(rows)
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+def _insert(model, rows, batch_size):
+    """
+    Вставляет строки из итератора пакетами, не собирая их все в памяти.
+    Возвращает количество вставленных строк.
+    """
+    total = 0
+    for chunk in _chunks(rows, batch_size):
+        model.objects.bulk_create(chunk, batch_size=batch_size)
+        total += len(chunk)
+    return total
+
+
+def _ids(queryset, batch_size):
+    return list(queryset.order_by('id').values_list('id', flat=True).iterator(chunk_size=batch_size))
+
+
+def generate(prefix='synthetic', seed=0, batch_size=BATCH_SIZE, **scale):
+    """
+    Генерирует набор данных заданного масштаба пакетными вставками. Сигналы моделей
+    не вызываются; их последствия (профили, статистика курсов, поисковый индекс,
+    сертификаты, поколения кэша) воспроизводятся пакетно в конце. При одинаковом seed
+    и параметрах содержимое данных совпадает. Возвращает словарь модель -> количество строк.
+    """
+    scale = {**DEFAULT_SCALE, **scale}
+    rng = random.Random(seed)
+    now = timezone.now()
+    started = time.monotonic()
+    counts = {}
+
+    # Хеш пароля вычисляется один раз: PBKDF2 на каждую строку занял бы большую часть времени
+    password = make_password('password')
+
+    def users(role, count):
+        return (
+            User(username=f'{prefix}_{role}_{n}', email=f'{prefix}_{role}_{n}@example.com',
+                 password=password, first_name=role.title(), last_name=str(n))
+            for n in range(count)
+        )
+
+    with transaction.atomic():
+        counts['categories'] = _insert(Category, (
+            Category(name=f'{CATEGORY_NAMES[n % len(CATEGORY_NAMES)]} {n}', description=f'{prefix} category {n}')
+            for n in range(scale['categories'])
+        ), batch_size)
+        category_ids = _ids(Category.objects.filter(description__startswith=f'{prefix} category'), batch_size)
+
+        counts['teachers'] = _insert(User, users('teacher', scale['teachers']), batch_size)
+        teacher_ids = _ids(User.objects.filter(username__startswith=f'{prefix}_teacher_'), batch_size)
+        _insert(Teacher, (
+            Teacher(user_id=user_id, name=f'Teacher {n}', bio='Synthetic teacher', email=f'{prefix}_teacher_{n}@example.com',
+                    expertise=rng.choice(TOPICS))
+            for n, user_id in enumerate(teacher_ids)
+        ), batch_size)
+
+        counts['courses'] = _insert(Course, (
+            Course(
+                title=f'{rng.choice(TOPICS)} {prefix} course {n}',
+                description=f'{rng.choice(TOPICS)} course for {rng.choice(Course.LEVEL_CHOICES)[1]} students',
+                price=Decimal(rng.randrange(20, 300)), duration=rng.randrange(10, 80),
+                level=rng.choice(Course.LEVEL_CHOICES)[0], type=rng.choice(Course.TYPE_CHOICES)[0],
+                instructor_id=rng.choice(teacher_ids), category_id=rng.choice(category_ids) if category_ids else None,
+                start_date=now + timedelta(days=rng.randrange(-180, 180)),
+                is_popular=rng.random() < 0.1,
+            )
+            for n in range(scale['courses'])
+        ), batch_size)
+        course_ids = _ids(Course.objects.filter(instructor_id__in=teacher_ids), batch_size)
+
+        counts['students'] = _insert(User, users('student', scale['students']), batch_size)
+        student_ids = _ids(User.objects.filter(username__startswith=f'{prefix}_student_'), batch_size)
+        _insert(Profile, (Profile(user_id=user_id) for user_id in teacher_ids + student_ids), batch_size)
+
+        counts.update(dict.fromkeys(['enrollments', 'payments', 'progress', 'certificates'], 0))
+        per_student = min(scale['enrollments_per_student'], len(course_ids))
+        for chunk in _chunks(student_ids, batch_size):
+            enrollments, payments, progress, certificates = [], [], [], []
+            for student_id in chunk:
+                for course_id in rng.sample(course_ids, per_student):
+                    confirmed = rng.random() < scale['confirmed_rate']
+                    enrollments.append(Enrollment(student_id=student_id, course_id=course_id,
+                                                  status='confirmed' if confirmed else 'pending'))
+                    if not confirmed:
+                        continue
+                    if rng.random() < scale['payment_rate']:
+                        payments.append(Payment(user_id=student_id, course_id=course_id,
+                                                amount=Decimal(rng.randrange(20, 300)), status='succeeded',
+                                                stripe_payment_intent=f'pi_{prefix}_{student_id}_{course_id}'))
+                    completed = TOTAL_LESSONS if rng.random() < scale['completion_rate'] else rng.randrange(TOTAL_LESSONS)
+                    progress.append(CourseProgress(student_id=student_id, course_id=course_id,
+                                                   completed_lessons=completed, total_lessons=TOTAL_LESSONS,
+                                                   progress=completed * 100 / TOTAL_LESSONS,
+                                                   is_completed=completed == TOTAL_LESSONS))
+                    if completed == TOTAL_LESSONS:
+                        certificates.append(Certificate(student_id=student_id, course_id=course_id))
+            counts['enrollments'] += _insert(Enrollment, enrollments, batch_size)
+            counts['payments'] += _insert(Payment, payments, batch_size)
+            counts['progress'] += _insert(CourseProgress, progress, batch_size)
+            counts['certificates'] += _insert(Certificate, certificates, batch_size)
+
+        counts['reviews'] = _insert(Review, (
+            Review(author=f'Student {n}', text=f'{rng.choice(TOPICS)} lessons were useful', course_id=course_id,
+                   rating=rng.randrange(1, 6))
+            for course_id in course_ids for n in range(scale['reviews_per_course'])
+        ), batch_size)
+        counts['testimonials'] = _insert(Testimonial, (
+            Testimonial(name=f'Student {n}', course_id=course_id, content='Great course', rating=rng.randrange(3, 6))
+            for course_id in course_ids for n in range(scale['testimonials_per_course'])
+        ), batch_size)
+
+    # Производные данные, которые при обычной записи поддерживают сигналы
+    rebuild_stats(batch_size=batch_size)
+    rebuild_index(batch_size=batch_size)
+    bump_versions(*COURSE_API_SCOPES)
+
+    logger.info(f"Synthetic data generated in {time.monotonic() - started:.1f}s: {counts}")
+    return counts
@@ -1,12 +1,17 @@
+import json
 from rest_framework.test import APITestCase
 from django.urls import reverse
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
+from django.utils import timezone
 from django.contrib.auth.models import User
 from .models import Course, Enrollment, Payment
 from unittest.mock import patch
 from django.contrib.auth import get_user_model
 from rest_framework.test import APIClient
-from django.core.mail import send_mail
+from django.core import mail
+from django.core.cache import cache
+from .models import OutboundEmail
+from .outbox import drain_outbox, enqueue_email
 
 
 # Тесты для курса
@@ -59,35 +64,58 @@ class SignalTests(TestCase):
             instructor=self.user
         )
 
-    @patch('django.core.mail.send_mail')
-    def test_enrollment_confirmation_email(self, mock_send_mail):
-        # Создание записи на курс
+    def test_enrollment_confirmation_email(self):
+        # Создание записи на курс ставит письмо в очередь, не отправляя его
         Enrollment.objects.create(student=self.user, course=self.course, status='confirmed')
 
-        self.assertTrue(mock_send_mail.called, "send_mail was not called")
-        mock_send_mail.assert_called_once_with(
-            subject='Enrollment Confirmed',
-            message=f'Your enrollment for the course "{self.course.title}" has been confirmed.',
-            from_email='test@example.com',
-            recipient_list=[self.user.email]
-        )
+        self.assertEqual(len(mail.outbox), 0)
+        email = OutboundEmail.objects.get()
+        self.assertEqual(email.subject, 'Enrollment Confirmed')
+        self.assertEqual(email.body, f'Your enrollment for the course "{self.course.title}" has been confirmed.')
+        self.assertEqual(email.from_email, 'test@example.com')
+        self.assertEqual(email.recipients, [self.user.email])
 
-    @patch('django.core.mail.send_mail')
-    def test_payment_confirmation_email(self, mock_send_mail):
+    def test_payment_confirmation_email(self):
         # Создание записи платежа
         Payment.objects.create(user=self.user, course=self.course, amount=100.00, stripe_payment_intent='pi_test_123', status='succeeded')
 
-        self.assertTrue(mock_send_mail.called, "send_mail was not called")
-        mock_send_mail.assert_called_once_with(
-            subject='Payment Successful',
-            message=f'Your payment for the course "{self.course.title}" has been successfully processed.',
-            from_email='test@example.com',
-            recipient_list=[self.user.email]
-        )
+        email = OutboundEmail.objects.get()
+        self.assertEqual(email.subject, 'Payment Successful')
+        self.assertEqual(email.body, f'Your payment for the course "{self.course.title}" has been successfully processed.')
+        self.assertEqual(email.recipients, [self.user.email])
+
+
+# Тесты очереди исходящих писем
+class OutboxTests(TestCase):
+    def setUp(self):
+        for n in range(3):
+            enqueue_email('Subject', f'Message {n}', [f'user{n}@example.com'])
+
+    def test_worker_drains_queue(self):
+        sent, failed = drain_outbox(batch_size=2)
+
+        self.assertEqual((sent, failed), (3, 0))
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(OutboundEmail.objects.filter(status='sent').count(), 3)
+        self.assertEqual(drain_outbox(), (0, 0))
+
+    @patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=ConnectionError('SMTP down'))
+    def test_failed_sends_are_retried_with_backoff(self, mock_send):
+        self.assertEqual(drain_outbox(max_attempts=2), (0, 0))
+        email = OutboundEmail.objects.first()
+        self.assertEqual((email.status, email.attempts), ('pending', 1))
+        self.assertGreater(email.next_attempt_at, timezone.now())
+        self.assertEqual(email.last_error, 'SMTP down')
+
+        OutboundEmail.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(drain_outbox(max_attempts=2), (0, 3))
+        self.assertEqual(OutboundEmail.objects.filter(status='failed').count(), 3)
 
 
 # Тесты для middleware логирования
 import logging
+import os
+from . import instrumentation
 
 class MiddlewareTests(TestCase):
     def setUp(self):
@@ -97,7 +125,1249 @@ class MiddlewareTests(TestCase):
 
     @patch('courses.middleware.logger')
     def test_request_log_middleware(self, mock_logger):
-        # Переход на любую страницу
-        self.client.get('/')
-        # Проверяем, что логгирование вызвано
-        mock_logger.info.assert_called_with(f"User {self.user.username} accessed /")
+        response = self.client.get(reverse('course-list'))
+
+        record = json.loads(mock_logger.info.call_args[0][0])
+        self.assertEqual(record['route'], 'course-list')
+        self.assertEqual(record['status'], 200)
+        self.assertEqual(record['response_bytes'], len(response.content))
+        self.assertGreater(record['db_queries'], 0)
+        self.assertIn('cache_hits', record)
+        self.assertIn('db;dur=', response['Server-Timing'])
+
+    @override_settings(REQUEST_INSTRUMENTATION={'SAMPLE_RATE': 0, 'SLOW_REQUEST_MS': 60000})
+    @patch('courses.middleware.logger')
+    def test_unsampled_request_is_only_timed(self, mock_logger):
+        response = self.client.get(reverse('course-list'))
+        self.assertTrue(response['Server-Timing'].startswith('app;dur='))
+        self.assertNotIn('db;', response['Server-Timing'])
+        mock_logger.info.assert_not_called()
+
+    def test_cache_lookups_are_counted_per_request(self):
+        cache.delete('instrumented')
+        metrics, token = instrumentation.start()
+        try:
+            cache.get('instrumented')
+            cache.set('instrumented', 1)
+            cache.get('instrumented')
+            cache.get_many(['instrumented', 'absent'])
+        finally:
+            instrumentation.finish(token)
+        self.assertEqual((metrics.cache_hits, metrics.cache_misses), (2, 2))
+
+
+# Тесты версионированного кэша каталога
+from .models import Category, Review
+from .services import get_all_courses, get_course_details, get_instructor_courses, update_course
+
+
+class CourseCacheInvalidationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.teacher = User.objects.create_user(username='teacher', password='testpassword')
+        self.other_teacher = User.objects.create_user(username='other', password='testpassword')
+        self.category = Category.objects.create(name='Grammar', description='Grammar courses')
+        self.course = Course.objects.create(
+            title='Test Course',
+            description='Test Description',
+            price=100.00,
+            instructor=self.teacher,
+            category=self.category,
+        )
+
+    def test_cached_reads_hit_cache(self):
+        get_all_courses()
+        get_course_details(self.course.id)
+        get_instructor_courses(self.teacher.id)
+        with self.assertNumQueries(0):
+            get_all_courses()
+            get_course_details(self.course.id)
+            get_instructor_courses(self.teacher.id)
+
+    def test_course_save_invalidates_catalog_and_instructor_lists(self):
+        self.assertEqual(get_all_courses()[0]['title'], 'Test Course')
+        self.assertEqual(len(get_instructor_courses(self.teacher.id)), 1)
+
+        self.course.title = 'Renamed'
+        self.course.save()
+
+        self.assertEqual(get_all_courses()[0]['title'], 'Renamed')
+        self.assertEqual(get_course_details(self.course.id)['title'], 'Renamed')
+        self.assertEqual(get_instructor_courses(self.teacher.id)[0]['title'], 'Renamed')
+
+    def test_instructor_change_invalidates_both_instructors(self):
+        self.assertEqual(len(get_instructor_courses(self.teacher.id)), 1)
+        self.assertEqual(len(get_instructor_courses(self.other_teacher.id)), 0)
+
+        self.course.instructor = self.other_teacher
+        self.course.save()
+
+        self.assertEqual(len(get_instructor_courses(self.teacher.id)), 0)
+        self.assertEqual(len(get_instructor_courses(self.other_teacher.id)), 1)
+
+    def test_category_and_delete_invalidate(self):
+        self.assertEqual(get_course_details(self.course.id)['category'], 'Grammar')
+        self.category.name = 'Advanced Grammar'
+        self.category.save()
+        self.assertEqual(get_course_details(self.course.id)['category'], 'Advanced Grammar')
+
+        self.course.delete()
+        self.assertEqual(get_all_courses(), [])
+
+    def test_update_course_invalidates_lists(self):
+        get_all_courses()
+        update_course(self.course.id, {'title': 'Updated'})
+        self.assertEqual(get_all_courses()[0]['title'], 'Updated')
+
+
+# Тесты защиты от одновременного пересчета кэша
+import threading
+import time
+from .caching import _lock_key, get_fill_stats, get_or_compute, reset_fill_stats
+
+
+class CacheFillTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_fill_stats()
+
+    def test_concurrent_misses_compute_once(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return 'value'
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(get_or_compute('fill-test', compute, 60)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['value'] * 5)
+        stats = get_fill_stats()
+        self.assertEqual(stats['recomputes'], 1)
+        self.assertEqual(stats['waits'], 4)
+        self.assertGreater(stats['wait_time'], 0)
+
+    def test_stale_value_served_while_recomputing(self):
+        cache.set('fill-test', ('stale', time.time() - 1, 0.01), 60)
+        cache.add(_lock_key('fill-test'), 1, 30)
+
+        value = get_or_compute('fill-test', lambda: 'fresh', 60)
+
+        self.assertEqual(value, 'stale')
+        self.assertEqual(get_fill_stats()['stale_served'], 1)
+
+    def test_expired_value_recomputed(self):
+        cache.set('fill-test', ('stale', time.time() - 1, 0.01), 60)
+        self.assertEqual(get_or_compute('fill-test', lambda: 'fresh', 60), 'fresh')
+        self.assertEqual(get_or_compute('fill-test', lambda: 'other', 60), 'fresh')
+
+
+# Тесты двухуровневого кэша
+from .cache_backends import INVALIDATION_SEQ_KEY, TwoTierCache, _L1Store
+from .caching import _version_key, get_versions
+
+
+class TwoTierCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        options = {'L2': 'shared', 'SYNC_INTERVAL': 0, 'L1_TIMEOUT': 60}
+        # Два экземпляра с разными L1 имитируют два воркера
+        self.worker_a = TwoTierCache('worker-a', {'OPTIONS': options})
+        self.worker_b = TwoTierCache('worker-b', {'OPTIONS': options})
+        self.worker_a.clear()
+
+    def test_l1_serves_without_l2(self):
+        self.worker_a.set('key', 'value', 60)
+        self.worker_a._l2.delete('key')
+        self.assertEqual(self.worker_a.get('key'), 'value')
+
+    def test_writes_invalidate_other_workers(self):
+        self.worker_a.set('key', 'old', 60)
+        self.assertEqual(self.worker_b.get('key'), 'old')
+
+        self.worker_a.set('key', 'new', 60)
+        self.assertEqual(self.worker_b.get('key'), 'new')
+
+        self.worker_a.delete('key')
+        self.assertIsNone(self.worker_b.get('key'))
+
+    def test_incr_invalidates_other_workers(self):
+        self.worker_a.set('counter', 1, None)
+        self.assertEqual(self.worker_b.get('counter'), 1)
+        self.worker_a.incr('counter', 5)
+        self.assertEqual(self.worker_b.get('counter'), 6)
+
+    def test_add_is_atomic_in_shared_tier(self):
+        self.assertTrue(self.worker_a.add('lock', 1, 60))
+        self.assertFalse(self.worker_b.add('lock', 1, 60))
+
+    def test_versions_survive_many_writes(self):
+        # Каждая запись добавляет и запись журнала инвалидации: файлов больше 300 (лимит FileBasedCache)
+        version = get_versions('catalog')['catalog']
+        seq = self.worker_a._l2.get(INVALIDATION_SEQ_KEY)
+        for n in range(400):
+            self.worker_a.set(f'key-{n}', n, 60)
+        self.assertEqual(self.worker_a._l2.get(_version_key('catalog')), version)
+        self.assertEqual(self.worker_a._l2.get(INVALIDATION_SEQ_KEY), seq + 400)
+        self.assertEqual(self.worker_b.get('key-0'), 0)
+
+    def test_l1_lru_eviction(self):
+        store = _L1Store(max_entries=2, max_bytes=10)
+        store.set('a', b'1', 60)
+        store.set('b', b'2', 60)
+        store.get('a')
+        store.set('c', b'3', 60)
+        self.assertIsNone(store.get('b'))
+        self.assertEqual(store.get('a'), b'1')
+
+        store.set('big', b'x' * 9, 60)
+        self.assertEqual(store.size, 10)
+        self.assertIsNone(store.get('c'))
+
+
+# Тесты курсорной пагинации
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from .pagination import KeysetPagination
+from .views import CourseViewSet
+
+
+class KeysetPaginationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='student', password='testpassword')
+        for n in range(15):
+            course = Course.objects.create(title=f'Course {n}', description='Test', instructor=self.user)
+            Enrollment.objects.create(student=self.user, course=course)
+
+    def test_pages_follow_cursor(self):
+        response = self.client.get(reverse('enrollment-list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 15)
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertNotIn('offset', response.data['next'])
+
+        next_page = self.client.get(response.data['next'])
+        self.assertEqual(len(next_page.data['results']), 5)
+        ids = [item['id'] for item in response.data['results'] + next_page.data['results']]
+        self.assertEqual(ids, sorted(ids, reverse=True))
+
+    def test_non_unique_ordering_is_stable(self):
+        # У всех курсов одинаковое число подтвержденных записей (0): порядок задает id
+        ids = []
+        url = reverse('course-list') + '?ordering=-enrollment_count&page_size=4'
+        while url:
+            response = self.client.get(url)
+            ids += [item['id'] for item in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(ids, sorted(Course.objects.values_list('id', flat=True)))
+
+        request = Request(APIRequestFactory().get('/', {'ordering': '-enrollment_count'}))
+        ordering = KeysetPagination().get_ordering(request, Course.objects.all(), CourseViewSet())
+        self.assertEqual(ordering, ('-enrollment_count', 'id'))
+
+    def test_count_can_be_skipped(self):
+        response = self.client.get(reverse('enrollment-list'), {'count': 'false'})
+        self.assertNotIn('count', response.data)
+        self.assertEqual(len(response.data['results']), 10)
+
+
+# Бюджет запросов к базе данных для списков API
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from .models import BlogPost, Certificate, CourseProgress, Event, FAQ, KnowledgeBaseArticle, Service, Teacher, Testimonial
+
+
+class QueryBudgetTests(APITestCase):
+    """
+    Каждая строка — эндпоинт и максимальное число запросов при полной странице.
+    Данных создается больше размера страницы, поэтому запрос на каждую строку (N+1)
+    сразу выходит за бюджет.
+    """
+    ROWS = 12
+
+    budgets = {
+        'category-list': 2,
+        'course-list': 3,
+        'teacher-list': 2,
+        'enrollment-list': 2,
+        'review-list': 2,
+        'event-list': 2,
+        'service-list': 2,
+        'knowledgebasearticle-list': 2,
+        'faq-list': 2,
+        'testimonial-list': 3,
+        'blogpost-list': 2,
+        'course-progress-list-create': 2,
+        'certificate-list': 2,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username='admin', password='testpassword')
+        category = Category.objects.create(name='Grammar', description='Grammar courses')
+        for n in range(cls.ROWS):
+            teacher = User.objects.create_user(username=f'teacher{n}', password='testpassword')
+            Teacher.objects.create(user=teacher, name=f'Teacher {n}', bio='Bio')
+            course = Course.objects.create(
+                title=f'Course {n}', description='Test', instructor=teacher, category=category
+            )
+            Review.objects.create(author='Student', text='Great', course=course)
+            Review.objects.create(author='Student', text='Good', course=course)
+            Testimonial.objects.create(name='Student', course=course, content='Nice')
+            Enrollment.objects.create(student=cls.admin, course=course)
+            CourseProgress.objects.create(student=cls.admin, course=course, total_lessons=10)
+            Certificate.objects.create(student=cls.admin, course=course)
+            BlogPost.objects.create(title=f'Post {n}', content='Text', image='blog.jpg', author=teacher)
+            Event.objects.create(title=f'Event {n}', description='Text', date=timezone.now())
+            Service.objects.create(title=f'Service {n}')
+            KnowledgeBaseArticle.objects.create(title=f'Article {n}', content='Text')
+            FAQ.objects.create(question=f'Question {n}?', answer='Answer')
+
+    def assertMaxQueries(self, url, budget):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        self.assertLessEqual(
+            len(queries), budget,
+            f"{url} made {len(queries)} queries (budget {budget}):\n"
+            + '\n'.join(query['sql'] for query in queries.captured_queries),
+        )
+
+    def test_list_endpoints_stay_within_budget(self):
+        self.client.force_authenticate(user=self.admin)
+        for url_name, budget in self.budgets.items():
+            with self.subTest(url_name=url_name):
+                self.assertMaxQueries(reverse(url_name), budget)
+
+
+# Тесты полнотекстового поиска
+class SearchTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='teacher', password='testpassword')
+        self.ielts = Course.objects.create(title='IELTS Preparation', description='Exam strategies', instructor=self.user)
+        self.grammar = Course.objects.create(title='Mastering Grammar', description='Tenses and IELTS tips', instructor=self.user)
+        self.faq = FAQ.objects.create(question='How long is the IELTS course?', answer='Eight weeks')
+        KnowledgeBaseArticle.objects.create(title='Phrasal verbs', content='Common phrasal verbs')
+
+    def test_unified_search_ranks_title_matches_first(self):
+        response = self.client.get(reverse('search'), {'q': 'ielts'})
+        self.assertEqual(response.status_code, 200)
+        results = [(item['type'], item['id']) for item in response.data['results']]
+        self.assertEqual(set(results), {('course', self.ielts.id), ('course', self.grammar.id), ('faq', self.faq.id)})
+        self.assertNotEqual(results[-1], ('course', self.ielts.id))
+
+    def test_type_filter_and_prefix_match(self):
+        response = self.client.get(reverse('search'), {'q': 'phras', 'type': 'article'})
+        self.assertEqual([item['title'] for item in response.data['results']], ['Phrasal verbs'])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.grammar.description = 'Tenses only'
+        self.grammar.save()
+        self.faq.delete()
+        response = self.client.get(reverse('search'), {'q': 'ielts'})
+        self.assertEqual([(item['type'], item['id']) for item in response.data['results']], [('course', self.ielts.id)])
+
+    def test_viewset_search_param_uses_index(self):
+        response = self.client.get(reverse('course-list'), {'search': 'grammar'})
+        self.assertEqual([item['id'] for item in response.data['results']], [self.grammar.id])
+
+
+# Тесты фоновой генерации сертификатов
+import io
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from .certificates import _create_batch, claim_pending, create_missing_for_course, process_pending
+from datetime import date
+from .certificate_generator import get_certificate_template, render_certificate, render_certificate_uncached
+
+MEDIA_ROOT_FOR_TESTS = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT_FOR_TESTS)
+class CertificatePipelineTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT_FOR_TESTS, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='student', password='testpassword', email='student@example.com')
+        self.course = Course.objects.create(title='Test Course', description='Test', instructor=self.user)
+
+    def test_completion_queues_certificate_without_rendering(self):
+        with patch('courses.certificates.generate_certificate') as mock_generate:
+            CourseProgress.objects.create(student=self.user, course=self.course, is_completed=True)
+        mock_generate.assert_not_called()
+        self.assertEqual(Certificate.objects.get().status, 'pending')
+        self.assertFalse(OutboundEmail.objects.exists())
+
+    def test_worker_renders_and_queues_email(self):
+        CourseProgress.objects.create(student=self.user, course=self.course, is_completed=True)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            stats = process_pending(executor=executor)
+
+        self.assertEqual((stats['ready'], stats['failed']), (1, 0))
+        certificate = Certificate.objects.get()
+        self.assertEqual(certificate.status, 'ready')
+        self.assertTrue(os.path.exists(os.path.join(MEDIA_ROOT_FOR_TESTS, certificate.certificate_url.split('/media/')[1])))
+        self.assertEqual(OutboundEmail.objects.get().recipients, ['student@example.com'])
+
+    def test_process_pool_renders_after_closing_connections(self):
+        CourseProgress.objects.create(student=self.user, course=self.course, is_completed=True)
+        calls = []
+        with patch('courses.certificates.connections.close_all', side_effect=lambda: calls.append('close')), \
+                patch('courses.certificates.claim_pending',
+                      side_effect=lambda *args: calls.append('claim') or claim_pending(*args)):
+            stats = process_pending(workers=2)
+
+        self.assertEqual((stats['ready'], stats['failed']), (1, 0))
+        self.assertEqual(Certificate.objects.get().status, 'ready')
+        # Соединение закрывается после выборки пакета, перед запуском процессов пула
+        self.assertEqual(calls, ['claim', 'close', 'claim'])
+
+    @patch('courses.certificates.generate_certificate', side_effect=OSError('disk full'))
+    def test_failed_rendering_is_retried_then_marked_failed(self, mock_generate):
+        CourseProgress.objects.create(student=self.user, course=self.course, is_completed=True)
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            stats = process_pending(executor=executor, max_attempts=2)
+
+        self.assertEqual(mock_generate.call_count, 2)
+        self.assertEqual(stats['failed'], 1)
+        certificate = Certificate.objects.get()
+        self.assertEqual(certificate.status, 'failed')
+        self.assertIn('disk full', certificate.error)
+
+    def test_cohort_issuance_is_batched_and_resumable(self):
+        students = [User.objects.create_user(username=f'cohort{n}', email=f'cohort{n}@example.com') for n in range(5)]
+        # bulk_create не вызывает сигналы — сертификатов у студентов нет
+        CourseProgress.objects.bulk_create([
+            CourseProgress(student=student, course=self.course, is_completed=n < 4)
+            for n, student in enumerate(students)
+        ])
+        Certificate.objects.create(student=students[0], course=self.course, status='ready')
+
+        self.assertEqual(create_missing_for_course(self.course.id), 3)
+        self.assertEqual(create_missing_for_course(self.course.id), 0)
+        # Сертификаты, созданные параллельно (конфликт при вставке), не учитываются
+        self.assertEqual(_create_batch(self.course.id, [students[0].id, students[4].id]), 1)
+        Certificate.objects.filter(student=students[4]).delete()
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            stats = process_pending(executor=executor, batch_size=2,
+                                    queryset=Certificate.objects.filter(course=self.course))
+        self.assertEqual(stats['ready'], 3)
+        self.assertEqual(OutboundEmail.objects.count(), 3)
+        self.assertEqual(Certificate.objects.filter(course=self.course, status='ready').count(), 4)
+
+    def test_template_renders_to_memory(self):
+        buffer = io.BytesIO()
+        render_certificate('student', 'Test Course', output=buffer)
+        self.assertTrue(buffer.getvalue().startswith(b'%PDF'))
+        self.assertTrue(render_certificate('other', 'Test Course').startswith(b'%PDF'))
+        self.assertIs(get_certificate_template('Test Course'), get_certificate_template('Test Course'))
+
+    def test_template_matches_uncached_render(self):
+        issued_on = date(2024, 1, 15)
+        # Детерминированный PDF: без времени создания и случайного идентификатора документа
+        with patch('reportlab.rl_config.invariant', 1):
+            self.assertEqual(
+                render_certificate('student', 'Test Course', issued_on=issued_on),
+                render_certificate_uncached('student', 'Test Course', issued_on=issued_on),
+            )
+            self.assertNotEqual(
+                render_certificate('other', 'Test Course', issued_on=issued_on),
+                render_certificate_uncached('student', 'Test Course', issued_on=issued_on),
+            )
+
+    def test_template_without_title_requires_title(self):
+        with self.assertRaises(ValueError):
+            get_certificate_template().render('student')
+        self.assertTrue(get_certificate_template().render('student', 'Test Course').startswith(b'%PDF'))
+
+
+# Тесты приема вебхуков Stripe
+from .models import StripeEvent
+from .stripe_events import claim_events, process_pending_events
+
+
+class StripeWebhookTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='student', password='testpassword', email='student@example.com')
+        self.course = Course.objects.create(title='Test Course', description='Test', price=100.00, instructor=self.user)
+        self.payment = Payment.objects.create(user=self.user, course=self.course, amount=100.00, stripe_payment_intent='pi_1')
+
+    def post_event(self, event_id, intent_id='pi_1', event_type='payment_intent.succeeded'):
+        event = {'id': event_id, 'type': event_type, 'data': {'object': {'id': intent_id}}}
+        with patch('stripe.Webhook.construct_event', return_value=event):
+            return self.client.post(
+                reverse('stripe_webhook'), json.dumps(event), content_type='application/json',
+                HTTP_STRIPE_SIGNATURE='t=1,v1=test',
+            )
+
+    def test_webhook_only_records_event(self):
+        with self.assertNumQueries(1):
+            response = self.post_event('evt_1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Payment.objects.get().status, 'pending')
+
+        # Повторная доставка отбрасывается
+        self.post_event('evt_1')
+        self.assertEqual(StripeEvent.objects.count(), 1)
+
+    def test_worker_applies_events_in_batch(self):
+        self.post_event('evt_1')
+        self.post_event('evt_2')  # другое событие для того же платежа
+        self.assertEqual(process_pending_events(), 2)
+
+        self.assertEqual(Payment.objects.get().status, 'succeeded')
+        self.assertEqual(Enrollment.objects.get(student=self.user, course=self.course).status, 'confirmed')
+        self.assertEqual(
+            sorted(OutboundEmail.objects.values_list('subject', flat=True)),
+            ['Enrollment Confirmed', 'Payment Successful'],
+        )
+        self.assertFalse(StripeEvent.objects.filter(status='pending').exists())
+        self.assertEqual(process_pending_events(), 0)
+
+    def test_claimed_events_are_not_processed_twice(self):
+        self.post_event('evt_1')
+        self.post_event('evt_2')
+        self.assertEqual([event.event_id for event in claim_events(batch_size=1)], ['evt_1'])
+        # Второй воркер получает только незахваченные события
+        self.assertEqual(process_pending_events(), 1)
+        self.assertEqual(StripeEvent.objects.get(event_id='evt_1').status, 'processing')
+
+        # Захват упавшего воркера истекает, и событие забирает другой воркер
+        StripeEvent.objects.filter(event_id='evt_1').update(claimed_until=timezone.now())
+        self.assertEqual(process_pending_events(), 1)
+        self.assertFalse(StripeEvent.objects.exclude(status='processed').exists())
+
+    def test_last_event_per_payment_wins(self):
+        other_course = Course.objects.create(title='Other Course', description='Test', instructor=self.user)
+        Payment.objects.create(user=self.user, course=other_course, amount=50.00, stripe_payment_intent='pi_2')
+        self.post_event('evt_1', intent_id='pi_2')
+        self.post_event('evt_2', event_type='payment_intent.payment_failed')
+        self.post_event('evt_3')
+        self.post_event('evt_4', intent_id='pi_2', event_type='payment_intent.canceled')
+        self.assertEqual(process_pending_events(), 4)
+
+        self.assertEqual(Payment.objects.get(stripe_payment_intent='pi_1').status, 'succeeded')
+        self.assertEqual(Payment.objects.get(stripe_payment_intent='pi_2').status, 'cancelled')
+        self.assertEqual(Enrollment.objects.get(student=self.user, course=self.course).status, 'confirmed')
+        self.assertFalse(Enrollment.objects.filter(course=other_course).exists())
+
+    def test_failed_events_are_not_counted(self):
+        self.post_event('evt_1')
+        StripeEvent.objects.create(event_id='evt_broken', type='payment_intent.succeeded', payload={})
+        self.assertEqual(process_pending_events(), 1)
+        self.assertEqual(StripeEvent.objects.get(event_id='evt_broken').attempts, 1)
+
+
+# Тесты индексов частых запросов
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from .hot_queries import HOT_QUERIES, explain
+
+
+class IndexAuditTests(TestCase):
+    def test_hot_queries_use_indexes(self):
+        for name in HOT_QUERIES:
+            plan, scans = explain(name)
+            self.assertEqual(scans, [], f"{name}:\n{plan}")
+
+    def test_command_reports_all_queries(self):
+        out = io.StringIO()
+        call_command('explain_hot_queries', '--fail-on-scan', stdout=out)
+        self.assertIn(f"Проверено запросов: {len(HOT_QUERIES)}, без индекса: 0", out.getvalue())
+
+    def test_enrollment_is_unique_per_student_and_course(self):
+        user = User.objects.create_user(username='student', password='testpassword')
+        course = Course.objects.create(title='Test Course', description='Test', instructor=user)
+        Enrollment.objects.create(student=user, course=course)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Enrollment.objects.create(student=user, course=course, status='confirmed')
+
+
+# Тесты пакетной записи на курсы
+class BulkEnrollmentTests(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='admin', password='adminpassword', email='admin@example.com')
+        self.course = Course.objects.create(title='Business English', description='Test', instructor=self.admin)
+        self.client.force_authenticate(self.admin)
+
+    def create_students(self, count, prefix='employee'):
+        return [
+            User.objects.create_user(username=f'{prefix}{n}', email=f'{prefix}{n}@example.com')
+            for n in range(count)
+        ]
+
+    def post_bulk(self, items):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('enrollment-bulk'), {'enrollments': items}, format='json')
+        return response, len(queries)
+
+    def test_query_count_does_not_depend_on_size(self):
+        small, small_queries = self.post_bulk(
+            [{'student': s.id, 'course': self.course.id} for s in self.create_students(3, 'small')])
+        large, large_queries = self.post_bulk(
+            [{'student': s.id, 'course': self.course.id} for s in self.create_students(40, 'large')])
+
+        self.assertEqual(small.status_code, 201)
+        self.assertEqual(large.data['created'], 40)
+        self.assertEqual(small_queries, large_queries)
+
+    def test_existing_and_repeated_pairs_are_skipped(self):
+        first, second = self.create_students(2)
+        Enrollment.objects.create(student=first, course=self.course)
+
+        response, _ = self.post_bulk([
+            {'student': first.id, 'course': self.course.id},
+            {'student': second.id, 'course': self.course.id, 'status': 'confirmed'},
+            {'student': second.id, 'course': self.course.id},
+        ])
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(len(response.data['skipped']), 2)
+        self.assertEqual(Enrollment.objects.get(student=second).status, 'confirmed')
+        # Письмо только о новой подтвержденной записи
+        self.assertEqual(list(OutboundEmail.objects.values_list('recipients', flat=True)), [[second.email]])
+
+    def test_unknown_ids_reject_whole_batch(self):
+        student, = self.create_students(1)
+        response, _ = self.post_bulk([
+            {'student': student.id, 'course': self.course.id},
+            {'student': student.id, 'course': 999},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('course', response.data['enrollments'][1])
+        self.assertFalse(Enrollment.objects.exists())
+
+    def test_requires_staff(self):
+        student, = self.create_students(1)
+        self.client.force_authenticate(student)
+        response, _ = self.post_bulk([{'student': student.id, 'course': self.course.id}])
+        self.assertEqual(response.status_code, 403)
+
+
+# Тесты учета прогресса по урокам
+from .models import LessonCompletion
+
+
+class LessonProgressTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='student', email='student@example.com')
+        self.course = Course.objects.create(title='Grammar', description='Test', instructor=self.user)
+        self.progress = CourseProgress.objects.create(student=self.user, course=self.course, total_lessons=4)
+        self.client.force_authenticate(self.user)
+
+    def post_lessons(self, lessons, course=None):
+        events = [{'course': (course or self.course).id, 'lesson': lesson} for lesson in lessons]
+        return self.client.post(reverse('course-progress-lessons'), {'events': events}, format='json')
+
+    def test_repeated_events_are_counted_once(self):
+        response = self.post_lessons([1, 2, 2])
+        self.assertEqual(response.status_code, 200)
+        self.post_lessons([2, 3])  # повтор с другого устройства
+
+        self.progress.refresh_from_db()
+        self.assertEqual(self.progress.completed_lessons, 3)
+        self.assertEqual(self.progress.progress, 75.0)
+        self.assertFalse(self.progress.is_completed)
+        self.assertEqual(LessonCompletion.objects.count(), 3)
+
+    def test_completion_queues_certificate(self):
+        response = self.post_lessons([1, 2, 3, 4])
+        self.assertTrue(response.data[0]['is_completed'])
+        self.assertEqual(Certificate.objects.get(student=self.user, course=self.course).status, 'pending')
+
+    def test_creates_progress_for_new_course(self):
+        other = Course.objects.create(title='Business', description='Test', instructor=self.user)
+        self.post_lessons([1], course=other)
+        progress = CourseProgress.objects.get(student=self.user, course=other)
+        self.assertEqual((progress.completed_lessons, progress.progress), (1, 0.0))
+
+    def test_query_count_does_not_depend_on_size(self):
+        CourseProgress.objects.filter(id=self.progress.id).update(total_lessons=100)
+        with CaptureQueriesContext(connection) as small:
+            self.post_lessons([1])
+        with CaptureQueriesContext(connection) as large:
+            self.post_lessons(range(2, 60))
+        self.assertEqual(len(small), len(large))
+
+    def test_unknown_course_is_rejected(self):
+        response = self.client.post(reverse('course-progress-lessons'),
+                                    {'events': [{'course': 999, 'lesson': 1}]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(LessonCompletion.objects.exists())
+
+    def test_events_add_to_patched_count(self):
+        CourseProgress.objects.filter(id=self.progress.id).update(total_lessons=20)
+        response = self.client.patch(reverse('course-progress-detail', args=[self.progress.id]),
+                                     {'completed_lessons': 10}, format='json')
+        self.assertEqual(response.data['progress'], 50.0)
+
+        self.post_lessons([11, 12])
+        self.post_lessons([12])
+        self.progress.refresh_from_db()
+        self.assertEqual((self.progress.completed_lessons, self.progress.progress), (12, 60.0))
+
+    def test_partial_update_recomputes_progress(self):
+        self.progress.completed_lessons = 2
+        self.progress.save()
+        response = self.client.patch(reverse('course-progress-detail', args=[self.progress.id]),
+                                     {'total_lessons': 2}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['progress'], 100.0)
+        self.assertTrue(response.data['is_completed'])
+        self.assertTrue(Certificate.objects.filter(student=self.user, course=self.course).exists())
+
+
+# Тесты материализованной статистики курсов
+from decimal import Decimal
+from .models import CourseStats
+from .enrollments import bulk_enroll
+
+
+class CourseStatsTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='student', email='student@example.com')
+        self.course = Course.objects.create(title='Grammar', description='Test', instructor=self.user)
+        self.other = Course.objects.create(title='Business', description='Test', instructor=self.user)
+
+    def stats(self, course=None):
+        return CourseStats.objects.get(course=course or self.course)
+
+    def test_ratings_follow_review_changes(self):
+        review = Review.objects.create(author='A', text='Good', course=self.course, rating=4)
+        Testimonial.objects.create(name='B', course=self.course, content='Nice', rating=5)
+        self.assertEqual(self.stats().average_rating, 4.5)
+
+        review.rating = 2
+        review.save()
+        self.assertEqual(self.stats().average_rating, 3.5)
+
+        review.course = self.other
+        review.save()
+        self.assertEqual((self.stats().review_count, self.stats().average_rating), (0, 5.0))
+        self.assertEqual(self.stats(self.other).average_rating, 2.0)
+
+        review.delete()
+        self.assertEqual((self.stats(self.other).review_count, self.stats(self.other).average_rating), (0, 0.0))
+
+    def test_confirmed_enrollments_are_counted(self):
+        enrollment = Enrollment.objects.create(student=self.user, course=self.course)
+        self.assertEqual(self.stats().enrollment_count, 0)
+        enrollment.status = 'confirmed'
+        enrollment.save()
+        self.assertEqual(self.stats().enrollment_count, 1)
+
+        second = User.objects.create_user(username='second', email='second@example.com')
+        bulk_enroll([{'student': second, 'course': self.course, 'status': 'confirmed'}])
+        self.assertEqual(self.stats().enrollment_count, 2)
+
+        enrollment.delete()
+        self.assertEqual(self.stats().enrollment_count, 1)
+
+    def test_stripe_worker_updates_revenue_and_enrollments(self):
+        Payment.objects.create(user=self.user, course=self.course, amount=Decimal('49.90'), stripe_payment_intent='pi_1')
+        StripeEvent.objects.create(event_id='evt_1', type='payment_intent.succeeded',
+                                   payload={'data': {'object': {'id': 'pi_1'}}})
+        process_pending_events()
+        stats = self.stats()
+        self.assertEqual((stats.revenue, stats.enrollment_count), (Decimal('49.90'), 1))
+
+        StripeEvent.objects.create(event_id='evt_2', type='payment_intent.canceled',
+                                   payload={'data': {'object': {'id': 'pi_1'}}})
+        process_pending_events()
+        self.assertEqual(self.stats().revenue, Decimal('0'))
+
+    def test_rebuild_repairs_drift(self):
+        Review.objects.create(author='A', text='Good', course=self.course, rating=3)
+        CourseStats.objects.filter(course=self.course).update(review_count=10, average_rating=1.0)
+        CourseStats.objects.filter(course=self.other).delete()
+
+        call_command('rebuild_course_stats', stdout=io.StringIO())
+        self.assertEqual((self.stats().review_count, self.stats().average_rating), (1, 3.0))
+        self.assertEqual(self.stats(self.other).review_count, 0)
+
+    def test_api_exposes_and_sorts_by_stats(self):
+        Review.objects.create(author='A', text='Good', course=self.other, rating=5)
+        response = self.client.get(reverse('course-list'), {'ordering': '-average_rating'})
+        self.assertEqual([item['id'] for item in response.data['results']], [self.other.id, self.course.id])
+        self.assertEqual(response.data['results'][0]['stats']['average_rating'], 5.0)
+        self.assertNotIn('revenue', response.data['results'][0]['stats'])
+
+        self.client.force_authenticate(User.objects.create_superuser(username='admin', email='admin@example.com'))
+        response = self.client.get(reverse('course-list'))
+        self.assertIn('revenue', response.data['results'][0]['stats'])
+
+
+# Тесты нагрузочных замеров
+from django.core.management.base import CommandError
+from .benchmarks import find_regressions, run_scenario, scenarios, seed
+
+
+class BenchmarkTests(TestCase):
+    def setUp(self):
+        seed({'courses': 5, 'students': 10, 'enrollments_per_student': 2, 'reviews_per_course': 2})
+
+    def test_seed_creates_related_data_once(self):
+        self.assertEqual(Enrollment.objects.filter(student__username__startswith='bench_').count(), 20)
+        self.assertEqual(CourseStats.objects.filter(course__instructor__username__startswith='bench_').count(), 5)
+        self.assertEqual(seed(), 0)
+
+    def test_scenarios_run_without_errors(self):
+        for name, (path, authenticated) in scenarios().items():
+            result = run_scenario(path, requests=3, concurrency=1, authenticated=authenticated, warmup=1)
+            self.assertEqual((result['requests'], result['errors']), (3, 0), name)
+            self.assertIsNotNone(result['queries_per_request'], name)
+
+    def test_asgi_clients_share_one_event_loop(self):
+        path, _ = scenarios()['all_courses']
+        result = run_scenario(path, requests=4, concurrency=2, warmup=1, asgi=True)
+        self.assertEqual((result['requests'], result['errors']), (4, 0))
+        self.assertEqual(result['queries_per_request'], 1)
+
+    def test_regressions_against_baseline(self):
+        baseline = {'api_courses': {'p95_ms': 10, 'p99_ms': 20, 'queries_per_request': 0,
+                                    'throughput_rps': 100, 'errors': 0}}
+        result = {'api_courses': {'p95_ms': 11, 'p99_ms': 21, 'queries_per_request': 2,
+                                  'throughput_rps': 50, 'errors': 0}}
+        self.assertEqual(find_regressions(result, baseline, threshold=0.2), [
+            "api_courses: queries_per_request 0 -> 2",
+            "api_courses: throughput_rps 100 -> 50",
+        ])
+
+    def test_command_fails_on_regression(self):
+        baseline = os.path.join(tempfile.mkdtemp(), 'baseline.json')
+        self.addCleanup(shutil.rmtree, os.path.dirname(baseline))
+        options = {'requests': 2, 'concurrency': 1, 'baseline': baseline, 'stdout': io.StringIO()}
+        call_command('benchmark_api', 'all_courses', save_baseline=True, **options)
+
+        with open(baseline) as baseline_file:
+            saved = json.load(baseline_file)
+        saved['all_courses']['queries_per_request'] = 0
+        with open(baseline, 'w') as baseline_file:
+            json.dump(saved, baseline_file)
+        with self.assertRaises(CommandError):
+            call_command('benchmark_api', 'all_courses', **options)
+
+
+# Тесты генератора синтетических данных
+from .models import Profile
+from .synthetic import generate
+
+
+class SyntheticDataTests(TestCase):
+    scale = {'categories': 2, 'teachers': 3, 'courses': 6, 'students': 20, 'enrollments_per_student': 2,
+             'reviews_per_course': 2, 'completion_rate': 0.5}
+
+    def test_generates_requested_volumes_with_derived_data(self):
+        counts = generate(prefix='gen', batch_size=7, **self.scale)
+        self.assertEqual((counts['courses'], counts['students'], counts['enrollments']), (6, 20, 40))
+        self.assertEqual(Profile.objects.filter(user__username__startswith='gen_').count(), 23)
+        self.assertEqual(Certificate.objects.count(), CourseProgress.objects.filter(is_completed=True).count())
+        self.assertEqual(
+            sum(CourseStats.objects.values_list('enrollment_count', flat=True)),
+            Enrollment.objects.filter(status='confirmed').count(),
+        )
+
+    def test_same_seed_produces_same_data(self):
+        def snapshot(prefix):
+            courses = Course.objects.filter(instructor__username__startswith=f'{prefix}_').order_by('id')
+            return [(c.title.replace(prefix, ''), c.price, c.level) for c in courses]
+
+        generate(prefix='first', seed=7, **self.scale)
+        generate(prefix='second', seed=7, **self.scale)
+        self.assertEqual(snapshot('first'), snapshot('second'))
+
+    def test_command_refuses_existing_prefix(self):
+        call_command('create_test_data', '--courses=2', '--students=3', stdout=io.StringIO())
+        with self.assertRaises(CommandError):
+            call_command('create_test_data', '--courses=2', '--students=3', stdout=io.StringIO())
+
+
+# Тесты отложенного и отключенного режимов сигналов
+from .deferred_signals import defer_signals, suppress_signals
+
+
+class DeferredSignalTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='student', email='student@example.com')
+        self.course = Course.objects.create(title='Grammar', description='Test', instructor=self.user)
+
+    def test_user_saves_cost_one_profile_query(self):
+        self.assertTrue(Profile.objects.filter(user=self.user).exists())
+        with self.assertNumQueries(1):
+            self.user.save()
+        with self.assertNumQueries(2):
+            User.objects.create(username='another')
+
+    def test_deferred_receivers_run_once_in_batch(self):
+        with self.assertNumQueries(4):
+            with defer_signals():
+                users = [User.objects.create(username=f'user{n}') for n in range(3)]
+        self.assertEqual(Profile.objects.filter(user__in=users).count(), 3)
+
+        with defer_signals():
+            progress = CourseProgress.objects.create(student=self.user, course=self.course, is_completed=True)
+            progress.save()
+        self.assertEqual(Certificate.objects.filter(student=self.user, course=self.course).count(), 1)
+
+    def test_deferred_calls_are_dropped_on_error(self):
+        with self.assertRaises(RuntimeError):
+            with defer_signals():
+                user = User.objects.create(username='rolled')
+                raise RuntimeError
+        self.assertFalse(Profile.objects.filter(user=user).exists())
+
+    def test_suppressed_receivers_do_not_run(self):
+        @suppress_signals()
+        def create_quietly():
+            return User.objects.create(username='quiet', email='quiet@example.com')
+
+        user = create_quietly()
+        self.assertFalse(Profile.objects.filter(user=user).exists())
+
+        # Недостающий профиль создается при первом обращении
+        client = APIClient()
+        client.force_authenticate(user)
+        self.assertEqual(client.get(reverse('profile-detail')).status_code, 200)
+        self.assertTrue(Profile.objects.filter(user=user).exists())
+
+
+# Тесты HTML-страниц каталога: фрагментный кэш, пагинация и условные запросы
+class CatalogPageTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='teacher', email='teacher@example.com')
+        Course.objects.bulk_create([
+            Course(title=f'Course {n}', description='Test', instructor=self.user) for n in range(25)
+        ])
+        Course.objects.create(title='Fresh course', description='Test', instructor=self.user)
+
+    def test_home_is_limited_and_served_from_fragment_cache(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('home'))
+        self.assertEqual(response.content.decode().count('<h3>'), 12)
+        with self.assertNumQueries(0):
+            self.client.get(reverse('home'))
+
+    def test_courses_list_is_paginated_without_n_plus_one(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('courses'))
+        self.assertContains(response, 'Instructor: teacher', count=20)
+        self.assertContains(response, '?page=2')
+
+        response = self.client.get(reverse('courses'), {'page': 2})
+        self.assertContains(response, 'Instructor: teacher', count=6)
+        self.assertNotContains(response, '?page=3')
+
+    def test_conditional_get_and_invalidation(self):
+        response = self.client.get(reverse('home'))
+        self.assertIn('Last-Modified', response)
+        etag = response['ETag']
+        self.assertEqual(self.client.get(reverse('home'), HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        Course.objects.create(title='Newest course', description='Test', instructor=self.user, is_popular=True)
+        response = self.client.get(reverse('home'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Newest course')
+
+
+# Тесты маршрутизации чтений на реплику
+from .db_routing import PrimaryReplicaRouter, allow_replica_reads, replica_reads, routing_scope
+
+
+class DatabaseRoutingTests(APITestCase):
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+        self.router.replica = 'replica'
+
+    def test_reads_use_replica_only_when_allowed(self):
+        self.assertEqual(self.router.db_for_read(Course), 'default')
+        with replica_reads():
+            self.assertEqual(self.router.db_for_read(Course), 'replica')
+        with routing_scope():
+            self.assertEqual(self.router.db_for_read(Course), 'default')
+            allow_replica_reads()
+            self.assertEqual(self.router.db_for_read(Course), 'replica')
+
+        self.router.replica = None
+        with replica_reads():
+            self.assertEqual(self.router.db_for_read(Course), 'default')
+
+    def test_write_pins_reads_to_primary_for_the_scope(self):
+        with routing_scope():
+            allow_replica_reads()
+            self.assertEqual(self.router.db_for_write(Course), 'default')
+            self.assertEqual(self.router.db_for_read(Course), 'default')
+            with replica_reads():
+                self.assertEqual(self.router.db_for_read(Course), 'default')
+        with routing_scope():
+            allow_replica_reads()
+            self.assertEqual(self.router.db_for_read(Course), 'replica')
+
+    @patch('courses.db_routing.allow_replica_reads')
+    def test_only_read_actions_switch_to_replica(self, mock_allow):
+        self.client.get(reverse('course-list'))
+        self.assertEqual(mock_allow.call_count, 1)
+
+        self.client.force_authenticate(User.objects.create_superuser(username='admin', email='admin@example.com'))
+        self.client.post(reverse('category-list'), {'name': 'Grammar', 'description': 'Test'})
+        self.assertEqual(mock_allow.call_count, 1)
+
+
+# Тесты режима SQLite: повтор записи при блокировке и замер пропускной способности
+from django.db import OperationalError
+from django.test import SimpleTestCase
+from .sqlite_tuning import retry_on_lock
+
+
+class SQLiteTuningTests(SimpleTestCase):
+    def flaky(self, failures, message='database is locked'):
+        calls = []
+
+        def write():
+            calls.append(1)
+            if len(calls) <= failures:
+                raise OperationalError(message)
+            return 'ok'
+        return write, calls
+
+    def test_lock_errors_are_retried(self):
+        write, calls = self.flaky(2)
+        self.assertEqual(retry_on_lock(base_delay=0)(write)(), 'ok')
+        self.assertEqual(len(calls), 3)
+
+    def test_other_errors_and_exhausted_retries_are_raised(self):
+        write, calls = self.flaky(1, message='no such table: payment')
+        with self.assertRaises(OperationalError):
+            retry_on_lock(base_delay=0)(write)()
+        self.assertEqual(len(calls), 1)
+
+        write, calls = self.flaky(5)
+        with self.assertRaises(OperationalError):
+            retry_on_lock(attempts=3, base_delay=0)(write)()
+        self.assertEqual(len(calls), 3)
+
+    def test_busy_timeout_leaves_one_retry(self):
+        write, calls = self.flaky(5)
+        with patch.dict(connection.settings_dict, {'OPTIONS': {'timeout': 5}}):
+            with self.assertRaises(OperationalError):
+                retry_on_lock(base_delay=0)(write)()
+        self.assertEqual(len(calls), 2)
+
+    def test_benchmark_reports_both_modes(self):
+        out = io.StringIO()
+        # Команда регистрирует свои временные базы в connections на время замера
+        with patch.object(type(self), 'databases', {'sqlite_bench_0', 'sqlite_bench_1'}):
+            call_command('benchmark_sqlite_writes', '--workers=2', '--writes=5', stdout=out)
+        self.assertIn('SQLITE_TUNING', out.getvalue())
+
+
+# Тесты асинхронных представлений
+from .caching import aget_or_compute, aversioned_key, versioned_key
+from rest_framework.utils.encoders import JSONEncoder
+from .services import aget_instructor_courses
+
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.teacher = User.objects.create_user(username='teacher', password='testpassword')
+        self.course = Course.objects.create(
+            title='Async Course',
+            description='Test Description',
+            price=100.00,
+            instructor=self.teacher,
+        )
+        FAQ.objects.create(question='Question?', answer='Answer.')
+
+    async def test_course_details(self):
+        response = await self.async_client.get(reverse('course-details', args=[self.course.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['instructor'], 'teacher')
+        # Запросы из потоков sync_to_async учитываются в метриках запроса
+        self.assertIn('desc="2 queries"', response['Server-Timing'])
+
+        response = await self.async_client.get(reverse('course-details', args=[self.course.id + 1]))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_all_courses_and_faqs(self):
+        response = await self.async_client.get(reverse('all-courses'))
+        self.assertEqual([course['title'] for course in response.json()], ['Async Course'])
+
+        response = await self.async_client.get(reverse('get_faqs'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]['question'], 'Question?')
+
+        response = await self.async_client.post(reverse('get_faqs'))
+        self.assertEqual(response.status_code, 405)
+
+    async def test_instructor_courses_are_cached(self):
+        url = reverse('instructor-courses', args=[self.teacher.id])
+        response = await self.async_client.get(url)
+        self.assertEqual(response.json()[0]['title'], 'Async Course')
+        # Цена — число в JSON, как в ответе прежнего представления на api_view
+        self.assertEqual(response.json()[0]['price'], 100.0)
+
+        response = await self.async_client.get(url)
+        self.assertIn('desc="0 queries"', response['Server-Timing'])
+        courses = await aget_instructor_courses(self.teacher.id)
+        self.assertEqual(json.loads(json.dumps(courses, cls=JSONEncoder)), response.json())
+
+    async def test_async_helpers_share_keys_with_sync(self):
+        key = await aversioned_key('shared', 'courses')
+        self.assertEqual(key, versioned_key('shared', 'courses'))
+
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return 'value'
+
+        self.assertEqual(await aget_or_compute(key, compute, 60, beta=0), 'value')
+        self.assertEqual(await aget_or_compute(key, compute, 60, beta=0), 'value')
+        self.assertEqual(len(calls), 1)
+
+    async def test_two_tier_cache_async_reads(self):
+        worker = TwoTierCache('async-worker', {'OPTIONS': {'L2': 'shared', 'SYNC_INTERVAL': 60}})
+        worker.set('key', 'value', 60)
+        worker.get('key')
+        # Попадание в L1 обслуживается в цикле событий, без синхронных методов
+        with patch.object(worker, 'get', side_effect=AssertionError), \
+                patch.object(worker, 'get_many', side_effect=AssertionError):
+            self.assertEqual(await worker.aget('key'), 'value')
+            self.assertEqual(await worker.aget_many(['key']), {'key': 'value'})
+        self.assertEqual(await worker.aget_many(['key', 'absent']), {'key': 'value'})
+
+
+# Тесты потоковой выгрузки
+import csv
+from . import exports
+
+
+class ExportTests(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', password='testpassword', is_staff=True)
+        self.student = User.objects.create_user(username='student', password='testpassword')
+        self.course = Course.objects.create(title='Export Course', description='Description', instructor=self.admin)
+        Enrollment.objects.create(student=self.student, course=self.course, status='confirmed')
+        Payment.objects.create(user=self.student, course=self.course, amount=49.90, stripe_payment_intent='pi_1')
+
+    def export(self, dataset, export_format):
+        self.client.force_authenticate(self.admin)
+        response = self.client.get(reverse('export', args=[dataset, export_format]))
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_ndjson_export(self):
+        rows = [json.loads(line) for line in self.export('payments', 'ndjson').splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual((rows[0]['user_id'], rows[0]['amount']), (self.student.id, '49.90'))
+
+    def test_csv_export_has_header(self):
+        rows = list(csv.reader(io.StringIO(self.export('enrollments', 'csv'))))
+        self.assertEqual(rows[0], list(exports.EXPORTS['enrollments'][1]))
+        self.assertEqual(rows[1][2], 'student')
+
+    @patch.object(exports, 'EXPORT_LINES_PER_WRITE', 1)
+    def test_rows_are_streamed_in_fragments(self):
+        Course.objects.create(title='Second Course', description='Description', instructor=self.admin)
+        self.client.force_authenticate(self.admin)
+        response = self.client.get(reverse('export', args=['courses', 'csv']))
+        # Заголовок с первой строкой и вторая строка
+        self.assertEqual(len(list(response.streaming_content)), 2)
+
+    def test_admin_only_and_unknown_dataset(self):
+        self.client.force_authenticate(self.student)
+        self.assertEqual(self.client.get(reverse('export', args=['payments', 'csv'])).status_code, 403)
+
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(self.client.get(reverse('export', args=['users', 'csv'])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('export', args=['payments', 'xml'])).status_code, 404)
+
+
+# Тесты условных запросов
+from .db_routing import primary_reads
+
+
+class ConditionalRequestTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.teacher = User.objects.create_user(username='teacher', password='testpassword')
+        self.category = Category.objects.create(name='Grammar', description='Grammar courses')
+        self.course = Course.objects.create(
+            title='Test Course', description='Test Description', instructor=self.teacher, category=self.category,
+        )
+        FAQ.objects.create(question='Question?', answer='Answer.')
+
+    def assertNotModified(self, url, **headers):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag, **headers)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        return etag, queries
+
+    def test_unchanged_lists_return_304_without_queries(self):
+        for url in (reverse('course-list'), reverse('category-list'), reverse('faq-list')):
+            with self.subTest(url=url):
+                _, queries = self.assertNotModified(url)
+                self.assertEqual(len(queries), 0)
+
+    def test_changes_update_etag(self):
+        url = reverse('course-list')
+        etag, _ = self.assertNotModified(url)
+
+        # Статистика меняется F()-обновлением, но тоже меняет ETag
+        student = User.objects.create_user(username='student', password='testpassword')
+        Enrollment.objects.create(student=student, course=self.course, status='confirmed')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        etag, _ = self.assertNotModified(reverse('faq-list'))
+        FAQ.objects.all().delete()
+        self.assertEqual(self.client.get(reverse('faq-list'), HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_staff_gets_own_etag(self):
+        url = reverse('course-list')
+        etag = self.client.get(url)['ETag']
+        self.client.force_authenticate(User.objects.create_user(username='staff', password='pass', is_staff=True))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_course_details_uses_updated_at(self):
+        url = reverse('course-details', args=[self.course.id])
+        response = self.client.get(url)
+        self.assertIn('Last-Modified', response)
+        self.assertNotModified(url)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+
+        self.course.title = 'Renamed'
+        self.course.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+        etag = self.client.get(url)['ETag']
+        self.teacher.username = 'renamed_teacher'
+        self.teacher.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_recently_changed_lists_read_primary(self):
+        url = reverse('category-list')
+        with patch('courses.conditional.primary_reads', wraps=primary_reads) as mock_primary:
+            # Категория создана только что: реплика могла ее еще не получить
+            self.client.get(url)
+            self.assertEqual(mock_primary.call_count, 1)
+            with override_settings(DATABASE_REPLICA_MAX_LAG=0):
+                self.client.get(url)
+            self.assertEqual(mock_primary.call_count, 1)
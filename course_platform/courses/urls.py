@@ -3,10 +3,10 @@ from rest_framework.routers import DefaultRouter
 from .views import (
     home, courses_list, course_details_view, register_user, submit_contact_message, 
     blog_view, TestimonialViewSet, create_payment, stripe_webhook, all_courses_view,
-    get_faqs, instructor_courses_view, ProfileDetailView
+    get_faqs, instructor_courses_view, ProfileDetailView, search_view, export_view
 )
 from .views import CategoryViewSet, CourseViewSet, TeacherViewSet, EnrollmentViewSet, ReviewViewSet
-from .views import EventViewSet, ServiceViewSet, KnowledgeBaseArticleViewSet, FAQViewSet, BlogPostViewSet, CourseProgressListCreateView, CourseProgressDetailView, CertificateListView
+from .views import EventViewSet, ServiceViewSet, KnowledgeBaseArticleViewSet, FAQViewSet, BlogPostViewSet, CourseProgressListCreateView, CourseProgressDetailView, LessonCompletionBatchView, CertificateListView
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
@@ -46,6 +46,7 @@ urlpatterns = [
     path('courses/<int:course_id>/', course_details_view, name='course-details'),
     path('courses/all/', all_courses_view, name='all-courses'),  # Маршрут для всех курсов
     path('courses/instructor/<int:instructor_id>/', instructor_courses_view, name='instructor-courses'),  # Курсы преподавателя
+    path('faqs/', get_faqs, name='get_faqs'),  # ЧЗВ (api/faqs/ занят FAQViewSet из роутера)
     path('register/', register_user, name='register_user'),
     path('blog/', blog_view, name='blog'),  # Страница блога
     path('contact/', submit_contact_message, name='contact'),
@@ -54,13 +55,14 @@ urlpatterns = [
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('api/create-payment/', create_payment, name='create_payment'),
     path('api/stripe-webhook/', stripe_webhook, name='stripe_webhook'),  # Вебхук для Stripe
-    path('api/faqs/', get_faqs, name='get_faqs'),  # ЧЗВ
+    path('api/search/', search_view, name='search'),  # Полнотекстовый поиск
+    path('api/exports/<slug:dataset>.<slug:export_format>', export_view, name='export'),  # Выгрузки для администраторов
     path('profile/', ProfileDetailView.as_view(), name='profile-detail'),
     path('api/progress/', CourseProgressListCreateView.as_view(), name='course-progress-list-create'),
     path('api/progress/<int:pk>/', CourseProgressDetailView.as_view(), name='course-progress-detail'),
+    path('api/progress/lessons/', LessonCompletionBatchView.as_view(), name='course-progress-lessons'),
     path('api/certificates/', CertificateListView.as_view(), name='certificate-list'),
     path('courses/all/', all_courses_view, name='all-courses'),
-    path('api/faqs/', get_faqs, name='get_faqs'),
     re_path(r'^swagger(?P<format>\.json|\.yaml)$', schema_view.without_ui(cache_timeout=0), name='schema-json'),
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
     path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
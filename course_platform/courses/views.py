@@ -5,23 +5,44 @@ from .models import (
     KnowledgeBaseArticle, FAQ, ContactMessage, Payment, Testimonial, BlogPost, Profile, CourseProgress, Certificate
 )
 from .serializers import (
-    CategorySerializer, CourseSerializer, EnrollmentSerializer, TeacherSerializer,
+    CategorySerializer, CourseSerializer, EnrollmentSerializer, BulkEnrollmentSerializer, TeacherSerializer,
     ReviewSerializer, EventSerializer, ServiceSerializer, KnowledgeBaseArticleSerializer,
-    FAQSerializer, TestimonialSerializer, BlogPostSerializer, ProfileSerializer, CourseProgressSerializer, CertificateSerializer
+    FAQSerializer, TestimonialSerializer, BlogPostSerializer, ProfileSerializer, CourseProgressSerializer, CertificateSerializer,
+    LessonCompletionBatchSerializer
 )
 from django.contrib.auth.models import User
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, action
 from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
+import hashlib
+import json
 import stripe
 from django.conf import settings
 from django.views.decorators.csrf import csrf_exempt
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
 from rest_framework.decorators import permission_classes
 from django.views.decorators.cache import cache_page
+from django.views.decorators.http import condition, require_safe
 from django.utils.decorators import method_decorator
-from .services import get_course_details, get_instructor_courses, get_all_courses, update_course
-from django.shortcuts import render, get_object_or_404
+from .services import (
+    get_course_details, aget_instructor_courses, get_all_courses, update_course,
+    catalog_etag, catalog_last_modified, catalog_version, resource_validators, COURSE_CACHE_TIMEOUT,
+    CATEGORIES_SCOPE, COURSE_API_SCOPES, FAQS_SCOPE,
+)
+from .search import FullTextSearchFilter, search, DEFAULT_LIMIT
+from .stripe_events import record_event
+from .enrollments import bulk_enroll
+from .db_routing import ReplicaReadMixin
+from .conditional import ConditionalListMixin, not_modified, set_validators
+from .sqlite_tuning import retry_on_lock
+from .progress import record_lessons, update_progress
+from .exports import EXPORTS, FORMATS, astream_export, stream_export
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.functions import Coalesce
+from django.shortcuts import render, aget_object_or_404
 from rest_framework import generics, permissions
 
 stripe.api_key = settings.STRIPE_SECRET_KEY
@@ -60,7 +81,8 @@ def create_payment(request):
         metadata={'course_id': course.id, 'user_id': user.id},
     )
 
-    Payment.objects.create(
+    # Повторяется только запись в базу: платежное намерение в Stripe уже создано
+    retry_on_lock(transaction.atomic(Payment.objects.create))(
         user=user,
         course=course,
         amount=course.price,
@@ -81,14 +103,14 @@ def stripe_webhook(request):
         return JsonResponse({'error': 'Missing Stripe signature header'}, status=400)
 
     try:
-        event = stripe.Webhook.construct_event(payload, sig_header, endpoint_secret)
+        # Только проверка подписи: StripeObject не сериализуется в JSONField,
+        # поэтому в журнал сохраняется исходное тело события
+        stripe.Webhook.construct_event(payload, sig_header, endpoint_secret)
     except (ValueError, stripe.error.SignatureVerificationError) as e:
         return JsonResponse({'error': str(e)}, status=400)
 
-    if event['type'] == 'payment_intent.succeeded':
-        payment_intent = event['data']['object']
-        stripe_payment_id = payment_intent['id']
-        Payment.objects.filter(stripe_payment_intent=stripe_payment_id).update(status='succeeded')
+    # Платежи обновляет воркер process_stripe_events
+    record_event(json.loads(payload))
 
     return JsonResponse({'status': 'success'})
 
@@ -98,7 +120,10 @@ class ProfileDetailView(generics.RetrieveUpdateAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
-        return self.request.user.profile
+        # Профиль создается сигналом, но его может не быть у пользователей, созданных
+        # без сигналов (suppress_signals, загрузка фикстур) или до появления профилей
+        profile, _ = Profile.objects.get_or_create(user=self.request.user)
+        return profile
     
 # Отправка контактного сообщения
 @api_view(['POST'])
@@ -110,72 +135,115 @@ def submit_contact_message(request):
     if not all([name, email, message]):
         return Response({'error': 'All fields are required'}, status=status.HTTP_400_BAD_REQUEST)
 
-    ContactMessage.objects.create(name=name, email=email, message=message)
+    retry_on_lock(ContactMessage.objects.create)(name=name, email=email, message=message)
     return Response({'success': 'Message submitted successfully'}, status=status.HTTP_201_CREATED)
 
 
 # Виды представлений для каждой модели
-class CategoryViewSet(viewsets.ModelViewSet):
-    queryset = Category.objects.prefetch_related('course_set')
+class CategoryViewSet(ConditionalListMixin, ReplicaReadMixin, viewsets.ModelViewSet):
+    queryset = Category.objects.all()
     serializer_class = CategorySerializer
+    validator_scopes = (CATEGORIES_SCOPE,)
 
 
-class CourseViewSet(viewsets.ModelViewSet):
-    queryset = Course.objects.select_related('category', 'instructor').prefetch_related('reviews')
+class CourseViewSet(ConditionalListMixin, ReplicaReadMixin, viewsets.ModelViewSet):
+    # Поля статистики вынесены в аннотации, чтобы по ним работали сортировка и курсорная пагинация
+    queryset = CourseSerializer.setup_eager_loading(Course.objects.all()).annotate(
+        average_rating=Coalesce(F('stats__average_rating'), 0.0),
+        enrollment_count=Coalesce(F('stats__enrollment_count'), 0),
+        review_count=Coalesce(F('stats__review_count'), 0),
+    )
     serializer_class = CourseSerializer
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
-    search_fields = ['title', 'description']
-    ordering_fields = ['price', 'duration']
+    filter_backends = [FullTextSearchFilter, filters.OrderingFilter]
+    search_content_type = 'course'
+    ordering_fields = ['price', 'duration', 'average_rating', 'enrollment_count', 'review_count']
+    ordering = ('id',)
+    validator_scopes = COURSE_API_SCOPES
+
+    def list_validators(self, request):
+        # Выручку в статистике видят только сотрудники
+        return resource_validators(self.validator_scopes, request.get_full_path(), request.user.is_staff)
 
 
-class TeacherViewSet(viewsets.ModelViewSet):
+class TeacherViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     queryset = Teacher.objects.all()
     serializer_class = TeacherSerializer
 
 
-class EnrollmentViewSet(viewsets.ModelViewSet):
+class EnrollmentViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     queryset = Enrollment.objects.select_related('student', 'course')
     serializer_class = EnrollmentSerializer
-
-
-class ReviewViewSet(viewsets.ModelViewSet):
+    # Порядок для курсорной пагинации, покрытый индексом
+    ordering = ('-enrolled_on', '-id')
+
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminUser])
+    def bulk(self, request):
+        """
+        Пакетная запись студентов на курсы: {"enrollments": [{"student": id, "course": id, "status": ...}]}.
+        Число запросов к базе данных не зависит от размера списка.
+        """
+        serializer = BulkEnrollmentSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            created, skipped = bulk_enroll(serializer.validated_data['enrollments'])
+        except IntegrityError:
+            # Те же записи параллельно создал другой запрос; повтор пропустит их
+            return Response({'error': 'Enrollments were modified concurrently, retry the request.'},
+                            status=status.HTTP_409_CONFLICT)
+
+        return Response({
+            'created': len(created),
+            'skipped': [{'student': item['student'].id, 'course': item['course'].id} for item in skipped],
+        }, status=status.HTTP_201_CREATED)
+
+
+class ReviewViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     queryset = Review.objects.select_related('course')
     serializer_class = ReviewSerializer
+    ordering = ('-created_at', '-id')
     permission_classes = [IsAuthenticated, IsAdminUser]
 
 
-class EventViewSet(viewsets.ModelViewSet):
+class EventViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     queryset = Event.objects.all()
     serializer_class = EventSerializer
 
 
-class ServiceViewSet(viewsets.ModelViewSet):
+class ServiceViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     queryset = Service.objects.all()
     serializer_class = ServiceSerializer
 
 
-class KnowledgeBaseArticleViewSet(viewsets.ModelViewSet):
+class KnowledgeBaseArticleViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     queryset = KnowledgeBaseArticle.objects.all()
     serializer_class = KnowledgeBaseArticleSerializer
+    filter_backends = [FullTextSearchFilter]
+    search_content_type = 'article'
 
 
-class FAQViewSet(viewsets.ModelViewSet):
+class FAQViewSet(ConditionalListMixin, ReplicaReadMixin, viewsets.ModelViewSet):
     queryset = FAQ.objects.all()
     serializer_class = FAQSerializer
+    filter_backends = [FullTextSearchFilter]
+    search_content_type = 'faq'
+    validator_scopes = (FAQS_SCOPE,)
 
 
-class TestimonialViewSet(viewsets.ModelViewSet):
-    queryset = Testimonial.objects.all()
+class TestimonialViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
+    queryset = TestimonialSerializer.setup_eager_loading(Testimonial.objects.all())
     serializer_class = TestimonialSerializer
 
 
 # Дополнительные представления для статей и блога
-class BlogPostViewSet(viewsets.ModelViewSet):
-    queryset = BlogPost.objects.all()
+class BlogPostViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
+    queryset = BlogPost.objects.select_related('author')
     serializer_class = BlogPostSerializer
+    filter_backends = [FullTextSearchFilter]
+    search_content_type = 'blog'
+    ordering = ('-created_at', '-id')
 
 class CourseProgressListCreateView(generics.ListCreateAPIView):
-    queryset = CourseProgress.objects.all()
+    queryset = CourseProgress.objects.select_related('student', 'course')
     serializer_class = CourseProgressSerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -188,7 +256,7 @@ class CourseProgressListCreateView(generics.ListCreateAPIView):
 
 
 class CourseProgressDetailView(generics.RetrieveUpdateAPIView):
-    queryset = CourseProgress.objects.all()
+    queryset = CourseProgress.objects.select_related('student', 'course')
     serializer_class = CourseProgressSerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -196,32 +264,105 @@ class CourseProgressDetailView(generics.RetrieveUpdateAPIView):
         return self.queryset.filter(student=self.request.user)
 
     def perform_update(self, serializer):
-        # Пересчитываем процент завершения курса при обновлении
-        completed_lessons = serializer.validated_data.get('completed_lessons')
-        total_lessons = serializer.validated_data.get('total_lessons')
-        progress = (completed_lessons / total_lessons) * 100 if total_lessons > 0 else 0
-        serializer.save(progress=progress)
+        # Записываются только переданные поля, а процент пересчитывается в базе данных
+        # по актуальным счетчикам, поэтому одновременные обновления не затирают друг друга
+        progress = CourseProgress.objects.filter(pk=serializer.instance.pk)
+        update_progress(progress, serializer.validated_data)
+        serializer.instance.refresh_from_db()
+
+
+class LessonCompletionBatchView(generics.GenericAPIView):
+    """
+    Прием пакета событий завершения уроков текущего студента:
+    {"events": [{"course": id, "lesson": номер, "completed_at": время}]}.
+    Возвращает обновленный прогресс по затронутым курсам.
+    """
+    queryset = CourseProgress.objects.select_related('student', 'course')
+    serializer_class = LessonCompletionBatchSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        course_ids = record_lessons(request.user, serializer.validated_data['events'])
+
+        progress = self.queryset.filter(student=request.user, course_id__in=course_ids)
+        return Response(CourseProgressSerializer(progress, many=True).data)
 
 class CertificateListView(generics.ListAPIView):
-    queryset = Certificate.objects.all()
+    queryset = Certificate.objects.select_related('student', 'course')
     serializer_class = CertificateSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
         return self.queryset.filter(student=self.request.user)
     
-def home(request):
-    courses = Course.objects.select_related('category', 'instructor').all()
-    teachers = Teacher.objects.all()
-    return render(request, 'main/home.html', {'courses': courses, 'teachers': teachers})
+# Размеры страниц HTML-каталога
+HOME_COURSES_LIMIT = 12
+HOME_TEACHERS_LIMIT = 8
+COURSES_PAGE_SIZE = 20
+
+
+def _page_number(request):
+    try:
+        return max(1, int(request.GET.get('page', 1)))
+    except ValueError:
+        return 1
+
+
+def _catalog_etag(request, *args, **kwargs):
+    return catalog_etag(request.resolver_match.url_name, _page_number(request))
+
 
+def _catalog_last_modified(request, *args, **kwargs):
+    return catalog_last_modified()
+
+
+# Страницы каталога: при неизменной версии каталога браузер и CDN получают 304,
+# а при промахе разметка списков берется из фрагментного кэша. Querysets ленивые,
+# поэтому при попадании во фрагментный кэш запросов к БД нет
+@condition(etag_func=_catalog_etag, last_modified_func=_catalog_last_modified)
+def home(request):
+    courses = Course.objects.select_related('category', 'instructor') \
+                            .order_by('-is_popular', '-start_date', 'id')[:HOME_COURSES_LIMIT]
+    teachers = Teacher.objects.order_by('id')[:HOME_TEACHERS_LIMIT]
+    return render(request, 'main/home.html', {
+        'courses': courses, 'teachers': teachers,
+        'catalog_version': catalog_version(), 'cache_timeout': COURSE_CACHE_TIMEOUT,
+    })
+
+@condition(etag_func=_catalog_etag, last_modified_func=_catalog_last_modified)
 def courses_list(request):
-    courses = Course.objects.all()  # Получаем все курсы из базы данных
-    return render(request, 'courses/courses_list.html', {'courses': courses})
+    page = _page_number(request)
+    offset = (page - 1) * COURSES_PAGE_SIZE
+    # Лишняя строка показывает, есть ли следующая страница, без отдельного COUNT
+    courses = Course.objects.select_related('instructor').order_by('id')[offset:offset + COURSES_PAGE_SIZE + 1]
+    return render(request, 'courses/courses_list.html', {
+        'courses': courses, 'page': page, 'page_size': COURSES_PAGE_SIZE,
+        'catalog_version': catalog_version(), 'cache_timeout': COURSE_CACHE_TIMEOUT,
+    })
+
+
+def _course_etag(course_id, updated_at, instructor):
+    # В ответе есть имя преподавателя, а его смена не меняет updated_at курса
+    return hashlib.md5(f'{course_id}:{updated_at.isoformat()}:{instructor}'.encode()).hexdigest()
+
+
+# Асинхронные представления: под ASGI (uvicorn, daphne) выполняются в цикле событий,
+# без передачи каждого запроса в пул потоков
 
 # Представление для отображения подробной информации о курсе
-def course_details_view(request, course_id):
-    course = get_object_or_404(Course, id=course_id)
+async def course_details_view(request, course_id):
+    # Валидаторы по updated_at курса и имени преподавателя: при неизменных данных ответ 304 без выборки
+    validators = await Course.objects.filter(id=course_id).values_list('updated_at', 'instructor__username').afirst()
+    if validators is not None:
+        updated_at, instructor = validators
+        etag = _course_etag(course_id, updated_at, instructor)
+        response = not_modified(request, etag, updated_at)
+        if response is not None:
+            return set_validators(response, etag, updated_at)
+
+    course = await aget_object_or_404(Course.objects.select_related('instructor'), id=course_id)
     course_data = {
         'title': course.title,
         'description': course.description,
@@ -232,25 +373,60 @@ def course_details_view(request, course_id):
         'start_date': course.start_date,
         'end_date': course.end_date,
     }
-    return JsonResponse(course_data)
+    etag = _course_etag(course.id, course.updated_at, course.instructor.username)
+    return set_validators(JsonResponse(course_data), etag, course.updated_at)
 
 def blog_view(request):
     return render(request, 'main/blog.html')
 
-def all_courses_view(request):
-    courses = Course.objects.all().values('id', 'title', 'description', 'price', 'duration')
-    return JsonResponse(list(courses), safe=False)
+async def all_courses_view(request):
+    courses = Course.objects.values('id', 'title', 'description', 'price', 'duration')
+    return JsonResponse([course async for course in courses], safe=False)
+
+# Кодировщик DRF сохраняет формат ответа прежних представлений на api_view: Decimal как число
+@require_safe
+async def get_faqs(request):
+    faqs = [faq async for faq in FAQ.objects.all()]
+    return JsonResponse(FAQSerializer(faqs, many=True).data, encoder=JSONEncoder, safe=False)
+
+@require_safe
+async def instructor_courses_view(request, instructor_id):
+    """
+    Возвращает список курсов, преподаваемых конкретным преподавателем.
+    """
+    return JsonResponse(await aget_instructor_courses(instructor_id), encoder=JSONEncoder, safe=False)
+
 
 @api_view(['GET'])
-def get_faqs(request):
-    faqs = FAQ.objects.all()
-    serializer = FAQSerializer(faqs, many=True)
-    return Response(serializer.data)
+def search_view(request):
+    """
+    Единый полнотекстовый поиск по курсам, базе знаний, блогу и FAQ.
+    Параметры: q — строка поиска, type — типы через запятую, limit — количество результатов.
+    """
+    query = request.query_params.get('q', '')
+    content_types = [t for t in request.query_params.get('type', '').split(',') if t] or None
+    try:
+        limit = int(request.query_params.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({'query': query, 'results': search(query, content_types, limit)})
+
 
 @api_view(['GET'])
-def instructor_courses_view(request, instructor_id):
+@permission_classes([IsAdminUser])
+def export_view(request, dataset, export_format):
     """
-    Возвращает список курсов, преподаваемых конкретным преподавателем.
+    Потоковая выгрузка курсов, записей, платежей или прогресса в NDJSON или CSV.
+    Ответ формируется по мере чтения из базы, поэтому память не зависит от числа строк.
     """
-    courses = Course.objects.filter(instructor_id=instructor_id).values('title', 'category__name', 'price', 'duration', 'start_date', 'end_date')
-    return Response(list(courses))
\ No newline at end of file
+    if dataset not in EXPORTS or export_format not in FORMATS:
+        raise Http404
+    # Под ASGI синхронный итератор был бы собран в память целиком
+    if isinstance(request._request, ASGIRequest):
+        content = astream_export(dataset, export_format)
+    else:
+        content = stream_export(dataset, export_format)
+    response = StreamingHttpResponse(content, content_type=FORMATS[export_format])
+    response['Content-Disposition'] = f'attachment; filename="{dataset}.{export_format}"'
+    return response